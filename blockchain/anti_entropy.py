@@ -0,0 +1,134 @@
+import logging
+import random
+import threading
+import time
+from config import ANTI_ENTROPY_INTERVAL, ANTI_ENTROPY_MAX_ITEMS, MAX_PAGE_SIZE
+from news import (
+    get_approved_news_hashes, get_pending_news_hashes, get_approved_news_by_hashes,
+    get_pending_news_by_hashes, insert_approved_news_batch, insert_pending_news_batch,
+    filter_approved_hashes, filter_removed_pending_hashes
+)
+from merkle import get_merkle_root, get_merkle_children
+from peer_client import peer_client
+from wire import decode_response
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def apply_items(data):
+    """Store approved and pending articles pushed by a peer. Returns the number that were new."""
+    applied = 0
+    if data.get('approved'):
+        applied += insert_approved_news_batch(data['approved'])
+    if data.get('pending'):
+        applied += insert_pending_news_batch(data['pending'])
+    return applied
+
+def build_exchange_response(data):
+    """Answer a peer's digest: send what it lacks and list what we lack from it.
+
+    Approved news is normally reconciled through the Merkle endpoints; a full
+    approved_hashes list is still answered for peers that send one.
+    """
+    response = {}
+    if 'approved_hashes' in data:
+        theirs = set(data['approved_hashes'])
+        approved = set(get_approved_news_hashes())
+        response['approved'] = get_approved_news_by_hashes(list(approved - theirs)[:ANTI_ENTROPY_MAX_ITEMS])
+        response['missing_approved'] = list(theirs - approved)[:ANTI_ENTROPY_MAX_ITEMS]
+    if 'pending_hashes' in data:
+        theirs = set(data['pending_hashes'])
+        pending = set(get_pending_news_hashes())
+        missing = theirs - pending
+        missing -= filter_approved_hashes(missing)
+        missing -= filter_removed_pending_hashes(missing)
+        response['pending'] = get_pending_news_by_hashes(list(pending - theirs)[:ANTI_ENTROPY_MAX_ITEMS])
+        response['missing_pending'] = list(missing)[:ANTI_ENTROPY_MAX_ITEMS]
+    return response
+
+def peer_request(method, peer, path, **kwargs):
+    """Make one counted request to a peer and return its decoded JSON body."""
+    response = peer_client.request(method, f"{peer}{path}", **kwargs)
+    response.raise_for_status()
+    return decode_response(response)
+
+def diff_merkle_with_peer(peer, prefixes=('',)):
+    """Walk the peer's Merkle tree down to the leaves that differ from ours.
+
+    Returns (hashes only the peer has, hashes only we have). When both trees
+    match this costs a single small request. Passing one-digit prefixes
+    limits the walk to those subtrees, so a catch-up can split the tree
+    between peers.
+    """
+    missing_here, missing_there = set(), set()
+    prefixes = list(prefixes)
+    if prefixes == [''] and peer_request('GET', peer, '/merkle')['root'] == get_merkle_root()['root']:
+        return missing_here, missing_there
+    while prefixes:
+        prefix = prefixes.pop()
+        remote = peer_request('GET', peer, '/merkle/children', params={'prefix': prefix})
+        local = get_merkle_children(prefix)
+        if 'hashes' in local:
+            remote_hashes, local_hashes = set(remote['hashes']), set(local['hashes'])
+            missing_here |= remote_hashes - local_hashes
+            missing_there |= local_hashes - remote_hashes
+            continue
+        prefixes.extend(
+            child for child, digest in local['children'].items()
+            if remote['children'].get(child) != digest
+        )
+    return missing_here, missing_there
+
+def pull_approved_by_hash(peer, hashes, chunk_size=MAX_PAGE_SIZE):
+    """Fetch and store the given approved articles from a peer. Returns the number stored."""
+    hashes = list(hashes)
+    pulled = 0
+    for start in range(0, len(hashes), chunk_size):
+        data = peer_request('POST', peer, '/approved_news/by_hash', json_body={'hashes': hashes[start:start + chunk_size]})
+        pulled += insert_approved_news_batch(data.get('news', []))
+    return pulled
+
+def reconcile_with_peer(peer):
+    """Run one push-pull anti-entropy exchange with a peer. Returns (pulled, pushed) counts."""
+    pulled = pushed = 0
+
+    missing_here, missing_there = diff_merkle_with_peer(peer)
+    if missing_here:
+        pulled += pull_approved_by_hash(peer, list(missing_here)[:ANTI_ENTROPY_MAX_ITEMS])
+
+    data = peer_request('POST', peer, '/anti_entropy', json_body={'pending_hashes': get_pending_news_hashes()})
+    pulled += apply_items(data)
+
+    push = {
+        'approved': get_approved_news_by_hashes(list(missing_there)[:ANTI_ENTROPY_MAX_ITEMS]),
+        'pending': get_pending_news_by_hashes(data.get('missing_pending', []))
+    }
+    pushed = len(push['approved']) + len(push['pending'])
+    if pushed:
+        peer_request('POST', peer, '/anti_entropy', json_body=push)
+    if pulled or pushed:
+        logger.info(f"Anti-entropy with {peer}: pulled {pulled}, pushed {pushed}")
+    return pulled, pushed
+
+def run_anti_entropy(interval=ANTI_ENTROPY_INTERVAL):
+    """Reconcile with one random peer every interval seconds."""
+    from network import other_nodes
+    while True:
+        time.sleep(interval * random.uniform(0.5, 1.5))
+        peers = other_nodes.active()
+        if not peers:
+            continue
+        peer = random.choice(peers)
+        try:
+            reconcile_with_peer(peer)
+        except Exception as e:
+            logger.warning(f"Anti-entropy with {peer} failed: {str(e)}")
+
+def start_anti_entropy(interval=ANTI_ENTROPY_INTERVAL):
+    """Start the background anti-entropy loop unless it is disabled."""
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=run_anti_entropy, args=(interval,), name="anti-entropy", daemon=True)
+    thread.start()
+    logger.info(f"Anti-entropy running every ~{interval}s")
+    return thread
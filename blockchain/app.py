@@ -1,37 +1,78 @@
 # app.py
 from flask import Flask
 from routes import bp as routes_bp
-from network import find_free_port, try_register_with_bootstrap, other_nodes, initialize_node_url
+from network import find_free_port, try_register_with_bootstrap, other_nodes, initialize_node_url, load_node_url
+import network
+from peer_client import GzipRequestMiddleware, peer_client
+from services import start_background_services
+from config import NODE_SERVER, WEB_WORKERS, WEB_THREADS, WEB_TIMEOUT, WEB_KEEPALIVE
+import db
 import logging
 import os
 import sys
 import socket
 from flask_cors import CORS
 
-app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Register blueprints
-app.register_blueprint(routes_bp)
-CORS(app)
+def create_app(start_services=True):
+    """Build the node's Flask app.
+
+    Works as a gunicorn factory ("app:create_app()"): each worker picks up the
+    node URL from NODE_URL and peers from the shared database. With
+    start_services the worker also starts its background services.
+    """
+    app = Flask(__name__)
+    # Register blueprints
+    app.register_blueprint(routes_bp)
+    CORS(app)
+    app.wsgi_app = GzipRequestMiddleware(app.wsgi_app)
+    load_node_url()
+    if start_services:
+        start_background_services()
+    return app
+
+def serve_with_gunicorn(port, workers=WEB_WORKERS, threads=WEB_THREADS):
+    """Serve create_app() from gunicorn worker processes with threaded workers."""
+    from gunicorn.app.base import BaseApplication
+
+    class NodeApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'0.0.0.0:{port}',
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'timeout': WEB_TIMEOUT,
+                'keepalive': WEB_KEEPALIVE
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return create_app()
+
+    # Connections opened during startup must not be shared with forked workers
+    db.pool.close_all()
+    peer_client.close()
+    NodeApplication().run()
+
 if __name__ == "__main__":
-    # Clear other_nodes to ensure clean state
-    other_nodes.clear()
-    logger.info("Cleared other_nodes set at startup")
+    # Peers known from the previous run are kept; dead ones are skipped until they answer again
 
     # Default bootstrap URL
     bootstrap_url = os.getenv('BOOTSTRAP_URL', 'http://localhost:5000')
-    
+
     # Determine if this is the bootstrap node
     port = 5000  # Default for bootstrap
     node_url = os.getenv('NODE_URL', f'http://localhost:{port}')
-    
+
     if bootstrap_url == node_url:
-        # First node: Try port 5000 or find a free port
-        port = find_free_port(5000)  # Start at 5000, find free port if needed
+        # First node: use NODE_PORT if given, otherwise try port 5000 or find a free port
+        port = int(os.getenv('NODE_PORT', 0)) or find_free_port(5000)
         node_url = f'http://localhost:{port}'
-        if port != 5000:
+        if port != 5000 and not os.getenv('NODE_PORT'):
             logger.warning(f"Default bootstrap port 5000 was in use. Using port {port} instead.")
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -41,21 +82,32 @@ if __name__ == "__main__":
             logger.error("Please stop other processes using the port or set a different BOOTSTRAP_URL.")
             sys.exit(1)
     else:
-        # Non-bootstrap node: Find a free port
-        port = find_free_port(5001)  # Start at 5001 to avoid bootstrap port
+        # Non-bootstrap node: use NODE_PORT if given, otherwise find a free port
+        port = int(os.getenv('NODE_PORT', 0)) or find_free_port(5001)  # Start at 5001 to avoid bootstrap port
         node_url = os.getenv('NODE_URL', f'http://localhost:{port}')
-    
-    # Initialize this_node_url
+
+    # Initialize this_node_url and publish it to worker processes
     initialize_node_url(port)
-    
+    os.environ['NODE_URL'] = network.this_node_url
+
     # Register with bootstrap node or become bootstrap
     if not try_register_with_bootstrap(bootstrap_url, node_url):
         logger.error("Failed to initialize node. Exiting.")
         sys.exit(1)
-    
+
     logger.info(f"Starting node on {node_url}, other_nodes: {other_nodes}")
+    if NODE_SERVER == 'gunicorn' and os.name == 'posix':
+        try:
+            serve_with_gunicorn(port)
+            sys.exit(0)
+        except ImportError:
+            logger.warning("gunicorn is not installed; falling back to the Flask development server")
+
+    # Development server: start background work in the serving process only (not the reloader's watcher)
+    debug = os.getenv('NODE_DEBUG', '0') == '1'
+    app = create_app(start_services=not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     try:
-        app.run(host="0.0.0.0", port=port, debug=True)
+        app.run(host="0.0.0.0", port=port, debug=debug, threaded=True)
     except Exception as e:
         logger.error(f"Failed to start Flask server: {str(e)}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
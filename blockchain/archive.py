@@ -0,0 +1,349 @@
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from config import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_DIR, ARCHIVE_INTERVAL, ARCHIVE_BATCH_ROWS,
+    ARCHIVE_OPEN_PARTITIONS, ARCHIVE_MMAP_SIZE
+)
+from db import connection, transaction
+import search
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hot/cold storage for approved news. Articles dated before the retention
+# window are copied into one SQLite file per month under ARCHIVE_DIR, with
+# its own full-text index, and then removed from the hot news table.
+# Partition files never change once written (articles for an archived month
+# that arrive later go into another file for that month), so readers open
+# them read-only and immutable: no locking, and pages are memory-mapped.
+#
+# archive_partitions lists the files with their id and date ranges, so a
+# query only opens the files that can contribute rows. archived_hashes keeps
+# the hash and id of every archived article in the hot database: archived
+# articles stay in the Merkle tree, are still rejected as duplicates, and
+# can be found by hash or id without opening every file.
+PARTITION_COLUMNS = ('id', 'headline', 'body', 'author', 'date', 'approved', 'news_hash')
+
+Partition = namedtuple('Partition', 'name month count min_id max_id min_date max_date')
+
+def init_archive(cursor):
+    """Create the partition catalog, the archived hash set and the approved_hashes view over both tiers."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            name TEXT PRIMARY KEY,
+            month TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            min_id INTEGER NOT NULL,
+            max_id INTEGER NOT NULL,
+            min_date TEXT NOT NULL,
+            max_date TEXT NOT NULL,
+            sealed INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_hashes (
+            news_hash TEXT PRIMARY KEY,
+            id INTEGER NOT NULL,
+            partition TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_hashes_id ON archived_hashes(id)')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS approved_hashes AS
+        SELECT news_hash FROM news WHERE approved = 1
+        UNION ALL
+        SELECT news_hash FROM archived_hashes
+    ''')
+    # An archived article sent again by a peer must not come back into the hot table
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS archive_news_dedupe BEFORE INSERT ON news
+        WHEN EXISTS (SELECT 1 FROM archived_hashes WHERE news_hash = NEW.news_hash)
+        BEGIN
+            SELECT RAISE(IGNORE);
+        END
+    ''')
+
+def list_partitions(conn):
+    """Every partition in the catalog of the database conn is connected to."""
+    return [Partition(*row) for row in conn.execute(
+        'SELECT name, month, count, min_id, max_id, min_date, max_date FROM archive_partitions'
+    )]
+
+class _OpenPartition:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.closed = False
+
+class PartitionReader:
+    """Read-only connections to partition files, shared by this process's threads.
+
+    At most max_open files are kept open, least recently used first out;
+    each connection runs one query at a time.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, max_open=ARCHIVE_OPEN_PARTITIONS):
+        self.directory = directory
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(self, name):
+        return os.path.abspath(os.path.join(self.directory, name))
+
+    def _connect(self, name):
+        uri = f"{pathlib.Path(self.path_for(name)).as_uri()}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        conn.execute(f'PRAGMA mmap_size = {int(ARCHIVE_MMAP_SIZE)}')
+        return conn
+
+    def _get(self, name):
+        with self._lock:
+            partition = self._open.get(name)
+            if partition is not None:
+                self._open.move_to_end(name)
+                return partition
+            partition = self._open[name] = _OpenPartition(self._connect(name))
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                with evicted.lock:
+                    evicted.closed = True
+                    evicted.conn.close()
+            return partition
+
+    def query(self, name, sql, params=()):
+        """Run a read query against one partition file and return its rows."""
+        while True:
+            partition = self._get(name)
+            with partition.lock:
+                # Evicted between lookup and lock: open it again
+                if not partition.closed:
+                    return partition.conn.execute(sql, params).fetchall()
+
+    def close_all(self):
+        with self._lock:
+            partitions, self._open = list(self._open.values()), OrderedDict()
+        for partition in partitions:
+            with partition.lock:
+                partition.closed = True
+                partition.conn.close()
+
+partition_reader = PartitionReader()
+
+def merge_id_page(cursor, hot_rows, columns, after_id, limit):
+    """Merge a page of hot rows in id order with the archived articles that fall within it.
+
+    The archived ids come from archived_hashes, so only the partitions that
+    hold rows of the page are read. columns must include id.
+    """
+    id_index = columns.index('id')
+    rows = {row[id_index]: row for row in hot_rows}
+    archived = cursor.execute('SELECT id, partition FROM archived_hashes WHERE id > ? ORDER BY id LIMIT ?',
+                              (after_id or 0, limit)).fetchall()
+    page_ids = set(sorted(set(rows) | {news_id for news_id, _ in archived})[:limit])
+    by_partition = {}
+    for news_id, name in archived:
+        if news_id in page_ids and news_id not in rows:
+            by_partition.setdefault(name, []).append(news_id)
+    for name, ids in by_partition.items():
+        for row in partition_reader.query(
+            name, f"SELECT {', '.join(columns)} FROM news WHERE id IN ({','.join('?' * len(ids))})", ids
+        ):
+            rows[row[id_index]] = row
+    return sorted((row for news_id, row in rows.items() if news_id in page_ids), key=lambda row: row[id_index])
+
+def merge_date_page(hot_rows, partitions, sql, params, limit, after_date=None, id_index=0, date_index=1):
+    """Merge a newest-first keyset page of hot rows with the same page read from the partitions that can still contribute.
+
+    sql must select the page from a table named news and is run unchanged
+    against each partition. Partitions are visited newest first, and the walk
+    stops once limit rows are in hand that no remaining partition can beat.
+    Rows are deduplicated by id, since an article is briefly in both tiers
+    while it is being archived.
+    """
+    key = lambda row: (row[date_index], row[id_index])
+    candidates = sorted((p for p in partitions if after_date is None or p.min_date <= after_date),
+                        key=lambda p: p.max_date, reverse=True)
+    rows = {row[id_index]: row for row in hot_rows}
+    page = sorted(rows.values(), key=key, reverse=True)[:limit]
+    for partition in candidates:
+        if len(page) >= limit and partition.max_date < page[-1][date_index]:
+            break
+        for row in partition_reader.query(partition.name, sql, params):
+            rows.setdefault(row[id_index], row)
+        page = sorted(rows.values(), key=key, reverse=True)[:limit]
+        rows = {row[id_index]: row for row in page}
+    return page
+
+def find_archived_date(conn, news_id):
+    """Date of an archived article by id, or None."""
+    row = conn.execute('SELECT partition FROM archived_hashes WHERE id = ?', (news_id,)).fetchone()
+    if row is None:
+        return None
+    dates = partition_reader.query(row[0], 'SELECT date FROM news WHERE id = ?', (news_id,))
+    return dates[0][0] if dates else None
+
+def get_archived_by_hashes(conn, hashes):
+    """(headline, body, author, news_hash, date) rows of the archived articles among hashes."""
+    by_partition = {}
+    for start in range(0, len(hashes), 500):
+        chunk = hashes[start:start + 500]
+        for news_hash, name in conn.execute(
+            f"SELECT news_hash, partition FROM archived_hashes WHERE news_hash IN ({','.join('?' * len(chunk))})", chunk
+        ):
+            by_partition.setdefault(name, []).append(news_hash)
+    rows = []
+    for name, part_hashes in by_partition.items():
+        for start in range(0, len(part_hashes), 500):
+            chunk = part_hashes[start:start + 500]
+            rows.extend(partition_reader.query(name, f'''
+                SELECT headline, body, author, news_hash, date FROM news
+                WHERE news_hash IN ({','.join('?' * len(chunk))})
+            ''', chunk))
+    return rows
+
+def copy_archive_into(conn):
+    """Insert every archived article back into the news table of conn (e.g. a snapshot copy without triggers)."""
+    for partition in list_partitions(conn):
+        conn.execute('ATTACH DATABASE ? AS archived', (partition_reader.path_for(partition.name),))
+        try:
+            conn.execute(f'''
+                INSERT OR IGNORE INTO news ({', '.join(PARTITION_COLUMNS)})
+                SELECT {', '.join(PARTITION_COLUMNS)} FROM archived.news
+            ''')
+        finally:
+            conn.execute('DETACH DATABASE archived')
+
+def _next_month(month):
+    year, number = map(int, month.split('-'))
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+def _build_partition(month, path):
+    """Copy the hot articles dated in month into a new partition file. Returns its catalog stats, or None."""
+    part = sqlite3.connect(path, isolation_level=None)
+    try:
+        part.execute('''
+            CREATE TABLE news (
+                id INTEGER PRIMARY KEY,
+                headline TEXT NOT NULL,
+                body TEXT NOT NULL,
+                author TEXT NOT NULL,
+                date TEXT NOT NULL,
+                approved INTEGER NOT NULL,
+                news_hash TEXT
+            )
+        ''')
+        part.execute('BEGIN')
+        after = ('', 0)
+        while True:
+            with connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT {', '.join(PARTITION_COLUMNS)} FROM news
+                    WHERE approved = 1 AND date >= ? AND date < ? AND (date, id) > (?, ?)
+                    ORDER BY date, id LIMIT ?
+                ''', (month, _next_month(month), *after, ARCHIVE_BATCH_ROWS)).fetchall()
+            part.executemany(f"INSERT INTO news VALUES ({', '.join('?' * len(PARTITION_COLUMNS))})", rows)
+            if len(rows) < ARCHIVE_BATCH_ROWS:
+                break
+            after = (rows[-1][4], rows[-1][0])
+        part.execute('CREATE UNIQUE INDEX idx_news_hash ON news(news_hash)')
+        part.execute('CREATE INDEX idx_news_approved_date ON news(approved, date, id)')
+        if search.fts_enabled:
+            part.execute(search.FTS_TABLE_SQL)
+            part.execute("INSERT INTO news_fts (news_fts) VALUES ('rebuild')")
+        part.execute('COMMIT')
+        stats = part.execute('SELECT COUNT(*), MIN(id), MAX(id), MIN(date), MAX(date) FROM news').fetchone()
+        part.execute('VACUUM')
+        return stats if stats[0] else None
+    finally:
+        part.close()
+
+def _remove_archived_rows(name):
+    """Move a partition's articles out of the hot table in batches, then mark the partition sealed."""
+    after_id = 0
+    while True:
+        rows = partition_reader.query(name, 'SELECT id, news_hash FROM news WHERE id > ? ORDER BY id LIMIT ?',
+                                      (after_id, ARCHIVE_BATCH_ROWS))
+        if rows:
+            with transaction(immediate=True) as cursor:
+                # Hashes first: the Merkle delete trigger keeps archived articles in the tree
+                cursor.executemany('''
+                    INSERT INTO archived_hashes (news_hash, id, partition) VALUES (?, ?, ?)
+                    ON CONFLICT(news_hash) DO NOTHING
+                ''', [(news_hash, news_id, name) for news_id, news_hash in rows])
+                cursor.executemany('DELETE FROM news WHERE id = ? AND news_hash = ?', rows)
+            after_id = rows[-1][0]
+        if len(rows) < ARCHIVE_BATCH_ROWS:
+            break
+    with transaction() as cursor:
+        cursor.execute('UPDATE archive_partitions SET sealed = 1 WHERE name = ?', (name,))
+
+def archive_month(month):
+    """Archive the hot approved articles dated in month ('YYYY-MM') into a new partition. Returns the number moved."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    created_at = time.time()
+    name = f"news-{month}-{int(created_at * 1000)}.db"
+    path = partition_reader.path_for(name)
+    try:
+        stats = _build_partition(month, f"{path}.tmp")
+        if stats is None:
+            os.remove(f"{path}.tmp")
+            return 0
+        os.chmod(f"{path}.tmp", 0o444)
+        os.replace(f"{path}.tmp", path)
+    except BaseException:
+        if os.path.exists(f"{path}.tmp"):
+            os.remove(f"{path}.tmp")
+        raise
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO archive_partitions (name, month, count, min_id, max_id, min_date, max_date, sealed, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+        ''', (name, month, *stats, created_at))
+    _remove_archived_rows(name)
+    logger.info(f"Archived {stats[0]} articles from {month} into {name}")
+    return stats[0]
+
+def archive_cutoff(after_days=ARCHIVE_AFTER_DAYS):
+    """First month ('YYYY-MM') that stays hot: whole months dated before it are archived."""
+    return (datetime.utcnow() - timedelta(days=after_days)).strftime('%Y-%m')
+
+def archive_old_news(after_days=ARCHIVE_AFTER_DAYS):
+    """Archive every whole month of approved news before the cutoff. Returns the number of articles moved."""
+    with connection() as conn:
+        unsealed = [row[0] for row in conn.execute('SELECT name FROM archive_partitions WHERE sealed = 0')]
+        months = [row[0] for row in conn.execute('''
+            SELECT DISTINCT substr(date, 1, 7) FROM news
+            WHERE approved = 1 AND date < ? AND date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*'
+        ''', (archive_cutoff(after_days),))]
+    # Finish moves interrupted by a restart before starting new ones
+    for name in unsealed:
+        _remove_archived_rows(name)
+    return sum(archive_month(month) for month in sorted(months))
+
+def run_archiver(interval=ARCHIVE_INTERVAL):
+    """Archive old news now and then every interval seconds."""
+    while True:
+        try:
+            archived = archive_old_news()
+            if archived:
+                logger.info(f"Archived {archived} articles older than {ARCHIVE_AFTER_DAYS} days")
+        except Exception as e:
+            logger.error(f"Error archiving old news: {str(e)}")
+        time.sleep(interval)
+
+def start_archiver(interval=ARCHIVE_INTERVAL):
+    """Start the background archiver unless archiving is disabled."""
+    if ARCHIVE_AFTER_DAYS <= 0 or interval <= 0:
+        return None
+    thread = threading.Thread(target=run_archiver, args=(interval,), name="archiver", daemon=True)
+    thread.start()
+    logger.info(f"Archiving approved news older than {ARCHIVE_AFTER_DAYS} days every {interval}s")
+    return thread
@@ -0,0 +1,165 @@
+import functools
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, make_response, request
+from config import RESPONSE_CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL
+from db import connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Data versions: one counter per scope, bumped by triggers in the same
+# transaction as every write to the scope's table, so all worker processes
+# see a change as soon as it commits. A cached response or ETag is valid for
+# as long as the versions it was built from are current.
+DATA_VERSION_TABLES = {'approved': 'news', 'pending': 'pending_news'}
+
+def init_data_versions(cursor):
+    """Create the data version counters and the triggers that bump them."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    # A random epoch per database keeps ETags from matching after the database is recreated
+    cursor.execute('INSERT INTO data_versions (scope, version) VALUES (?, ?) ON CONFLICT(scope) DO NOTHING',
+                   ('epoch', secrets.randbits(62)))
+    for scope, table in DATA_VERSION_TABLES.items():
+        cursor.execute('INSERT INTO data_versions (scope, version) VALUES (?, 0) ON CONFLICT(scope) DO NOTHING', (scope,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS data_version_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE scope = '{scope}';
+                END
+            ''')
+
+def data_versions(scopes):
+    """Current version of each scope, as a tuple in the given order."""
+    with connection() as conn:
+        versions = dict(conn.execute(
+            f"SELECT scope, version FROM data_versions WHERE scope IN ({','.join('?' * len(scopes))})", scopes
+        ).fetchall())
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
+class ResponseCache:
+    """Size-bounded LRU of serialized responses with a TTL.
+
+    Entries are stored with the data versions they were built from and are
+    only served while those versions are current.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, versions):
+        """The cached (status, headers, body) for key at these versions, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != versions or entry[1] < now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, versions, status, headers, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[2][2])
+            self._entries[key] = (versions, time.monotonic() + self.ttl, (status, headers, body))
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2][2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified
+            }
+
+response_cache = ResponseCache()
+
+def _request_key():
+    """Everything a cached GET response depends on besides the data: path, query and negotiated headers."""
+    return (
+        request.path,
+        tuple(sorted(request.args.items(multi=True))),
+        request.headers.get('Accept', ''),
+        request.headers.get('Accept-Encoding', '')
+    )
+
+def _etag(key, versions):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return f"{'.'.join(map(str, versions))}-{digest}"
+
+def cached_response(*scopes):
+    """Serve a GET view from the response cache while the data versions of scopes are unchanged.
+
+    Responses carry an ETag derived from those versions, so a client
+    revalidating with If-None-Match gets a 304 from any worker process
+    without the view running. Only complete 200 responses are cached;
+    streamed ones pass straight through.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED:
+                return view(*args, **kwargs)
+            try:
+                versions = data_versions(('epoch',) + scopes)
+            except Exception as e:
+                logger.error(f"Error reading data versions, serving uncached: {str(e)}")
+                return view(*args, **kwargs)
+            key = _request_key()
+            etag = _etag(key, versions)
+            if etag in request.if_none_match:
+                response_cache.not_modified += 1
+                response = Response(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                response.vary.update(('Accept', 'Accept-Encoding'))
+                return response
+
+            cached = response_cache.get(key, versions)
+            if cached is not None:
+                status, headers, body = cached
+                return Response(body, status=status, headers=headers)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+                return response
+            response.set_etag(etag)
+            # Browsers revalidate on every fetch and reuse their copy on a 304
+            response.headers['Cache-Control'] = 'no-cache'
+            response_cache.put(key, versions, response.status_code, list(response.headers.items()), response.get_data())
+            return response
+        return wrapper
+    return decorator
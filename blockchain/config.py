@@ -1,3 +1,133 @@
+import os
+
 BOOTSTRAP_URL = "http://localhost:5000"
 START_PORT = 5000
 MAX_PORT_TRIES = 50
+
+# SQLite connection pool
+DB_PATH = "news.db"
+DB_POOL_SIZE = 16
+DB_POOL_TIMEOUT = 10  # seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KB = 65536
+DB_MMAP_SIZE = 268435456
+DB_CACHED_STATEMENTS = 256
+
+# Peer gossip fan-out
+GOSSIP_MAX_WORKERS = 32
+GOSSIP_CONNECT_TIMEOUT = 2  # seconds per peer
+GOSSIP_READ_TIMEOUT = 5  # seconds per peer
+GOSSIP_DEADLINE = 6  # seconds for a whole broadcast round
+
+# Background gossip dispatcher
+GOSSIP_ASYNC = True  # enqueue gossip to the outbox instead of sending inline
+DISPATCH_BATCH_SIZE = 50  # outbox rows fetched per worker wake-up
+DISPATCH_IDLE_POLL = 2.0  # seconds between outbox polls when a peer queue is empty
+DISPATCH_RETRY_BASE = 0.5  # seconds, doubled per failed attempt
+DISPATCH_RETRY_MAX = 60  # seconds
+DISPATCH_MAX_ATTEMPTS = 12
+DISPATCH_LATENCY_SAMPLES = 1000
+DISPATCH_MAX_AGE = 3600  # seconds a message may wait for a peer whose circuit is open
+DISPATCH_CLAIM_LEASE = 30  # seconds a worker holds outbox rows it is delivering before others may retry them
+GOSSIP_LINGER = 0.02  # seconds a fresh outbox message waits for others to the same peer to coalesce with
+GOSSIP_BATCH_MAX_MESSAGES = 100  # messages per coalesced /gossip/batch request; a full batch is sent at once
+DISPATCH_LEGACY_RECHECK = 600  # seconds a peer that answered /gossip/batch with 404 gets individual requests before batches are tried again
+
+# Gossip loop suppression
+GOSSIP_MAX_HOPS = 4  # messages are not forwarded once they have travelled this many hops
+SEEN_CACHE_TTL = 600  # seconds a message ID is remembered
+SEEN_PRUNE_EVERY = 1000  # messages marked seen per process between prunes of expired IDs
+
+# Peer selection: "broadcast" sends to every peer, "epidemic" to GOSSIP_FANOUT random peers per hop
+GOSSIP_MODE = os.getenv('GOSSIP_MODE', 'broadcast')
+GOSSIP_FANOUT = int(os.getenv('GOSSIP_FANOUT', 3))
+GOSSIP_EPIDEMIC_MAX_HOPS = int(os.getenv('GOSSIP_EPIDEMIC_MAX_HOPS', 10))
+ANTI_ENTROPY_INTERVAL = float(os.getenv('ANTI_ENTROPY_INTERVAL', 30))  # seconds, 0 disables
+ANTI_ENTROPY_MAX_ITEMS = 500  # articles exchanged per push-pull round
+
+# Incremental peer sync
+SYNC_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+SYNC_MAX_WORKERS = 4  # concurrent background sync jobs per process
+SYNC_STATUS_JOBS = 20  # jobs listed by /sync_status
+SYNC_SUBTREE_PASSES = 3  # diff-and-pull rounds per Merkle subtree during catch-up
+SYNC_READ_TIMEOUT = 10  # seconds without data before a peer sync page or stream is abandoned
+
+# Full-text search
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_HEADLINE_WEIGHT = 5.0  # BM25 weight of headline matches relative to body matches
+
+# Listings and batch endpoints
+DEFAULT_PAGE_SIZE = 50  # /approved_news and /toverify page size for a cursor without a limit
+STREAM_CHUNK_ROWS = 500  # rows read and sent per chunk of a streamed listing
+BATCH_MAX_ITEMS = 1000  # items accepted by /news/batch, /votes/batch and /gossip/batch per request
+
+# Peer HTTP connections and wire format
+PEER_POOL_MAXSIZE = 8  # keep-alive connections kept per peer host
+PEER_POOL_BLOCK = False  # when True, wait for a free pooled connection instead of opening an extra one
+PEER_GZIP = os.getenv('PEER_GZIP', '0') == '1'  # gzip JSON request bodies to peers (all peers must run this version)
+PEER_GZIP_MIN_BYTES = 1024  # smaller bodies are sent uncompressed
+MAX_REQUEST_BODY_BYTES = 64 * 1024 * 1024  # limit for inflated gzip request bodies
+PEER_WIRE_FORMAT = os.getenv('PEER_WIRE_FORMAT', 'json')  # 'msgpack' to send MessagePack bodies (needs msgpack on all peers)
+WIRE_COMPRESS_MIN_BYTES = 4096  # peer responses at least this large are zstd/gzip compressed when accepted
+
+# Web server and background service leader
+NODE_SERVER = os.getenv('NODE_SERVER', 'gunicorn')  # 'gunicorn' (multi-worker) or 'flask' (development server)
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', os.cpu_count() or 1))  # gunicorn worker processes
+WEB_THREADS = int(os.getenv('WEB_THREADS', 8))  # request threads per worker
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 30))  # seconds before gunicorn restarts a stuck worker
+WEB_KEEPALIVE = 5  # seconds an idle peer connection is kept open
+LEADER_LOCK_PATH = f"{DB_PATH}.leader"  # lock file electing the worker that runs node-wide background services
+LEADER_RETRY_INTERVAL = 5  # seconds between attempts to take over leadership
+
+# Peer health checks and circuit breaker
+PEER_DEAD_AFTER_FAILURES = 3  # consecutive failed requests before a peer is skipped
+PEER_OPEN_BASE = 5  # seconds a dead peer's circuit stays open before the first probe
+PEER_OPEN_MAX = 300  # cap for the doubling open period after failed probes
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 5))  # seconds between heartbeats, 0 disables
+HEALTH_CHECK_TIMEOUT = 1.5  # seconds a heartbeat may take
+PEER_RTT_ALPHA = 0.2  # weight of the newest sample in the smoothed RTT
+PEER_STATS_FLUSH_INTERVAL = 1.0  # seconds between last-seen/RTT writes per peer
+
+# Snapshot bootstrap
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', f"{DB_PATH}.snapshots")  # where this node keeps the snapshot it serves
+SNAPSHOT_MAX_AGE = 600  # seconds before a manifest request triggers a fresh snapshot build
+SNAPSHOT_COMPRESS_LEVEL = 6  # gzip level of snapshot files
+SNAPSHOT_CHUNK_BYTES = 1024 * 1024  # read/write chunk when compressing, downloading and inflating
+SNAPSHOT_BUILD_WAIT = 300  # seconds a fetching node waits for a peer to build its first snapshot
+SNAPSHOT_READ_TIMEOUT = 60  # seconds without data before a snapshot download is abandoned
+SNAPSHOT_MIN_ITEMS = int(os.getenv('SNAPSHOT_MIN_ITEMS', 10000))  # catch-up starts from a snapshot when this many articles are missing, 0 disables
+
+# Response cache
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE', '1') == '1'  # cache /approved_news, /toverify and /search responses
+CACHE_MAX_ENTRIES = 1024  # cached responses kept per worker process
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # total size of cached response bodies per worker process
+CACHE_TTL = 60  # seconds a cached response is served even if the data versions are unchanged
+
+# Server-sent event streams
+EVENTS_POLL_INTERVAL = 0.2  # seconds between event table polls per worker process while streams are open
+EVENTS_BUFFER_SIZE = 1000  # recent events kept in memory for streams resuming from Last-Event-ID
+EVENTS_BATCH_SIZE = 500  # events read per poll
+EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+EVENTS_RETRY_MS = 2000  # reconnect delay sent to EventSource clients
+EVENTS_STREAM_MAX_SECONDS = 300  # a stream ends after this long and the client reconnects
+EVENTS_MAX_STREAMS = max(1, WEB_THREADS // 2)  # open /events streams per worker process, each holds a thread
+EVENTS_RETENTION = 24 * 3600  # seconds events are kept for resuming clients
+EVENTS_PRUNE_INTERVAL = 600  # seconds between event pruning runs, 0 disables
+
+# Cold archive partitions
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 0))  # approved news dated before this many days moves to monthly cold partitions, 0 disables
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', f"{DB_PATH}.archive")  # where the read-only partition files live
+ARCHIVE_INTERVAL = 3600  # seconds between archiving runs
+ARCHIVE_BATCH_ROWS = 2000  # rows copied to a partition or removed from the hot table per transaction
+ARCHIVE_OPEN_PARTITIONS = 64  # partition files kept open per worker process
+ARCHIVE_MMAP_SIZE = 256 * 1024 * 1024  # bytes of each open partition that are memory-mapped
+
+# Pending maintenance
+PENDING_TTL = int(os.getenv('PENDING_TTL', 7 * 24 * 3600))  # seconds a pending item may wait for approval before it expires, 0 disables
+PENDING_TOMBSTONE_TTL = 30 * 24 * 3600  # seconds the hash of a rejected or expired item is kept so peers cannot send it back
+MAINTENANCE_INTERVAL = float(os.getenv('MAINTENANCE_INTERVAL', 600))  # seconds between pending cleanup runs, 0 disables
+MAINTENANCE_BATCH_ROWS = 1000  # pending items, votes or tombstones removed per transaction
+VACUUM_PAGES = 2000  # free pages returned to the file system per incremental vacuum step
+ANALYZE_LIMIT = 1000  # rows sampled per index when refreshing planner statistics
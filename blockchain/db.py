@@ -0,0 +1,143 @@
+import sqlite3
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from config import (
+    DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_CACHED_STATEMENTS
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared by all request threads.
+
+    A thread that already holds a connection gets the same one back when it
+    asks again, so helpers called inside a transaction join it instead of
+    opening a second connection.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._functions = {}
+
+    def register_function(self, name, num_params, func):
+        """Make a Python function callable from SQL (e.g. in triggers) on every pooled connection."""
+        with self._lock:
+            self._functions[name] = (num_params, func)
+            idle = []
+            while True:
+                try:
+                    idle.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            for conn in idle:
+                conn.create_function(name, num_params, func, deterministic=True)
+                self._idle.put(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=DB_CACHED_STATEMENTS
+        )
+        # Only takes effect on a new database; existing ones switch with 'python maintenance.py convert'
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute(f'PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}')
+        conn.execute(f'PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}')
+        conn.execute(f'PRAGMA mmap_size = {int(DB_MMAP_SIZE)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        for name, (num_params, func) in self._functions.items():
+            conn.create_function(name, num_params, func, deterministic=True)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"No database connection available after {self.timeout}s")
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the current thread, reusing one it already holds."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Run the block in a transaction, joining the caller's transaction if one is open."""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn.cursor()
+                return
+            conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            try:
+                yield conn.cursor()
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close_all(self):
+        """Close every idle connection, e.g. at shutdown or after fork."""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+pool = ConnectionPool(DB_PATH)
+
+def register_function(name, num_params, func):
+    """Register a SQL function on all current and future pooled connections."""
+    pool.register_function(name, num_params, func)
+
+def connection():
+    """Check out a pooled connection (autocommit mode) for the current thread."""
+    return pool.connection()
+
+def transaction(immediate=False):
+    """Open a transaction on a pooled connection and yield a cursor."""
+    return pool.transaction(immediate)
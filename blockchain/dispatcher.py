@@ -0,0 +1,354 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from db import connection, transaction
+from peers import peer_registry
+from config import (
+    DISPATCH_BATCH_SIZE, DISPATCH_IDLE_POLL, DISPATCH_RETRY_BASE,
+    DISPATCH_RETRY_MAX, DISPATCH_MAX_ATTEMPTS, DISPATCH_LATENCY_SAMPLES,
+    GOSSIP_LINGER, GOSSIP_BATCH_MAX_MESSAGES, DISPATCH_CLAIM_LEASE, DISPATCH_MAX_AGE,
+    DISPATCH_LEGACY_RECHECK
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class GossipDispatcher:
+    """Delivers outbound peer messages from a persisted SQLite outbox.
+
+    Every message is stored as one outbox row per peer. Each peer has its own
+    worker thread that drains its rows in order, retrying failures with
+    exponential backoff, so a slow or dead peer never delays the others.
+
+    While a peer's circuit breaker is open its rows wait instead of burning
+    retry attempts; rows older than DISPATCH_MAX_AGE are then dropped, as
+    anti-entropy repairs whatever the peer missed.
+
+    Rows are claimed with a short lease before delivery, so dispatchers in
+    several worker processes can share one outbox without sending a row twice.
+
+    Gossip rows are coalesced: a fresh message lingers up to GOSSIP_LINGER
+    seconds so that messages queued for the same peer meanwhile go out
+    together in one /gossip/batch request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._wakeups = {}
+        self._started = False
+        self._running = True
+        self._latencies = deque(maxlen=DISPATCH_LATENCY_SAMPLES)
+        self._delivered = 0
+        self._failed_attempts = 0
+        self._dropped = 0
+        self._batches = 0
+        self._legacy_until = {}  # peer -> time until which it is sent individual requests instead of /gossip/batch
+
+    def init_outbox(self):
+        """Create the outbox table if needed."""
+        with transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    peer TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_error TEXT
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_peer_due ON outbox(peer, next_attempt_at)')
+
+    def start(self):
+        """Create the outbox and resume delivery of messages left over from a previous run."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        try:
+            self.init_outbox()
+            with connection() as conn:
+                peers = [row[0] for row in conn.execute('SELECT DISTINCT peer FROM outbox')]
+            for peer in peers:
+                self._wake(peer)
+            if peers:
+                logger.info(f"Resumed gossip outbox for {len(peers)} peers")
+        except Exception as e:
+            logger.error(f"Error starting gossip dispatcher: {str(e)}")
+
+    def stop(self):
+        """Ask all worker threads to exit after their current delivery."""
+        self._running = False
+        with self._lock:
+            for event in self._wakeups.values():
+                event.set()
+
+    def enqueue(self, path, payload, peers):
+        """Persist a message for each peer and wake their workers. Returns the number of rows queued."""
+        return self.enqueue_many([(peer, path, payload) for peer in peers])
+
+    def enqueue_many(self, entries):
+        """Persist (peer, path, payload) entries in one transaction and wake their workers."""
+        self.start()
+        if not entries:
+            return 0
+        now = time.time()
+        bodies = {}  # serialize a payload shared by several peers once
+        rows = []
+        for peer, path, payload in entries:
+            if id(payload) not in bodies:
+                bodies[id(payload)] = json.dumps(payload)
+            rows.append((peer, path, bodies[id(payload)], now, now))
+        try:
+            with transaction() as cursor:
+                cursor.executemany('''
+                    INSERT INTO outbox (peer, path, payload, next_attempt_at, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+        except Exception as e:
+            logger.error(f"Error enqueueing {len(entries)} messages: {str(e)}")
+            return 0
+        for peer in {peer for peer, _, _ in entries}:
+            self._wake(peer)
+        return len(entries)
+
+    def _wake(self, peer):
+        with self._lock:
+            event = self._wakeups.get(peer)
+            if event is None:
+                event = self._wakeups[peer] = threading.Event()
+            worker = self._workers.get(peer)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self._run_worker, args=(peer,), name=f"dispatch-{peer}", daemon=True)
+                self._workers[peer] = worker
+                worker.start()
+        event.set()
+
+    def _due_messages(self, peer):
+        with connection() as conn:
+            rows = conn.execute('''
+                SELECT id, path, payload, attempts, created_at FROM outbox
+                WHERE peer = ? AND next_attempt_at <= ?
+                ORDER BY id LIMIT ?
+            ''', (peer, time.time(), max(DISPATCH_BATCH_SIZE, GOSSIP_BATCH_MAX_MESSAGES))).fetchall()
+            next_due = None
+            if not rows:
+                next_due = conn.execute('SELECT MIN(next_attempt_at) FROM outbox WHERE peer = ?', (peer,)).fetchone()[0]
+        return rows, next_due
+
+    def _claim(self, peer):
+        """Lease this peer's due rows to this worker; other processes skip them until the lease ends."""
+        now = time.time()
+        with transaction(immediate=True) as cursor:
+            cursor.execute('''
+                UPDATE outbox SET next_attempt_at = ?
+                WHERE id IN (
+                    SELECT id FROM outbox WHERE peer = ? AND next_attempt_at <= ?
+                    ORDER BY id LIMIT ?
+                )
+                RETURNING id, path, payload, attempts, created_at
+            ''', (now + DISPATCH_CLAIM_LEASE, peer, now, max(DISPATCH_BATCH_SIZE, GOSSIP_BATCH_MAX_MESSAGES)))
+            return sorted(cursor.fetchall())
+
+    def _release(self, rows, delay):
+        """Make claimed rows that were not attempted due again after delay seconds."""
+        if not rows:
+            return
+        with transaction() as cursor:
+            cursor.executemany('UPDATE outbox SET next_attempt_at = ? WHERE id = ?',
+                               [(time.time() + delay, row[0]) for row in rows])
+
+    def _is_legacy(self, peer):
+        """Whether peer answered /gossip/batch with a 404 within the last DISPATCH_LEGACY_RECHECK seconds."""
+        return self._legacy_until.get(peer, 0) > time.time()
+
+    def _group(self, peer, rows):
+        """Split due rows into deliveries: runs of gossip rows become one batch, anything else goes alone."""
+        from network import GOSSIP_PATHS
+        coalescible = set(GOSSIP_PATHS.values()) | {'/gossip/batch'}
+        groups, current, count = [], [], 0
+        for row in rows:
+            if self._is_legacy(peer) or row[1] not in coalescible:
+                if current:
+                    groups.append(current)
+                    current, count = [], 0
+                groups.append([row])
+                continue
+            size = len(json.loads(row[2]).get('messages', ())) if row[1] == '/gossip/batch' else 1
+            if current and count + size > GOSSIP_BATCH_MAX_MESSAGES:
+                groups.append(current)
+                current, count = [], 0
+            current.append(row)
+            count += size
+        if current:
+            groups.append(current)
+        return groups
+
+    def _requests_for(self, peer, group):
+        """The (path, payload) requests that deliver a group of outbox rows, in order.
+
+        A peer without /gossip/batch gets each message of a queued batch on
+        that message's own endpoint.
+        """
+        from network import GOSSIP_PATHS
+        if len(group) == 1:
+            path, payload = group[0][1], json.loads(group[0][2])
+            if path == '/gossip/batch' and self._is_legacy(peer):
+                return [(GOSSIP_PATHS[message['type']], message) for message in payload['messages']]
+            return [(path, payload)]
+        messages = []
+        sender = None
+        for _, path, payload, _, _ in group:
+            payload = json.loads(payload)
+            sender = sender or payload.get('sender')
+            messages.extend(payload['messages'] if path == '/gossip/batch' else [payload])
+        return [('/gossip/batch', {'type': 'batch', 'sender': sender, 'messages': messages})]
+
+    def _deliver(self, peer, groups):
+        """Send groups in order, stopping at the first failure.
+
+        The rows after a failed group are held back for as long as it is, so
+        the peer still receives messages in order.
+        """
+        from network import post_to_peer
+        for index, group in enumerate(groups):
+            for path, payload in self._requests_for(peer, group):
+                result = post_to_peer(peer, path, payload)
+                if not result["ok"]:
+                    break
+            else:
+                self._mark_delivered(group)
+                continue
+            if path == '/gossip/batch' and result.get("status") == 404:
+                # Older peer: fall back to one request per message from the next attempt on,
+                # and try batches again later in case it was restarting or has been upgraded
+                logger.info(f"{peer} does not accept gossip batches, sending messages individually for {DISPATCH_LEGACY_RECHECK}s")
+                self._legacy_until[peer] = time.time() + DISPATCH_LEGACY_RECHECK
+                delay = DISPATCH_RETRY_BASE
+                self._release(group, delay)
+            else:
+                delay = self._mark_failed(peer, group, path, result["error"])
+            self._release([row for later in groups[index + 1:] for row in later], delay)
+            return
+
+    def _run_worker(self, peer):
+        event = self._wakeups[peer]
+        while self._running:
+            event.clear()
+            if not peer_registry.is_available(peer):
+                self._expire(peer)
+                event.wait(DISPATCH_IDLE_POLL)
+                continue
+            try:
+                rows, next_due = self._due_messages(peer)
+            except Exception as e:
+                logger.error(f"Error reading gossip outbox for {peer}: {str(e)}")
+                rows, next_due = [], None
+            # Give a fresh, partly filled batch a moment to collect more messages
+            if rows and rows[0][3] == 0 and len(rows) < GOSSIP_BATCH_MAX_MESSAGES:
+                linger = rows[0][4] + GOSSIP_LINGER - time.time()
+                if linger > 0:
+                    time.sleep(linger)
+                    continue
+            if rows:
+                try:
+                    rows = self._claim(peer)
+                except Exception as e:
+                    logger.error(f"Error claiming gossip outbox rows for {peer}: {str(e)}")
+                    rows = []
+            try:
+                self._deliver(peer, self._group(peer, rows))
+            except Exception as e:
+                # Rows left claimed are retried once their lease ends
+                logger.error(f"Error delivering gossip outbox rows for {peer}: {str(e)}")
+                event.wait(DISPATCH_IDLE_POLL)
+                continue
+            if rows:
+                continue
+            timeout = DISPATCH_IDLE_POLL if next_due is None else min(max(next_due - time.time(), 0), DISPATCH_RETRY_MAX)
+            event.wait(timeout)
+
+    def _expire(self, peer):
+        """Drop rows for an unreachable peer that have been queued longer than DISPATCH_MAX_AGE."""
+        try:
+            with transaction() as cursor:
+                cursor.execute('DELETE FROM outbox WHERE peer = ? AND created_at < ?', (peer, time.time() - DISPATCH_MAX_AGE))
+                expired = cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error expiring outbox rows for {peer}: {str(e)}")
+            return
+        if expired:
+            with self._lock:
+                self._dropped += expired
+            logger.warning(f"Dropped {expired} expired messages for unreachable peer {peer}")
+
+    def _mark_delivered(self, group):
+        with transaction() as cursor:
+            cursor.executemany('DELETE FROM outbox WHERE id = ?', [(row[0],) for row in group])
+        now = time.time()
+        with self._lock:
+            self._delivered += len(group)
+            self._batches += 1
+            self._latencies.extend(now - row[4] for row in group)
+
+    def _mark_failed(self, peer, group, path, error):
+        """Schedule a failed group's retry, or drop it after DISPATCH_MAX_ATTEMPTS. Returns the retry delay."""
+        with self._lock:
+            self._failed_attempts += 1
+        attempts = max(row[3] for row in group) + 1
+        if attempts >= DISPATCH_MAX_ATTEMPTS:
+            with transaction() as cursor:
+                cursor.executemany('DELETE FROM outbox WHERE id = ?', [(row[0],) for row in group])
+            with self._lock:
+                self._dropped += len(group)
+            logger.error(f"Dropping {len(group)} message(s) for {peer} ({path}) after {attempts} attempts: {error}")
+            return 0
+        delay = min(DISPATCH_RETRY_BASE * (2 ** (attempts - 1)), DISPATCH_RETRY_MAX)
+        delay *= random.uniform(0.8, 1.2)
+        with transaction() as cursor:
+            cursor.executemany('''
+                UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            ''', [(attempts, time.time() + delay, error, row[0]) for row in group])
+        logger.warning(f"Delivery of {path} to {peer} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+        return delay
+
+    def stats(self):
+        """Queue depth per peer plus delivery counters and latency percentiles."""
+        with connection() as conn:
+            depth = dict(conn.execute('SELECT peer, COUNT(*) FROM outbox GROUP BY peer').fetchall())
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = {
+                "delivered": self._delivered,
+                "requests": self._batches,
+                "failed_attempts": self._failed_attempts,
+                "dropped": self._dropped,
+                "active_workers": sum(1 for worker in self._workers.values() if worker.is_alive())
+            }
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 4)
+
+        return {
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_peer": depth,
+            **counters,
+            "delivery_latency": {
+                "samples": len(latencies),
+                "avg": round(sum(latencies) / len(latencies), 4) if latencies else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 4) if latencies else None
+            }
+        }
+
+dispatcher = GossipDispatcher()
@@ -0,0 +1,231 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from config import (
+    EVENTS_POLL_INTERVAL, EVENTS_BUFFER_SIZE, EVENTS_BATCH_SIZE, EVENTS_HEARTBEAT, EVENTS_RETRY_MS,
+    EVENTS_STREAM_MAX_SECONDS, EVENTS_MAX_STREAMS, EVENTS_RETENTION, EVENTS_PRUNE_INTERVAL
+)
+from db import connection, transaction
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Change feed. Triggers append an event row in the same transaction as every
+# change the frontend shows, whichever code path makes it (votes, gossip,
+# sync, anti-entropy). Payloads already have the shape /toverify and
+# /approved_news return, so clients can patch their lists in place. Each
+# worker process polls the table once per EVENTS_POLL_INTERVAL and fans new
+# events out to its open streams.
+NOW = "(julianday('now') - 2440587.5) * 86400.0"
+PENDING_PAYLOAD = '''json_object(
+    'id', NEW.id, 'news_hash', NEW.news_hash, 'title', NEW.headline, 'description', NEW.body,
+    'author', NEW.author, 'publishedAt', NEW.date, 'approval_rate', round(coalesce(NEW.approval_rate, 0) * 100, 1)
+)'''
+EVENT_TRIGGERS = {
+    'events_pending_insert': f'''
+        AFTER INSERT ON pending_news BEGIN
+            INSERT INTO events (type, data, created_at) VALUES ('pending_added', {PENDING_PAYLOAD}, {NOW});
+        END''',
+    'events_pending_tally': f'''
+        AFTER UPDATE OF approval_votes, disapproval_votes, approval_rate ON pending_news
+        WHEN OLD.approval_votes IS NOT NEW.approval_votes OR OLD.disapproval_votes IS NOT NEW.disapproval_votes
+        BEGIN
+            INSERT INTO events (type, data, created_at) VALUES ('vote_tally', json_object(
+                'id', NEW.id, 'news_hash', NEW.news_hash, 'approval_votes', NEW.approval_votes,
+                'disapproval_votes', NEW.disapproval_votes, 'total_nodes', NEW.total_nodes,
+                'approval_rate', round(coalesce(NEW.approval_rate, 0) * 100, 1)
+            ), {NOW});
+        END''',
+    'events_pending_delete': f'''
+        AFTER DELETE ON pending_news BEGIN
+            INSERT INTO events (type, data, created_at)
+            VALUES ('pending_removed', json_object('id', OLD.id, 'news_hash', OLD.news_hash), {NOW});
+        END''',
+    'events_news_insert': f'''
+        AFTER INSERT ON news WHEN NEW.approved = 1 BEGIN
+            INSERT INTO events (type, data, created_at) VALUES ('approved', json_object(
+                'id', NEW.id, 'news_hash', NEW.news_hash, 'headline', NEW.headline, 'body', NEW.body,
+                'author', NEW.author, 'date', NEW.date
+            ), {NOW});
+        END'''
+}
+
+def init_events(cursor):
+    """Create the events table and the triggers that fill it."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)')
+    for name, body in EVENT_TRIGGERS.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+
+def read_events(after_id, limit=EVENTS_BATCH_SIZE):
+    """Events after after_id in order, as (id, type, data) tuples."""
+    with connection() as conn:
+        return conn.execute('SELECT id, type, data FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                            (after_id, limit)).fetchall()
+
+def event_id_range():
+    """(oldest, latest) retained event ids; (0, 0) when there are none."""
+    with connection() as conn:
+        oldest, latest = conn.execute('SELECT MIN(id), MAX(id) FROM events').fetchone()
+    return oldest or 0, latest or 0
+
+def prune_events(max_age=EVENTS_RETENTION, batch_size=5000):
+    """Delete events older than max_age seconds in batches. Returns the number deleted."""
+    cutoff = time.time() - max_age
+    deleted = 0
+    while True:
+        with transaction(immediate=True) as cursor:
+            cursor.execute('''
+                DELETE FROM events WHERE id IN (SELECT id FROM events WHERE created_at < ? ORDER BY id LIMIT ?)
+            ''', (cutoff, batch_size))
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def format_event(event_id, event_type, data):
+    """One Server-Sent Events message."""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+class EventFeed:
+    """Polls the events table for this process and hands new events to open streams.
+
+    The most recent EVENTS_BUFFER_SIZE events are kept in memory, so a
+    stream resuming from a recent Last-Event-ID is served without a query.
+    """
+
+    def __init__(self, poll_interval=EVENTS_POLL_INTERVAL, buffer_size=EVENTS_BUFFER_SIZE, max_streams=EVENTS_MAX_STREAMS):
+        self.poll_interval = poll_interval
+        self.max_streams = max_streams
+        self._recent = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._last_id = None
+        self._thread = None
+        self._streams = 0
+
+    def _start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._last_id = event_id_range()[1]
+            self._thread = threading.Thread(target=self._run, name="event-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                rows = read_events(self._last_id)
+            except Exception as e:
+                logger.error(f"Error polling events: {str(e)}")
+                rows = []
+            if rows:
+                with self._cond:
+                    self._recent.extend(rows)
+                    self._last_id = rows[-1][0]
+                    self._cond.notify_all()
+                if len(rows) == EVENTS_BATCH_SIZE:
+                    continue
+            time.sleep(self.poll_interval)
+
+    def events_after(self, after_id, timeout):
+        """Events after after_id, waiting up to timeout seconds for one to arrive."""
+        with self._cond:
+            if after_id >= self._last_id:
+                self._cond.wait(timeout)
+            if self._recent and self._recent[0][0] <= after_id + 1:
+                return [event for event in self._recent if event[0] > after_id]
+            if after_id >= self._last_id:
+                return []
+        # Resuming from before the buffer
+        return read_events(after_id)
+
+    def open_stream(self, last_id=None, types=None):
+        """An SSE response body after last_id (or from now), or None when this process already serves max_streams."""
+        self._start()
+        with self._cond:
+            if self._streams >= self.max_streams:
+                return None
+            self._streams += 1
+        return EventStream(self, self._messages(last_id, types))
+
+    def _release(self):
+        with self._cond:
+            self._streams -= 1
+
+    def _messages(self, last_id, types, max_seconds=EVENTS_STREAM_MAX_SECONDS):
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        oldest, latest = event_id_range()
+        if last_id is None:
+            last_id = latest
+        elif last_id < oldest - 1 or last_id > latest:
+            yield format_event(latest, 'reset', json.dumps({"latest": latest}))
+            last_id = latest
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            events = self.events_after(last_id, EVENTS_HEARTBEAT)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event_type, data in events:
+                if types is None or event_type in types:
+                    yield format_event(event_id, event_type, data)
+            last_id = events[-1][0]
+
+    def stats(self):
+        with self._cond:
+            return {"streams": self._streams, "last_event_id": self._last_id, "buffered": len(self._recent)}
+
+class EventStream:
+    """SSE response body holding one of the feed's stream slots until the server closes it.
+
+    A stream ends after EVENTS_STREAM_MAX_SECONDS; EventSource clients
+    reconnect with Last-Event-ID and carry on. A 'reset' event tells a client
+    that the events it missed were pruned, so it must refetch its lists.
+    """
+
+    def __init__(self, feed, messages):
+        self._feed = feed
+        self._messages = messages
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._messages)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._messages.close()
+            self._feed._release()
+
+event_feed = EventFeed()
+
+def run_event_pruner(interval=EVENTS_PRUNE_INTERVAL):
+    """Prune old events every interval seconds."""
+    while True:
+        time.sleep(interval)
+        try:
+            deleted = prune_events()
+            if deleted:
+                logger.info(f"Pruned {deleted} events older than {EVENTS_RETENTION}s")
+        except Exception as e:
+            logger.error(f"Error pruning events: {str(e)}")
+
+def start_event_pruner(interval=EVENTS_PRUNE_INTERVAL):
+    """Start the background event pruner unless it is disabled."""
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=run_event_pruner, args=(interval,), name="event-pruner", daemon=True)
+    thread.start()
+    return thread
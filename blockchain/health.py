@@ -0,0 +1,55 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import HEALTH_CHECK_INTERVAL, HEALTH_CHECK_TIMEOUT, GOSSIP_MAX_WORKERS
+from peer_client import peer_client
+from peers import peer_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Heartbeat failure detector. Every interval each live peer is pinged on
+# /network_status; the peer client records the outcome in the registry, whose
+# circuit breakers take repeatedly failing peers out of gossip and sync.
+# Dead peers are probed again once their circuit goes half-open.
+
+health_executor = ThreadPoolExecutor(max_workers=GOSSIP_MAX_WORKERS, thread_name_prefix='health')
+
+def check_peer(peer, half_open=False):
+    """Heartbeat one peer. Returns True if it answered."""
+    try:
+        response = peer_client.get(f"{peer}/network_status", timeout=(HEALTH_CHECK_TIMEOUT, HEALTH_CHECK_TIMEOUT))
+        response.raise_for_status()
+    except Exception as e:
+        if half_open:
+            logger.info(f"Probe of dead peer {peer} failed, circuit stays open: {str(e)}")
+        return False
+    if half_open and peer_registry.revive(peer):
+        logger.info(f"Probe of {peer} succeeded, circuit closed")
+    return True
+
+def run_health_checks_once():
+    """Heartbeat every peer that is due and return {peer: answered}."""
+    due = peer_registry.due_for_check()
+    futures = {peer: health_executor.submit(check_peer, peer, half_open) for peer, half_open in due}
+    return {peer: future.result() for peer, future in futures.items()}
+
+def run_health_checker(interval=HEALTH_CHECK_INTERVAL):
+    """Heartbeat peers every interval seconds, with a little jitter."""
+    while True:
+        time.sleep(interval * random.uniform(0.8, 1.2))
+        try:
+            run_health_checks_once()
+        except Exception as e:
+            logger.error(f"Error running health checks: {str(e)}")
+
+def start_health_checker(interval=HEALTH_CHECK_INTERVAL):
+    """Start the background failure detector unless it is disabled."""
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=run_health_checker, args=(interval,), name="health-checker", daemon=True)
+    thread.start()
+    logger.info(f"Peer health checks running every ~{interval}s")
+    return thread
@@ -0,0 +1,101 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from config import PENDING_TTL, MAINTENANCE_INTERVAL, VACUUM_PAGES, ANALYZE_LIMIT
+from db import connection
+from news import reject_pending_news, expire_pending_news, delete_orphan_votes, prune_pending_tombstones
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pending items only leave pending_news when they are approved. This task
+# drops the ones that never will be: items whose disapprovals put the
+# approval threshold out of reach, and items older than PENDING_TTL. Each
+# leaves a tombstone so sync, anti-entropy and gossip do not bring it back
+# from peers that still hold it. Freed pages are then handed back to the
+# file system and planner statistics refreshed, so the pending working set
+# and its indexes stay small.
+
+_conversion_hint_logged = False
+
+def compact_database(pages=VACUUM_PAGES):
+    """Return up to pages free pages to the file system and refresh planner statistics.
+
+    Free pages are only returned when the database already uses incremental
+    auto-vacuum; an older database keeps its free pages until it is converted
+    with `python maintenance.py convert`.
+    """
+    global _conversion_hint_logged
+    with connection() as conn:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            if not _conversion_hint_logged:
+                logger.info("Database does not use incremental auto-vacuum; run 'python maintenance.py convert' to enable it")
+                _conversion_hint_logged = True
+        elif conn.execute('PRAGMA freelist_count').fetchone()[0]:
+            # execute() would step the pragma once and free a single page
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+        conn.execute(f'PRAGMA analysis_limit = {int(ANALYZE_LIMIT)}')
+        conn.execute('ANALYZE')
+
+def convert_to_incremental_vacuum():
+    """Switch an existing database to incremental auto-vacuum with one full VACUUM.
+
+    The VACUUM rewrites the whole file and blocks writers while it runs, so
+    this is an explicit offline step rather than part of the background task.
+    Returns False when the database was already converted.
+    """
+    with connection() as conn:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    return True
+
+def run_maintenance_pass():
+    """Reject, expire and compact once. Returns the number of rows removed of each kind."""
+    counts = {
+        'rejected': reject_pending_news(),
+        'expired': expire_pending_news() if PENDING_TTL > 0 else 0,
+        'orphan_votes': delete_orphan_votes(),
+        'tombstones': prune_pending_tombstones()
+    }
+    compact_database()
+    return counts
+
+def run_maintenance(interval=MAINTENANCE_INTERVAL):
+    """Run a maintenance pass now and then every interval seconds."""
+    while True:
+        try:
+            counts = run_maintenance_pass()
+            if any(counts.values()):
+                logger.info(f"Pending maintenance removed {counts}")
+        except Exception as e:
+            logger.error(f"Error running pending maintenance: {str(e)}")
+        time.sleep(interval)
+
+def start_maintenance(interval=MAINTENANCE_INTERVAL):
+    """Start the background pending maintenance unless it is disabled."""
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=run_maintenance, args=(interval,), name="pending-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Pending cleanup and database compaction.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('run', help='run one maintenance pass and print the rows removed')
+    commands.add_parser('convert', help='switch the database to incremental auto-vacuum with a full VACUUM (stop the node first)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        print(json.dumps(run_maintenance_pass(), indent=2))
+    elif convert_to_incremental_vacuum():
+        print("Database converted to incremental auto-vacuum")
+    else:
+        print("Database already uses incremental auto-vacuum")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+from db import connection, register_function
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Two-level tree over approved news hashes: 16 interior nodes keyed by the first
+# hex digit, each with 16 leaf buckets keyed by the first two hex digits. A leaf
+# digest is the XOR of every hash in its bucket, so triggers can update it in
+# O(1) per insert or delete; interior digests are hashed from their children
+# when requested.
+HEX_DIGITS = '0123456789abcdef'
+EMPTY_DIGEST = '0' * 64
+
+def xor_hex(a, b):
+    """XOR two 256-bit hex digests."""
+    return f"{int(a, 16) ^ int(b, 16):064x}"
+
+register_function('xor_hex', 2, xor_hex)
+
+def init_merkle(cursor):
+    """Create the leaf bucket table and its maintenance triggers, building it on first use."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'merkle_buckets'")
+    exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS merkle_buckets (
+            prefix TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            count INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS merkle_news_insert AFTER INSERT ON news
+        WHEN NEW.approved = 1
+        BEGIN
+            INSERT INTO merkle_buckets (prefix, digest, count)
+            VALUES (substr(NEW.news_hash, 1, 2), NEW.news_hash, 1)
+            ON CONFLICT(prefix) DO UPDATE SET digest = xor_hex(digest, excluded.digest), count = count + 1;
+        END
+    ''')
+    # Archived articles leave the news table but stay in the tree
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'merkle_news_delete'")
+    trigger = cursor.fetchone()
+    if trigger and 'archived_hashes' not in trigger[0]:
+        cursor.execute('DROP TRIGGER merkle_news_delete')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS merkle_news_delete AFTER DELETE ON news
+        WHEN OLD.approved = 1 AND NOT EXISTS (SELECT 1 FROM archived_hashes WHERE news_hash = OLD.news_hash)
+        BEGIN
+            UPDATE merkle_buckets SET digest = xor_hex(digest, OLD.news_hash), count = count - 1
+            WHERE prefix = substr(OLD.news_hash, 1, 2);
+        END
+    ''')
+    if not exists:
+        rebuild_merkle(cursor)
+
+def rebuild_merkle(cursor):
+    """Recompute every leaf bucket from the news table and the archived hashes, if any."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archived_hashes'")
+    archived = cursor.fetchone() is not None
+    buckets = {}
+    for (news_hash,) in cursor.execute(
+        'SELECT news_hash FROM approved_hashes' if archived else 'SELECT news_hash FROM news WHERE approved = 1'
+    ):
+        prefix = news_hash[:2]
+        digest, count = buckets.get(prefix, (0, 0))
+        buckets[prefix] = (digest ^ int(news_hash, 16), count + 1)
+    cursor.execute('DELETE FROM merkle_buckets')
+    cursor.executemany(
+        'INSERT INTO merkle_buckets (prefix, digest, count) VALUES (?, ?, ?)',
+        [(prefix, f"{digest:064x}", count) for prefix, (digest, count) in buckets.items()]
+    )
+    logger.info(f"Built Merkle buckets for {sum(count for _, count in buckets.values())} approved articles")
+
+def _read_leaves(conn):
+    return {prefix: (digest, count) for prefix, digest, count in conn.execute(
+        'SELECT prefix, digest, count FROM merkle_buckets WHERE count > 0'
+    )}
+
+def _leaves():
+    with connection() as conn:
+        return _read_leaves(conn)
+
+def _combine(digests):
+    return hashlib.sha256(''.join(digests).encode()).hexdigest()
+
+def _interior_digests(leaves):
+    return {
+        first: _combine(leaves.get(first + second, (EMPTY_DIGEST, 0))[0] for second in HEX_DIGITS)
+        for first in HEX_DIGITS
+    }
+
+def get_merkle_root(conn=None):
+    """Root digest and article count of the approved-news tree, of another database if given its connection."""
+    leaves = _leaves() if conn is None else _read_leaves(conn)
+    return {
+        "root": _combine(_interior_digests(leaves)[first] for first in HEX_DIGITS),
+        "count": sum(count for _, count in leaves.values())
+    }
+
+def get_merkle_children(prefix):
+    """Children of a tree node: interior digests for '', leaf digests for one hex digit,
+    and the article hashes themselves for a two-digit leaf prefix."""
+    prefix = prefix.lower()
+    if any(char not in HEX_DIGITS for char in prefix) or len(prefix) > 2:
+        raise ValueError(f"Invalid Merkle prefix: {prefix}")
+    if len(prefix) == 2:
+        with connection() as conn:
+            hashes = [row[0] for row in conn.execute('''
+                SELECT news_hash FROM approved_hashes
+                WHERE news_hash >= ? AND news_hash < ?
+            ''', (prefix, prefix + 'g'))]
+        return {"prefix": prefix, "hashes": hashes}
+    leaves = _leaves()
+    if not prefix:
+        return {"prefix": prefix, "children": _interior_digests(leaves)}
+    return {
+        "prefix": prefix,
+        "children": {prefix + second: leaves.get(prefix + second, (EMPTY_DIGEST, 0))[0] for second in HEX_DIGITS}
+    }
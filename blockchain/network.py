@@ -1,16 +1,99 @@
+import json
 import logging
 import os
+import random
 import socket
-import requests
+import threading
 import time
-from config import START_PORT, MAX_PORT_TRIES
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.exceptions import RequestException
+from peer_client import peer_client
+from wire import decode_response, NDJSON_TYPE
+from peers import peer_registry
+from db import connection, transaction
+from config import (
+    START_PORT, MAX_PORT_TRIES, GOSSIP_MAX_WORKERS,
+    GOSSIP_CONNECT_TIMEOUT, GOSSIP_READ_TIMEOUT, GOSSIP_DEADLINE, GOSSIP_ASYNC,
+    GOSSIP_MAX_HOPS, SEEN_CACHE_TTL, SEEN_PRUNE_EVERY, GOSSIP_MODE, GOSSIP_FANOUT,
+    GOSSIP_EPIDEMIC_MAX_HOPS, SYNC_PAGE_SIZE, SYNC_READ_TIMEOUT
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize node URL and peers
+# Initialize node URL and peers; the peer registry lives in SQLite so all worker processes share it
 this_node_url = None
-other_nodes = set()
+other_nodes = peer_registry
+peer_client.registry = peer_registry
+
+# Shared worker pool for concurrent peer fan-out
+broadcast_executor = ThreadPoolExecutor(max_workers=GOSSIP_MAX_WORKERS, thread_name_prefix='gossip')
+
+class SeenMessages:
+    """Message IDs this node has already handled, shared by all worker processes through SQLite.
+
+    An ID counts as seen for SEEN_CACHE_TTL seconds. Marking one joins the
+    caller's write transaction, so messages of a batch that rolls back stay
+    unseen and are processed normally when the batch is retried.
+    """
+
+    def __init__(self, ttl=SEEN_CACHE_TTL, prune_every=SEEN_PRUNE_EVERY):
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._adds = 0
+        self._lock = threading.Lock()
+
+    def init_table(self):
+        """Create the seen_messages table if needed."""
+        with transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS seen_messages (
+                    msg_id TEXT PRIMARY KEY,
+                    seen_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_seen_messages_seen_at ON seen_messages(seen_at)')
+
+    def add(self, message_id):
+        """Record a message ID. Returns True if no worker has seen it within the TTL."""
+        now = time.time()
+        with transaction(immediate=True) as cursor:
+            cursor.execute('''
+                INSERT INTO seen_messages (msg_id, seen_at) VALUES (?, ?)
+                ON CONFLICT(msg_id) DO UPDATE SET seen_at = excluded.seen_at WHERE seen_at < ?
+            ''', (message_id, now, now - self.ttl))
+            fresh = cursor.rowcount > 0
+        with self._lock:
+            self._adds += 1
+            prune = self._adds % self.prune_every == 0
+        if prune:
+            self.prune()
+        return fresh
+
+    def prune(self, batch_size=5000):
+        """Forget IDs older than the TTL. Returns the number deleted."""
+        try:
+            with transaction(immediate=True) as cursor:
+                cursor.execute('''
+                    DELETE FROM seen_messages WHERE msg_id IN (
+                        SELECT msg_id FROM seen_messages WHERE seen_at < ? LIMIT ?
+                    )
+                ''', (time.time() - self.ttl, batch_size))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error pruning seen messages: {str(e)}")
+            return 0
+
+    def __len__(self):
+        with connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM seen_messages').fetchone()[0]
+
+seen_messages = SeenMessages()
+try:
+    seen_messages.init_table()
+except Exception as e:
+    logger.error(f"Error creating seen_messages table: {str(e)}")
 
 def find_free_port(start_port=START_PORT):
     """Find a free port starting from start_port."""
@@ -36,89 +119,237 @@ def try_register_with_bootstrap(bootstrap_url, node_url):
         return True
 
     try:
-        response = requests.post(f"{bootstrap_url}/register", json={"node_url": node_url}, timeout=5)
+        response = peer_client.post(f"{bootstrap_url}/register", json_body={"node_url": node_url}, timeout=5)
         response.raise_for_status()
-        data = response.json()
+        data = decode_response(response)
         new_nodes = data.get('all_nodes', [])
         other_nodes.update([n for n in new_nodes if n != node_url])
         if bootstrap_url != node_url:
             other_nodes.add(bootstrap_url)
         logger.info(f"Registered with bootstrap {bootstrap_url}, nodes: {other_nodes}")
         return True
-    except requests.exceptions.RequestException as e:
+    except RequestException as e:
         logger.error(f"Failed to register with bootstrap {bootstrap_url}: {str(e)}")
         if "Connection refused" in str(e) or "timeout" in str(e):
             logger.info(f"No bootstrap node at {bootstrap_url}. Becoming bootstrap node.")
             return True
         return False
 
+def post_to_peer(node, path, payload, timeout=(GOSSIP_CONNECT_TIMEOUT, GOSSIP_READ_TIMEOUT)):
+    """POST a JSON payload to one peer and report the outcome instead of raising."""
+    start = time.monotonic()
+    try:
+        response = peer_client.post(f"{node}{path}", json_body=payload, timeout=timeout)
+        response.raise_for_status()
+        return {"ok": True, "status": response.status_code, "elapsed": time.monotonic() - start}
+    except Exception as e:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        return {"ok": False, "error": str(e), "status": status, "elapsed": time.monotonic() - start}
+
+def broadcast(path, payload, nodes=None, deadline=GOSSIP_DEADLINE):
+    """POST a payload to peers in parallel and return a {node: result} map.
+
+    Each peer gets its own connect/read timeout; peers still outstanding when
+    the round deadline passes are reported as failed rather than waited on.
+    """
+    nodes = other_nodes.active() if nodes is None else list(nodes)
+    return post_to_peers({node: (path, payload) for node in nodes}, deadline)
+
+def post_to_peers(requests_by_node, deadline=GOSSIP_DEADLINE):
+    """POST a different (path, payload) to each peer in parallel; see broadcast."""
+    if not requests_by_node:
+        return {}
+    futures = {broadcast_executor.submit(post_to_peer, node, path, payload): node
+               for node, (path, payload) in requests_by_node.items()}
+    done, _ = wait(futures, timeout=deadline)
+    results = {}
+    for future, node in futures.items():
+        if future in done:
+            results[node] = future.result()
+        else:
+            future.cancel()
+            results[node] = {"ok": False, "error": f"deadline of {deadline}s exceeded", "elapsed": deadline}
+    return results
+
+def log_broadcast_results(description, results):
+    """Log the per-peer outcome of a broadcast round."""
+    for node, result in results.items():
+        if result["ok"]:
+            logger.info(f"{description} sent to {node} in {result['elapsed']:.3f}s")
+        else:
+            logger.error(f"Error sending {description.lower()} to {node}: {result['error']}")
+
+def new_gossip_message(message_type, **fields):
+    """Build an originating gossip message with a fresh ID and mark it as seen locally."""
+    message = {'type': message_type, 'msg_id': uuid.uuid4().hex, 'hops': 0, 'origin': this_node_url, **fields}
+    seen_messages.add(message['msg_id'])
+    return message
+
+def gossip_message_id(message):
+    """ID used for duplicate suppression; messages from older nodes fall back to their content hash."""
+    return message.get('msg_id') or f"{message.get('type')}:{message.get('news_hash')}"
+
+def prepare_forward(message):
+    """Return a copy of a received message for forwarding, or None if its hop budget is spent."""
+    hops = int(message.get('hops', 0)) + 1
+    max_hops = GOSSIP_EPIDEMIC_MAX_HOPS if GOSSIP_MODE == 'epidemic' else GOSSIP_MAX_HOPS
+    if hops >= max_hops:
+        return None
+    return {**message, 'msg_id': gossip_message_id(message), 'hops': hops}
+
+def select_gossip_targets(exclude=()):
+    """Pick the peers for one gossip hop: all live ones, or GOSSIP_FANOUT random ones in epidemic mode."""
+    peers = other_nodes.active(exclude)
+    if GOSSIP_MODE == 'epidemic' and len(peers) > GOSSIP_FANOUT:
+        return random.sample(peers, GOSSIP_FANOUT)
+    return peers
+
+def send_gossip(path, payload, description):
+    """Queue a message for the selected peers, or broadcast it inline when GOSSIP_ASYNC is off.
+
+    The node that sent us the message and the node that created it are skipped.
+    """
+    peers = select_gossip_targets({payload.get('sender'), payload.get('origin')})
+    if not peers:
+        logger.info(f"No peers to send {description.lower()} to")
+        return None
+    payload = {**payload, 'sender': this_node_url}
+    if GOSSIP_ASYNC:
+        from dispatcher import dispatcher
+        queued = dispatcher.enqueue(path, payload, peers)
+        logger.info(f"{description} queued for {queued} peers")
+        return queued
+    results = broadcast(path, payload, peers)
+    log_broadcast_results(description, results)
+    return results
+
+GOSSIP_PATHS = {'vote_request': '/vote_request', 'approved_news': '/approved_news'}
+
+def send_gossip_batch(messages, description):
+    """Gossip several messages at once, sending each peer one /gossip/batch request.
+
+    Targets are picked per message as in send_gossip; a peer that ends up with
+    a single message gets it on that message's own endpoint.
+    Returns {peer: message count}.
+    """
+    by_peer = {}
+    for message in messages:
+        for peer in select_gossip_targets({message.get('sender'), message.get('origin')}):
+            by_peer.setdefault(peer, []).append({**message, 'sender': this_node_url})
+    if not by_peer:
+        logger.info(f"No peers to send {description.lower()} to")
+        return {}
+    requests_by_peer = {}
+    for peer, batch in by_peer.items():
+        if len(batch) == 1:
+            requests_by_peer[peer] = (GOSSIP_PATHS[batch[0]['type']], batch[0])
+        else:
+            requests_by_peer[peer] = ('/gossip/batch', {'type': 'batch', 'sender': this_node_url, 'messages': batch})
+    if GOSSIP_ASYNC:
+        from dispatcher import dispatcher
+        dispatcher.enqueue_many([(peer, path, payload) for peer, (path, payload) in requests_by_peer.items()])
+        logger.info(f"{description} ({len(messages)} messages) queued for {len(by_peer)} peers")
+    else:
+        log_broadcast_results(description, post_to_peers(requests_by_peer))
+    return {peer: len(batch) for peer, batch in by_peer.items()}
+
 def gossip_vote_request(vote_request_data):
     """Send a vote request to all known peers."""
-    if not other_nodes:
-        logger.info("No peers to send vote request to")
-        return
-    for node in other_nodes:
-        try:
-            response = requests.post(f"{node}/vote_request", json=vote_request_data, timeout=5)
-            response.raise_for_status()
-            logger.info(f"Vote request sent to {node}")
-        except Exception as e:
-            logger.error(f"Error sending vote request to {node}: {str(e)}")
+    return send_gossip("/vote_request", vote_request_data, "Vote request")
 
 def gossip_approved_news(approved_news):
     """Gossip approved news to all known peers."""
-    for node in other_nodes:
-        try:
-            response = requests.post(f"{node}/approved_news", json=approved_news, timeout=5)
-            response.raise_for_status()
-            logger.info(f"Approved news sent to {node}")
-        except Exception as e:
-            logger.error(f"Error sending approved news to {node}: {str(e)}")
+    return send_gossip("/approved_news", approved_news, "Approved news")
 
-def sync_approved_news_with_peer(peer_url):
-    """Sync approved news with a peer, with retry mechanism."""
+def read_ndjson_batches(response, size):
+    """Parse a streamed NDJSON response into lists of at most size items."""
+    batch = []
+    for line in response.iter_lines(chunk_size=64 * 1024):
+        if not line:
+            continue
+        batch.append(json.loads(line))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def sync_stream_with_peer(peer_url, stream, path, key, fields, to_item, insert_batch):
+    """Pull one of a peer's news streams from our saved cursor onward.
+
+    The peer streams every row after the cursor as NDJSON in one response;
+    each SYNC_PAGE_SIZE items are inserted in a single transaction and the
+    cursor is saved after them, so an interrupted sync resumes where it
+    stopped. Peers that cannot stream answer with paginated JSON, which is
+    then followed page by page. Returns rows inserted.
+    """
+    from news import get_sync_cursor, set_sync_cursor
     max_retries = 3
     retry_delay = 2  # seconds
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(f"{peer_url}/approved_news", timeout=5)
-            response.raise_for_status()
-            news_list = response.json().get('news', [])
-            from news import insert_news
-            for news in news_list:
-                insert_news(news['headline'], news['body'], news['author'], approved=True)
-            logger.info(f"Synced approved news with {peer_url}")
-            return
-        except Exception as e:
-            logger.warning(f"Attempt {attempt + 1}/{max_retries} failed syncing approved news with {peer_url}: {str(e)}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-    logger.error(f"Failed to sync approved news with {peer_url} after {max_retries} attempts")
+    after_id = get_sync_cursor(peer_url, stream)
+    sync_fields = ','.join(fields)
+    streaming = True
+    inserted = 0
+    while True:
+        for attempt in range(max_retries):
+            if not other_nodes.is_available(peer_url):
+                logger.warning(f"Circuit to {peer_url} is open, stopping {stream} sync after {inserted} items")
+                return inserted
+            params = {'after_id': after_id, 'order': 'id', 'fields': sync_fields}
+            params.update({'stream': 'ndjson'} if streaming else {'limit': SYNC_PAGE_SIZE})
+            try:
+                response = peer_client.get(f"{peer_url}{path}", params=params, timeout=(5, SYNC_READ_TIMEOUT), stream=streaming)
+                response.raise_for_status()
+                if response.headers.get('Content-Type', '').startswith(NDJSON_TYPE):
+                    with response:
+                        for batch in read_ndjson_batches(response, SYNC_PAGE_SIZE):
+                            inserted += insert_batch([to_item(item) for item in batch])
+                            after_id = max(item['id'] for item in batch)
+                            set_sync_cursor(peer_url, stream, after_id)
+                    logger.info(f"Synced {stream} news with {peer_url}: {inserted} new items")
+                    return inserted
+                data = decode_response(response)
+                break
+            except Exception as e:
+                logger.warning(f"Attempt {attempt + 1}/{max_retries} failed syncing {stream} news with {peer_url}: {str(e)}")
+                if attempt < max_retries - 1:
+                    time.sleep(retry_delay)
+        else:
+            logger.error(f"Failed to sync {stream} news with {peer_url} after {max_retries} attempts")
+            return inserted
+
+        streaming = False
+        page = data.get(key, [])
+        inserted += insert_batch([to_item(item) for item in page])
+        next_after_id = data.get('next_after_id')
+        if page:
+            after_id = next_after_id or max(item['id'] for item in page)
+            set_sync_cursor(peer_url, stream, after_id)
+        # Peers without pagination return everything at once and no next_after_id
+        if not page or next_after_id is None:
+            logger.info(f"Synced {stream} news with {peer_url}: {inserted} new items")
+            return inserted
+
+def sync_approved_news_with_peer(peer_url):
+    """Incrementally sync approved news from a peer."""
+    from news import insert_approved_news_batch
+    return sync_stream_with_peer(peer_url, 'approved', '/approved_news', 'news',
+                                 ['id', 'headline', 'body', 'author', 'date'], lambda item: item, insert_approved_news_batch)
 
 def sync_pending_news_with_peer(peer_url):
-    """Sync pending news with a peer, with retry mechanism."""
-    max_retries = 3
-    retry_delay = 2  # seconds
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(f"{peer_url}/pending_news", timeout=5)
-            response.raise_for_status()
-            pending_list = response.json().get('pending_news', [])
-            from news import insert_pending_news
-            for pending in pending_list:
-                insert_pending_news(
-                    pending['title'],
-                    pending['description'],
-                    pending['author'],
-                    pending['total_nodes']
-                )
-            logger.info(f"Synced pending news with {peer_url}")
-            return
-        except Exception as e:
-            logger.warning(f"Attempt {attempt + 1}/{max_retries} failed syncing pending news with {peer_url}: {str(e)}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-    logger.error(f"Failed to sync pending news with {peer_url} after {max_retries} attempts")
+    """Incrementally sync pending news from a peer."""
+    from news import insert_pending_news_batch
+
+    def to_item(pending):
+        return {
+            'headline': pending['title'],
+            'body': pending['description'],
+            'author': pending['author'],
+            'date': pending.get('publishedAt'),
+            'total_nodes': pending['total_nodes']
+        }
+    return sync_stream_with_peer(peer_url, 'pending', '/pending_news', 'pending_news',
+                                 ['id', 'title', 'description', 'author', 'publishedAt', 'total_nodes'], to_item, insert_pending_news_batch)
 
 def get_node_url():
     """Safely retrieve this_node_url, raising an error if not set."""
@@ -139,4 +370,12 @@ def initialize_node_url(port):
     if not this_node_url:
         this_node_url = f'http://localhost:{port}'
         logger.warning(f"this_node_url set to default: {this_node_url}")
-    logger.info(f"this_node_url initialized as: {this_node_url}")
\ No newline at end of file
+    logger.info(f"this_node_url initialized as: {this_node_url}")
+
+def load_node_url():
+    """Adopt the URL the serving process published in NODE_URL, e.g. inside a gunicorn worker."""
+    global this_node_url
+    if this_node_url is None and os.getenv('NODE_URL'):
+        this_node_url = os.getenv('NODE_URL')
+        logger.info(f"this_node_url loaded as: {this_node_url}")
+    return this_node_url
\ No newline at end of file
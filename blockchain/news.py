@@ -1,62 +1,163 @@
-import sqlite3
 import hashlib
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from config import STREAM_CHUNK_ROWS, PENDING_TTL, PENDING_TOMBSTONE_TTL, MAINTENANCE_BATCH_ROWS
+from db import connection, transaction, register_function
+from merkle import init_merkle
+from search import init_search_index
+from cache import init_data_versions
+from events import init_events
+from archive import (
+    init_archive, list_partitions, merge_id_page, merge_date_page, find_archived_date, get_archived_by_hashes
+)
 
-DB_PATH = "news.db"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_db():
     """Initialize the database with required tables."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute('PRAGMA foreign_keys = ON')
-        cursor = conn.cursor()
-        
-        # Create news table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS news (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                headline TEXT NOT NULL,
-                body TEXT NOT NULL,
-                author TEXT NOT NULL,
-                date TEXT NOT NULL,
-                approved INTEGER NOT NULL
-            )
+        with transaction() as cursor:
+            cursor.connection.create_function('news_hash_fn', 3, generate_news_hash, deterministic=True)
+
+            # Create news table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS news (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    headline TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    approved INTEGER NOT NULL,
+                    news_hash TEXT
+                )
+            ''')
+
+            # Create pending_news table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pending_news (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    headline TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    total_nodes INTEGER NOT NULL,
+                    approval_votes INTEGER DEFAULT 0,
+                    approval_rate REAL DEFAULT 0.0,
+                    news_hash TEXT,
+                    disapproval_votes INTEGER DEFAULT 0
+                )
+            ''')
+
+            # Create node_votes table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS node_votes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    pending_id INTEGER NOT NULL,
+                    voter_node TEXT NOT NULL,
+                    vote INTEGER NOT NULL,
+                    FOREIGN KEY (pending_id) REFERENCES pending_news(id)
+                )
+            ''')
+
+            # Hashes of pending items dropped without approval, so sync and gossip cannot bring them back
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pending_tombstones (
+                    news_hash TEXT PRIMARY KEY,
+                    reason TEXT NOT NULL,
+                    removed_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+
+            # Per-peer position in the peer's approved/pending streams for incremental sync
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sync_cursors (
+                    peer TEXT NOT NULL,
+                    stream TEXT NOT NULL,
+                    last_id INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (peer, stream)
+                )
+            ''')
+
+            migrate_news_hash(cursor)
+            migrate_votes(cursor)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_approved_date ON news(approved, date, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_pending_news_date ON pending_news(date, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_pending_tombstones_removed ON pending_tombstones(removed_at)')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS pending_tombstone_dedupe BEFORE INSERT ON pending_news
+                WHEN EXISTS (SELECT 1 FROM pending_tombstones WHERE news_hash = NEW.news_hash)
+                BEGIN
+                    SELECT RAISE(IGNORE);
+                END
+            ''')
+            init_archive(cursor)
+            init_merkle(cursor)
+            init_search_index(cursor)
+            init_data_versions(cursor)
+            init_events(cursor)
+
+        logger.info("Database initialized successfully")
+    except Exception as e:
+        logger.error(f"Error initializing database: {str(e)}")
+
+def migrate_news_hash(cursor):
+    """Add, backfill and uniquely index news_hash on databases created before it existed.
+
+    Rows duplicated by earlier re-syncs are collapsed to the oldest copy first.
+    """
+    for table in ('news', 'pending_news'):
+        cursor.execute(f'PRAGMA table_info({table})')
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'news_hash' not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN news_hash TEXT')
+            logger.info(f"Added news_hash column to {table}")
+        cursor.execute(f'''
+            UPDATE {table} SET news_hash = news_hash_fn(headline, body, author)
+            WHERE news_hash IS NULL
         ''')
+        if cursor.rowcount > 0:
+            logger.info(f"Backfilled news_hash for {cursor.rowcount} rows in {table}")
+
+        cursor.execute(f"SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_{table}_hash_unique'")
+        if cursor.fetchone():
+            continue
+        duplicates = f'SELECT id FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY news_hash)'
+        if table == 'pending_news':
+            cursor.execute(f'DELETE FROM node_votes WHERE pending_id IN ({duplicates})')
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({duplicates})')
+        if cursor.rowcount > 0:
+            logger.info(f"Removed {cursor.rowcount} duplicate rows from {table}")
+        cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_hash')
+        cursor.execute(f'CREATE UNIQUE INDEX idx_{table}_hash_unique ON {table}(news_hash)')
 
-        # Create pending_news table
+def migrate_votes(cursor):
+    """Enforce one vote per node per item and add the disapproval counter to older databases."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_node_votes_unique'")
+    if not cursor.fetchone():
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pending_news (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                headline TEXT NOT NULL,
-                body TEXT NOT NULL,
-                author TEXT NOT NULL,
-                date TEXT NOT NULL,
-                total_nodes INTEGER NOT NULL,
-                approval_votes INTEGER DEFAULT 0,
-                approval_rate REAL DEFAULT 0.0
+            DELETE FROM node_votes WHERE id NOT IN (
+                SELECT MIN(id) FROM node_votes GROUP BY pending_id, voter_node
             )
         ''')
-
-        # Create node_votes table
+        if cursor.rowcount > 0:
+            logger.info(f"Removed {cursor.rowcount} duplicate votes")
+        cursor.execute('CREATE UNIQUE INDEX idx_node_votes_unique ON node_votes(pending_id, voter_node)')
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS node_votes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pending_id INTEGER NOT NULL,
-                voter_node TEXT NOT NULL,
-                vote INTEGER NOT NULL,
-                FOREIGN KEY (pending_id) REFERENCES pending_news(id)
-            )
+            UPDATE pending_news SET
+                approval_votes = (SELECT COUNT(*) FROM node_votes WHERE pending_id = pending_news.id AND vote = 1),
+                approval_rate = (SELECT COUNT(*) FROM node_votes WHERE pending_id = pending_news.id AND vote = 1) * 1.0 / total_nodes
         ''')
-
-        conn.commit()
-        logger.info("Database initialized successfully")
-    except Exception as e:
-        logger.error(f"Error initializing database: {str(e)}")
-    finally:
-        conn.close()
+    cursor.execute('PRAGMA table_info(pending_news)')
+    if 'disapproval_votes' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute('ALTER TABLE pending_news ADD COLUMN disapproval_votes INTEGER DEFAULT 0')
+        cursor.execute('''
+            UPDATE pending_news SET disapproval_votes =
+                (SELECT COUNT(*) FROM node_votes WHERE pending_id = pending_news.id AND vote != 1)
+        ''')
+        logger.info("Added disapproval_votes column to pending_news")
 
 def validate_news(news):
     """Validate news item structure."""
@@ -68,44 +169,94 @@ def generate_news_hash(headline, body, author):
     news_string = f"{headline}{body}{author}"
     return hashlib.sha256(news_string.encode()).hexdigest()
 
+def _insert_news(cursor, headline, body, author, approved):
+    """Insert a news item inside the caller's transaction. Returns its id, or None if it was already stored."""
+    date = datetime.utcnow().isoformat()
+    news_hash = generate_news_hash(headline, body, author)
+    cursor.execute('''
+        INSERT INTO news (headline, body, author, date, approved, news_hash)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(news_hash) DO NOTHING
+    ''', (headline, body, author, date, 1 if approved else 0, news_hash))
+    return cursor.lastrowid if cursor.rowcount else None
+
 def insert_news(headline, body, author, approved=False):
     """Insert a news item into the news table."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        date = datetime.utcnow().isoformat()
-        cursor.execute('''
-            INSERT INTO news (headline, body, author, date, approved)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (headline, body, author, date, 1 if approved else 0))
-        conn.commit()
+        with transaction() as cursor:
+            news_id = _insert_news(cursor, headline, body, author, approved)
+        if news_id is None:
+            logger.info(f"News already stored: {headline}")
+            return None
         logger.info(f"Inserted news: {headline}")
-        return cursor.lastrowid
+        return news_id
     except Exception as e:
         logger.error(f"Error inserting news: {str(e)}")
         return None
-    finally:
-        conn.close()
 
 def insert_pending_news(headline, body, author, total_nodes):
-    """Insert a news item into the pending_news table."""
+    """Insert a news item into the pending_news table.
+
+    Returns its pending id, which is the existing row's when the item is
+    already pending (e.g. two vote requests for it arrived at once), or
+    None if it was rejected or expired here.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        date = datetime.utcnow().isoformat()
-        cursor.execute('''
-            INSERT INTO pending_news (headline, body, author, date, total_nodes)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (headline, body, author, date, total_nodes))
-        conn.commit()
-        pending_id = cursor.lastrowid
+        with transaction(immediate=True) as cursor:
+            date = datetime.utcnow().isoformat()
+            news_hash = generate_news_hash(headline, body, author)
+            cursor.execute('''
+                INSERT INTO pending_news (headline, body, author, date, total_nodes, news_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(news_hash) DO NOTHING
+            ''', (headline, body, author, date, total_nodes, news_hash))
+            if cursor.rowcount:
+                pending_id = cursor.lastrowid
+            else:
+                cursor.execute('SELECT id FROM pending_news WHERE news_hash = ?', (news_hash,))
+                row = cursor.fetchone()
+                if row is None:
+                    logger.info(f"Pending news {news_hash} was rejected or expired, not reinserting")
+                    return None
+                logger.info(f"News already pending: {headline}, pending_id: {row[0]}")
+                return row[0]
         logger.info(f"Inserted pending news: {headline}, pending_id: {pending_id}")
         return pending_id
     except Exception as e:
         logger.error(f"Error inserting pending news: {str(e)}")
         return None
-    finally:
-        conn.close()
+
+def approval_threshold(total_nodes):
+    """Number of approve votes a pending item needs (more than 60% of nodes)."""
+    return int(total_nodes * 0.6) + 1
+
+def rejection_threshold(total_nodes):
+    """Number of disapprove votes that put approval_threshold out of reach."""
+    return total_nodes - approval_threshold(total_nodes) + 1
+
+register_function('rejection_threshold', 1, rejection_threshold)
+
+def _insert_vote(cursor, pending_id, voter_node, vote):
+    """Record a vote and bump the item's counters inside the caller's transaction.
+
+    Returns 'recorded', 'duplicate' or 'invalid'.
+    """
+    cursor.execute('''
+        INSERT INTO node_votes (pending_id, voter_node, vote)
+        SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM pending_news WHERE id = ?)
+        ON CONFLICT(pending_id, voter_node) DO NOTHING
+    ''', (pending_id, voter_node, vote, pending_id))
+    if cursor.rowcount == 0:
+        cursor.execute('SELECT 1 FROM pending_news WHERE id = ?', (pending_id,))
+        return 'duplicate' if cursor.fetchone() else 'invalid'
+    cursor.execute('''
+        UPDATE pending_news
+        SET approval_votes = approval_votes + ?,
+            disapproval_votes = disapproval_votes + ?,
+            approval_rate = (approval_votes + ?) * 1.0 / total_nodes
+        WHERE id = ?
+    ''', (1 if vote == 1 else 0, 0 if vote == 1 else 1, 1 if vote == 1 else 0, pending_id))
+    return 'recorded'
 
 def add_node_vote(pending_id, voter_node, vote):
     """Record a vote from a node for a pending news item."""
@@ -114,160 +265,589 @@ def add_node_vote(pending_id, voter_node, vote):
             logger.error(f"voter_node is None for pending_id {pending_id}")
             return False
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Validate pending_id exists
-        cursor.execute('SELECT id FROM pending_news WHERE id = ?', (pending_id,))
-        if not cursor.fetchone():
+        with transaction(immediate=True) as cursor:
+            status = _insert_vote(cursor, pending_id, voter_node, vote)
+        if status == 'invalid':
             logger.error(f"Invalid pending_id {pending_id} in add_node_vote")
-            conn.close()
             return False
-
-        # Check if vote already exists
-        cursor.execute('''
-            SELECT vote FROM node_votes WHERE pending_id = ? AND voter_node = ?
-        ''', (pending_id, voter_node))
-        existing_vote = cursor.fetchone()
-        if existing_vote:
-            logger.info(f"Vote already recorded for pending_id {pending_id}, voter_node {voter_node}, vote {existing_vote[0]}")
-            conn.close()
+        if status == 'duplicate':
+            logger.info(f"Vote already recorded for pending_id {pending_id}, voter_node {voter_node}")
             return False
-
-        # Insert the vote
-        cursor.execute('''
-            INSERT INTO node_votes (pending_id, voter_node, vote)
-            VALUES (?, ?, ?)
-        ''', (pending_id, voter_node, vote))
-        
-        # Update approval_votes in pending_news
-        if vote == 1:
-            cursor.execute('''
-                UPDATE pending_news
-                SET approval_votes = approval_votes + 1,
-                    approval_rate = (approval_votes + 1) * 1.0 / total_nodes
-                WHERE id = ?
-            ''', (pending_id,))
-        
-        conn.commit()
         logger.info(f"Vote recorded: pending_id {pending_id}, voter_node {voter_node}, vote {vote}")
         return True
     except Exception as e:
         logger.error(f"Error adding node vote for pending_id {pending_id}: {str(e)}")
-        conn.close()
         return False
 
-def check_approval_threshold(pending_id):
-    """Check if a pending news item has reached the approval threshold."""
+def _record_vote(cursor, pending_id, voter_node, vote):
+    """Record a vote and approve the item on reaching the threshold, inside the caller's transaction."""
+    result = {'status': _insert_vote(cursor, pending_id, voter_node, vote), 'approved': False, 'data': None}
+    if result['status'] != 'recorded':
+        return result
+    cursor.execute('''
+        SELECT headline, body, author, total_nodes, approval_votes
+        FROM pending_news WHERE id = ?
+    ''', (pending_id,))
+    headline, body, author, total_nodes, approval_votes = cursor.fetchone()
+    if approval_votes >= approval_threshold(total_nodes):
+        _approve_pending(cursor, pending_id)
+        result['approved'] = True
+        result['data'] = {'headline': headline, 'body': body, 'author': author}
+    return result
+
+def record_vote(pending_id, voter_node, vote):
+    """Record a vote and, if it reaches the threshold, approve the item, all in one write transaction.
+
+    Returns a dict with 'status' ('recorded', 'duplicate', 'invalid' or 'error'),
+    'approved' and, when approved, the news 'data' to gossip.
+    """
+    if not voter_node:
+        logger.error(f"voter_node is None for pending_id {pending_id}")
+        return {'status': 'error', 'approved': False, 'data': None}
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT headline, body, author, total_nodes, approval_votes 
-            FROM pending_news WHERE id = ?
-        ''', (pending_id,))
-        result = cursor.fetchone()
-        if not result:
-            conn.close()
-            logger.error(f"Pending news not found for id {pending_id}")
-            return False, None
-        headline, body, author, total_nodes, approval_votes = result
-        approval_rate = approval_votes / total_nodes if total_nodes > 0 else 0
-        threshold_reached = approval_votes >= int(total_nodes * 0.6) + 1
-        news_data = {'headline': headline, 'body': body, 'author': author}
-        conn.close()
-        return threshold_reached, news_data
+        with transaction(immediate=True) as cursor:
+            result = _record_vote(cursor, pending_id, voter_node, vote)
+        logger.info(f"Vote {result['status']}: pending_id {pending_id}, voter_node {voter_node}, vote {vote}, approved {result['approved']}")
+        return result
+    except Exception as e:
+        logger.error(f"Error recording vote for pending_id {pending_id}: {str(e)}")
+        return {'status': 'error', 'approved': False, 'data': None}
+
+def record_votes_batch(votes, voter_node):
+    """Record many (pending_id, vote) pairs from one node in a single write transaction.
+
+    Returns one record_vote-style result per vote, in order, or None on error.
+    """
+    if not voter_node:
+        logger.error("voter_node is None in record_votes_batch")
+        return None
+    try:
+        with transaction(immediate=True) as cursor:
+            results = [_record_vote(cursor, pending_id, voter_node, vote) for pending_id, vote in votes]
+        logger.info(f"Recorded batch of {len(votes)} votes from {voter_node}")
+        return results
+    except Exception as e:
+        logger.error(f"Error recording vote batch: {str(e)}")
+        return None
+
+def submit_news_batch(items, total_nodes):
+    """Queue many news items for approval in a single write transaction.
+
+    Returns one result per item, in order, with status 'submitted', 'pending',
+    'approved', 'rejected', 'expired' or 'invalid'; known items carry their
+    news_hash and pending ones their pending_id. Returns None on error.
+    """
+    date = datetime.utcnow().isoformat()
+    results = []
+    try:
+        with transaction(immediate=True) as cursor:
+            for item in items:
+                if not isinstance(item, dict) or not validate_news(item):
+                    results.append({'status': 'invalid'})
+                    continue
+                news_hash = generate_news_hash(item['headline'], item['body'], item['author'])
+                result = {'news_hash': news_hash}
+                cursor.execute('SELECT 1 FROM approved_hashes WHERE news_hash = ?', (news_hash,))
+                if cursor.fetchone():
+                    result['status'] = 'approved'
+                else:
+                    cursor.execute('''
+                        INSERT INTO pending_news (headline, body, author, date, total_nodes, news_hash)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(news_hash) DO NOTHING
+                    ''', (item['headline'], item['body'], item['author'], date, total_nodes, news_hash))
+                    if cursor.rowcount:
+                        result['status'] = 'submitted'
+                        result['pending_id'] = cursor.lastrowid
+                    else:
+                        cursor.execute('SELECT id FROM pending_news WHERE news_hash = ?', (news_hash,))
+                        row = cursor.fetchone()
+                        if row:
+                            result['status'] = 'pending'
+                            result['pending_id'] = row[0]
+                        else:
+                            cursor.execute('SELECT reason FROM pending_tombstones WHERE news_hash = ?', (news_hash,))
+                            result['status'] = cursor.fetchone()[0]
+                results.append(result)
+        logger.info(f"Submitted batch of {len(items)} news items")
+        return results
     except Exception as e:
-        logger.error(f"Error checking approval threshold: {str(e)}")
-        return False, None
+        logger.error(f"Error submitting news batch: {str(e)}")
+        return None
+
+def _approve_pending(cursor, pending_id):
+    """Move a pending item and drop its votes inside the caller's transaction. Returns True if it existed."""
+    cursor.execute('''
+        INSERT INTO news (headline, body, author, date, approved, news_hash)
+        SELECT headline, body, author, date, 1, news_hash FROM pending_news WHERE id = ?
+        ON CONFLICT(news_hash) DO NOTHING
+    ''', (pending_id,))
+    cursor.execute('DELETE FROM node_votes WHERE pending_id = ?', (pending_id,))
+    cursor.execute('DELETE FROM pending_news WHERE id = ?', (pending_id,))
+    return cursor.rowcount > 0
 
 def approve_pending_news(pending_id):
     """Move approved news from pending_news to news table."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT headline, body, author, date 
-            FROM pending_news WHERE id = ?
-        ''', (pending_id,))
-        news = cursor.fetchone()
-        if news:
-            headline, body, author, date = news
-            cursor.execute('''
-                INSERT INTO news (headline, body, author, date, approved) 
-                VALUES (?, ?, ?, ?, ?)
-            ''', (headline, body, author, date, 1))
-            cursor.execute('DELETE FROM pending_news WHERE id = ?', (pending_id,))
-            cursor.execute('DELETE FROM node_votes WHERE pending_id = ?', (pending_id,))
-            conn.commit()
+        with transaction() as cursor:
+            approved = _approve_pending(cursor, pending_id)
+        if approved:
             logger.info(f"Approved pending news with id: {pending_id}")
-        conn.close()
-        return bool(news)
+        return approved
     except Exception as e:
         logger.error(f"Error approving pending news: {str(e)}")
         return False
 
+def _remove_pending(where, params, reason, batch_size):
+    """Drop pending items matching where, with their votes, leaving a tombstone for each.
+
+    Works in transactions of batch_size items. Returns the number removed.
+    """
+    removed = 0
+    while True:
+        with transaction(immediate=True) as cursor:
+            cursor.execute(f'SELECT id, news_hash FROM pending_news WHERE {where} LIMIT ?', (*params, batch_size))
+            rows = cursor.fetchall()
+            if rows:
+                removed_at = time.time()
+                cursor.executemany('''
+                    INSERT INTO pending_tombstones (news_hash, reason, removed_at) VALUES (?, ?, ?)
+                    ON CONFLICT(news_hash) DO NOTHING
+                ''', [(news_hash, reason, removed_at) for _, news_hash in rows])
+                ids = [(pending_id,) for pending_id, _ in rows]
+                cursor.executemany('DELETE FROM node_votes WHERE pending_id = ?', ids)
+                cursor.executemany('DELETE FROM pending_news WHERE id = ?', ids)
+        removed += len(rows)
+        if len(rows) < batch_size:
+            return removed
+
+def reject_pending_news(batch_size=MAINTENANCE_BATCH_ROWS):
+    """Drop pending items whose disapprovals put approval out of reach. Returns the number removed."""
+    try:
+        return _remove_pending('disapproval_votes >= rejection_threshold(total_nodes)', (), 'rejected', batch_size)
+    except Exception as e:
+        logger.error(f"Error rejecting pending news: {str(e)}")
+        return 0
+
+def expire_pending_news(max_age=PENDING_TTL, batch_size=MAINTENANCE_BATCH_ROWS):
+    """Drop pending items submitted more than max_age seconds ago. Returns the number removed."""
+    try:
+        cutoff = (datetime.utcnow() - timedelta(seconds=max_age)).isoformat()
+        return _remove_pending('date < ?', (cutoff,), 'expired', batch_size)
+    except Exception as e:
+        logger.error(f"Error expiring pending news: {str(e)}")
+        return 0
+
+def delete_orphan_votes(batch_size=MAINTENANCE_BATCH_ROWS):
+    """Delete votes whose pending item no longer exists. Returns the number deleted."""
+    deleted = 0
+    try:
+        while True:
+            with transaction(immediate=True) as cursor:
+                cursor.execute('''
+                    DELETE FROM node_votes WHERE id IN (
+                        SELECT id FROM node_votes v
+                        WHERE NOT EXISTS (SELECT 1 FROM pending_news p WHERE p.id = v.pending_id)
+                        LIMIT ?
+                    )
+                ''', (batch_size,))
+                count = cursor.rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+    except Exception as e:
+        logger.error(f"Error deleting orphan votes: {str(e)}")
+        return deleted
+
+def prune_pending_tombstones(max_age=PENDING_TOMBSTONE_TTL, batch_size=MAINTENANCE_BATCH_ROWS):
+    """Forget tombstones older than max_age seconds. Returns the number deleted."""
+    cutoff = time.time() - max_age
+    deleted = 0
+    try:
+        while True:
+            with transaction(immediate=True) as cursor:
+                cursor.execute('''
+                    DELETE FROM pending_tombstones WHERE news_hash IN (
+                        SELECT news_hash FROM pending_tombstones WHERE removed_at < ? LIMIT ?
+                    )
+                ''', (cutoff, batch_size))
+                count = cursor.rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+    except Exception as e:
+        logger.error(f"Error pruning pending tombstones: {str(e)}")
+        return deleted
+
+def get_pending_tombstone(news_hash):
+    """Why a pending item with this hash was dropped ('rejected' or 'expired'), or None."""
+    try:
+        with connection() as conn:
+            row = conn.execute('SELECT reason FROM pending_tombstones WHERE news_hash = ?', (news_hash,)).fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Error reading pending tombstone: {str(e)}")
+        return None
+
 def get_pending_news_by_hash(news_hash):
     """Get pending news by its hash."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, headline, body, author 
-            FROM pending_news 
-            WHERE headline || body || author = ?
-        ''', (news_hash,))
-        return cursor.fetchone()
+        with connection() as conn:
+            return conn.execute('''
+                SELECT id, headline, body, author
+                FROM pending_news
+                WHERE news_hash = ?
+            ''', (news_hash,)).fetchone()
     except Exception as e:
         logger.error(f"Error getting pending news by hash: {str(e)}")
         return None
-    finally:
-        conn.close()
+
+def get_pending_news_by_id(pending_id):
+    """Get a pending news item by its id."""
+    try:
+        with connection() as conn:
+            return conn.execute('''
+                SELECT id, headline, body, author
+                FROM pending_news
+                WHERE id = ?
+            ''', (pending_id,)).fetchone()
+    except Exception as e:
+        logger.error(f"Error getting pending news by id: {str(e)}")
+        return None
+
+def get_node_vote(pending_id, voter_node):
+    """Get the vote a node cast on a pending news item, or None if it has not voted."""
+    try:
+        with connection() as conn:
+            row = conn.execute('''
+                SELECT vote FROM node_votes WHERE pending_id = ? AND voter_node = ?
+            ''', (pending_id, voter_node)).fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Error getting node vote for pending_id {pending_id}: {str(e)}")
+        return None
 
 def is_news_approved(headline, body, author):
     """Check if news is already approved."""
+    return is_news_hash_approved(generate_news_hash(headline, body, author))
+
+def is_news_hash_approved(news_hash):
+    """Check if news with the given hash is already approved."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id FROM news 
-            WHERE headline = ? AND body = ? AND author = ? AND approved = 1
-        ''', (headline, body, author))
-        exists = cursor.fetchone()
-        conn.close()
+        with connection() as conn:
+            exists = conn.execute('SELECT 1 FROM approved_hashes WHERE news_hash = ?', (news_hash,)).fetchone()
         return bool(exists)
     except Exception as e:
         logger.error(f"Error checking if news is approved: {str(e)}")
         return False
 
-def get_all_approved_news():
-    """Get all approved news items."""
+def store_approved_news(headline, body, author):
+    """Record news approved elsewhere, promoting the local pending copy if there is one.
+
+    Both happen in one write transaction, so a failure leaves neither half
+    applied. Returns True if the article was new to this node.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, headline, body, author, date FROM news WHERE approved = 1')
-        news = cursor.fetchall()
-        conn.close()
-        return news
+        news_hash = generate_news_hash(headline, body, author)
+        with transaction(immediate=True) as cursor:
+            cursor.execute('SELECT 1 FROM approved_hashes WHERE news_hash = ?', (news_hash,))
+            if cursor.fetchone():
+                return False
+            cursor.execute('SELECT id FROM pending_news WHERE news_hash = ?', (news_hash,))
+            pending = cursor.fetchone()
+            if pending:
+                _approve_pending(cursor, pending[0])
+            else:
+                _insert_news(cursor, headline, body, author, approved=True)
+        return True
     except Exception as e:
-        logger.error(f"Error fetching approved news: {str(e)}")
+        logger.error(f"Error storing approved news: {str(e)}")
+        return False
+
+def get_approved_news_hashes():
+    """Get the hashes of all approved news items."""
+    try:
+        with connection() as conn:
+            return [row[0] for row in conn.execute('SELECT news_hash FROM approved_hashes')]
+    except Exception as e:
+        logger.error(f"Error fetching approved news hashes: {str(e)}")
         return []
 
-def get_all_pending_news():
-    """Get all pending news items."""
+def get_pending_news_hashes():
+    """Get the hashes of all pending news items."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, headline, body, author, date, total_nodes, approval_votes, approval_rate 
-            FROM pending_news
-        ''')
-        pending = cursor.fetchall()
-        conn.close()
-        return pending
+        with connection() as conn:
+            return [row[0] for row in conn.execute('SELECT news_hash FROM pending_news')]
+    except Exception as e:
+        logger.error(f"Error fetching pending news hashes: {str(e)}")
+        return []
+
+def _chunks(items, size=500):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def filter_approved_hashes(hashes):
+    """Return the subset of the given hashes that are approved on this node."""
+    try:
+        approved = set()
+        with connection() as conn:
+            for chunk in _chunks(hashes):
+                placeholders = ','.join('?' * len(chunk))
+                approved.update(row[0] for row in conn.execute(
+                    f'SELECT news_hash FROM approved_hashes WHERE news_hash IN ({placeholders})', chunk
+                ))
+        return approved
+    except Exception as e:
+        logger.error(f"Error filtering approved hashes: {str(e)}")
+        return set()
+
+def filter_removed_pending_hashes(hashes):
+    """Return the subset of the given hashes that were rejected or expired on this node."""
+    try:
+        removed = set()
+        with connection() as conn:
+            for chunk in _chunks(hashes):
+                placeholders = ','.join('?' * len(chunk))
+                removed.update(row[0] for row in conn.execute(
+                    f'SELECT news_hash FROM pending_tombstones WHERE news_hash IN ({placeholders})', chunk
+                ))
+        return removed
+    except Exception as e:
+        logger.error(f"Error filtering removed pending hashes: {str(e)}")
+        return set()
+
+def get_approved_news_by_hashes(hashes):
+    """Get approved news items as dicts for the given hashes, archived ones included."""
+    try:
+        results = []
+        with connection() as conn:
+            for chunk in _chunks(hashes):
+                placeholders = ','.join('?' * len(chunk))
+                results.extend(
+                    {'headline': row[0], 'body': row[1], 'author': row[2], 'news_hash': row[3], 'date': row[4]}
+                    for row in conn.execute(f'''
+                        SELECT headline, body, author, news_hash, date FROM news
+                        WHERE approved = 1 AND news_hash IN ({placeholders})
+                    ''', chunk)
+                )
+            found = {item['news_hash'] for item in results}
+            results.extend(
+                {'headline': row[0], 'body': row[1], 'author': row[2], 'news_hash': row[3], 'date': row[4]}
+                for row in get_archived_by_hashes(conn, [news_hash for news_hash in hashes if news_hash not in found])
+            )
+        return results
+    except Exception as e:
+        logger.error(f"Error fetching approved news by hash: {str(e)}")
+        return []
+
+def get_pending_news_by_hashes(hashes):
+    """Get pending news items as dicts for the given hashes."""
+    try:
+        results = []
+        with connection() as conn:
+            for chunk in _chunks(hashes):
+                placeholders = ','.join('?' * len(chunk))
+                results.extend(
+                    {'headline': row[0], 'body': row[1], 'author': row[2], 'total_nodes': row[3], 'news_hash': row[4], 'date': row[5]}
+                    for row in conn.execute(f'''
+                        SELECT headline, body, author, total_nodes, news_hash, date FROM pending_news
+                        WHERE news_hash IN ({placeholders})
+                    ''', chunk)
+                )
+        return results
+    except Exception as e:
+        logger.error(f"Error fetching pending news by hash: {str(e)}")
+        return []
+
+# Columns that list_approved_news / list_pending_news may project
+APPROVED_COLUMNS = ('id', 'headline', 'body', 'author', 'date', 'news_hash')
+PENDING_COLUMNS = ('id', 'headline', 'body', 'author', 'date', 'total_nodes', 'approval_votes', 'approval_rate', 'news_hash')
+
+def _list_page(table, where, allowed, columns, after_id, after_date, limit, order):
+    """Keyset-paginate a news table.
+
+    order='id' walks ids upward (used for sync); order='date' walks newest first
+    on (date, id), resuming after the row given by after_id (or after_date/after_id
+    when the cursor row may since have been deleted). For approved news the
+    archive partitions that can hold rows of the page are read as well.
+    Raises ValueError for a date cursor whose row no longer exists and
+    comes without its after_date.
+    """
+    if any(column not in allowed for column in columns):
+        raise ValueError(f"Unknown column in {columns}")
+    if order not in ('id', 'date'):
+        raise ValueError(f"Unknown order: {order}")
+    try:
+        # One read transaction, so the hot rows and the partition catalog agree
+        with transaction() as cursor:
+            partitions = list_partitions(cursor) if table == 'news' else []
+            if order == 'date' and after_id and not after_date:
+                # The cursor row may have been archived since
+                row = cursor.execute(f'SELECT date FROM {table} WHERE id = ?', (after_id,)).fetchone()
+                after_date = row[0] if row else find_archived_date(cursor, after_id) if partitions else None
+                if after_date is None:
+                    raise ValueError(f"after_id {after_id} no longer exists; pass its after_date as well")
+            params = []
+            if order == 'id':
+                condition, order_by = 'id > ?', 'id'
+                params.append(after_id or 0)
+            else:
+                order_by = 'date DESC, id DESC'
+                if after_id and after_date:
+                    condition = '(date, id) < (?, ?)'
+                    params.extend([after_date, after_id])
+                else:
+                    condition = '1'
+            # Merging with the archive needs each row's id and date
+            query_columns = tuple(columns) + tuple(column for column in ('id', 'date') if partitions and column not in columns)
+            sql = f'''
+                SELECT {', '.join(query_columns)} FROM {table}
+                WHERE {where} AND {condition}
+                ORDER BY {order_by} LIMIT ?
+            '''
+            rows = cursor.execute(sql, (*params, limit)).fetchall()
+            if partitions and order == 'id':
+                rows = merge_id_page(cursor, rows, query_columns, after_id, limit)
+            elif partitions:
+                rows = merge_date_page(rows, partitions, sql, (*params, limit), limit, after_date,
+                                       query_columns.index('id'), query_columns.index('date'))
+        if len(query_columns) > len(columns):
+            return [row[:len(columns)] for row in rows]
+        return rows
+    except ValueError:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching pending news: {str(e)}")
+        logger.error(f"Error listing {table}: {str(e)}")
         return []
 
+def list_approved_news(columns=APPROVED_COLUMNS, after_id=None, after_date=None, limit=50, order='date'):
+    """Get one keyset page of approved news with only the requested columns."""
+    return _list_page('news', 'approved = 1', APPROVED_COLUMNS, columns, after_id, after_date, limit, order)
+
+def list_pending_news(columns=PENDING_COLUMNS, after_id=None, after_date=None, limit=50, order='id'):
+    """Get one keyset page of pending news with only the requested columns."""
+    return _list_page('pending_news', '1', PENDING_COLUMNS, columns, after_id, after_date, limit, order)
+
+def iter_pages(list_fn, columns, after_id=None, after_date=None, order='id', limit=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield successive keyset pages from list_fn until the rows run out or limit rows were yielded.
+
+    columns must start with id and date, which carry the cursor. Each page is
+    its own short query, so a slow reader holds no pooled connection or read
+    snapshot between pages.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_rows if remaining is None else min(chunk_rows, remaining)
+        rows = list_fn(columns=columns, after_id=after_id, after_date=after_date, limit=size, order=order)
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        after_id, after_date = rows[-1][0], rows[-1][1]
+        if remaining is not None:
+            remaining -= len(rows)
+
+def store_approved_items(cursor, items):
+    """Insert approved news items inside the caller's transaction, skipping invalid ones and ones already stored.
+
+    Matching local pending items are removed, since they are now approved.
+    Errors are raised. Returns the number of new rows.
+    """
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for item in items:
+        if not validate_news(item):
+            continue
+        news_hash = generate_news_hash(item['headline'], item['body'], item['author'])
+        rows.append((item['headline'], item['body'], item['author'], item.get('date') or now, news_hash))
+    if not rows:
+        return 0
+    cursor.executemany('''
+        INSERT INTO news (headline, body, author, date, approved, news_hash)
+        VALUES (?, ?, ?, ?, 1, ?)
+        ON CONFLICT(news_hash) DO NOTHING
+    ''', rows)
+    inserted = cursor.rowcount
+    hashes = [(row[4],) for row in rows]
+    cursor.executemany('''
+        DELETE FROM node_votes WHERE pending_id IN (SELECT id FROM pending_news WHERE news_hash = ?)
+    ''', hashes)
+    cursor.executemany('DELETE FROM pending_news WHERE news_hash = ?', hashes)
+    return inserted
+
+def insert_approved_news_batch(items):
+    """Insert approved news items in one transaction, skipping ones already stored.
+
+    Matching local pending items are removed, since they are now approved.
+    Returns the number of new rows.
+    """
+    try:
+        with transaction(immediate=True) as cursor:
+            inserted = store_approved_items(cursor, items)
+        logger.info(f"Inserted {inserted} of {len(items)} approved news items")
+        return inserted
+    except Exception as e:
+        logger.error(f"Error inserting approved news batch: {str(e)}")
+        return 0
+
+def store_pending_items(cursor, items):
+    """Insert pending news items inside the caller's transaction, skipping invalid, pending or approved ones.
+
+    Errors are raised. Returns the number of new rows.
+    """
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for item in items:
+        if not validate_news(item):
+            continue
+        news_hash = generate_news_hash(item['headline'], item['body'], item['author'])
+        rows.append((item['headline'], item['body'], item['author'], item.get('date') or now,
+                     item.get('total_nodes', 1), news_hash, news_hash))
+    if not rows:
+        return 0
+    cursor.executemany('''
+        INSERT INTO pending_news (headline, body, author, date, total_nodes, news_hash)
+        SELECT ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM approved_hashes WHERE news_hash = ?)
+        ON CONFLICT(news_hash) DO NOTHING
+    ''', rows)
+    return cursor.rowcount
+
+def insert_pending_news_batch(items):
+    """Insert pending news items in one transaction, skipping ones already pending or approved.
+
+    Returns the number of new rows.
+    """
+    try:
+        with transaction(immediate=True) as cursor:
+            inserted = store_pending_items(cursor, items)
+        logger.info(f"Inserted {inserted} of {len(items)} pending news items")
+        return inserted
+    except Exception as e:
+        logger.error(f"Error inserting pending news batch: {str(e)}")
+        return 0
+
+def get_sync_cursor(peer, stream):
+    """Get the last peer row id already synced for a stream ('approved' or 'pending')."""
+    try:
+        with connection() as conn:
+            row = conn.execute('SELECT last_id FROM sync_cursors WHERE peer = ? AND stream = ?', (peer, stream)).fetchone()
+        return row[0] if row else 0
+    except Exception as e:
+        logger.error(f"Error reading sync cursor for {peer}: {str(e)}")
+        return 0
+
+def set_sync_cursor(peer, stream, last_id):
+    """Remember the last peer row id synced for a stream."""
+    try:
+        with transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO sync_cursors (peer, stream, last_id, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(peer, stream) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+            ''', (peer, stream, last_id, datetime.utcnow().isoformat()))
+    except Exception as e:
+        logger.error(f"Error saving sync cursor for {peer}: {str(e)}")
+
 # Initialize database on module import
-init_db()
\ No newline at end of file
+init_db()
@@ -0,0 +1,120 @@
+import gzip
+import io
+import logging
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import wire
+from config import (
+    PEER_POOL_MAXSIZE, PEER_POOL_BLOCK, PEER_GZIP, PEER_GZIP_MIN_BYTES,
+    GOSSIP_CONNECT_TIMEOUT, GOSSIP_READ_TIMEOUT, MAX_REQUEST_BODY_BYTES
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PeerClient:
+    """Shared HTTP client for all peer traffic.
+
+    Each peer host gets its own requests.Session with a keep-alive connection
+    pool, so gossip, sync and anti-entropy requests reuse TCP connections
+    instead of opening one per message. Bodies are encoded per wire.py and
+    can be gzipped.
+    """
+
+    def __init__(self, pool_maxsize=PEER_POOL_MAXSIZE, pool_block=PEER_POOL_BLOCK,
+                 gzip_bodies=PEER_GZIP, gzip_min_bytes=PEER_GZIP_MIN_BYTES):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.gzip_bodies = gzip_bodies
+        self.gzip_min_bytes = gzip_min_bytes
+        self.requests_sent = 0
+        self.registry = None  # PeerRegistry told about each request's outcome
+
+    def session_for(self, url):
+        """Return the pooled session for a URL's scheme and host, creating it on first use."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize,
+                                      pool_block=self.pool_block, max_retries=0)
+                session.mount(f"{parts.scheme}://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def request(self, method, url, json_body=None, timeout=(GOSSIP_CONNECT_TIMEOUT, GOSSIP_READ_TIMEOUT), **kwargs):
+        """Send one counted request to a peer; raises like requests does."""
+        headers = {'Accept': wire.accept_header(), **kwargs.pop('headers', {})}
+        if json_body is not None:
+            content_type = wire.request_content_type()
+            body = wire.encode(json_body, content_type)
+            headers['Content-Type'] = content_type
+            if self.gzip_bodies and len(body) >= self.gzip_min_bytes:
+                body = gzip.compress(body, compresslevel=5)
+                headers['Content-Encoding'] = 'gzip'
+            kwargs['data'] = body
+        kwargs['headers'] = headers
+        with self._lock:
+            self.requests_sent += 1
+        parts = urlsplit(url)
+        peer = f"{parts.scheme}://{parts.netloc}"
+        start = time.monotonic()
+        try:
+            response = self.session_for(url).request(method, url, timeout=timeout, **kwargs)
+        except Exception as e:
+            if self.registry is not None:
+                self.registry.record_failure(peer, e)
+            raise
+        if self.registry is not None:
+            if response.status_code >= 500:
+                self.registry.record_failure(peer, f"HTTP {response.status_code}")
+            else:
+                self.registry.record_success(peer, time.monotonic() - start)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, json_body=None, **kwargs):
+        return self.request('POST', url, json_body=json_body, **kwargs)
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+class GzipRequestMiddleware:
+    """WSGI middleware that inflates gzip-encoded request bodies sent by peers."""
+
+    def __init__(self, app, max_size=MAX_REQUEST_BODY_BYTES):
+        self.app = app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            try:
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                body = inflater.decompress(environ['wsgi.input'].read(length), self.max_size)
+                if inflater.unconsumed_tail:
+                    raise ValueError(f"decompressed body exceeds {self.max_size} bytes")
+            except (zlib.error, ValueError) as e:
+                logger.error(f"Rejected gzip request body: {str(e)}")
+                start_response('400 Bad Request', [('Content-Type', 'application/json')])
+                return [b'{"error": "Invalid gzip request body"}']
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.app(environ, start_response)
+
+peer_client = PeerClient()
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from db import connection, transaction
+from config import PEER_DEAD_AFTER_FAILURES, PEER_OPEN_BASE, PEER_OPEN_MAX, PEER_RTT_ALPHA, PEER_STATS_FLUSH_INTERVAL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PEER_COLUMNS = {
+    'last_seen': 'REAL',
+    'last_failure': 'REAL',
+    'rtt': 'REAL',
+    'failures': 'INTEGER NOT NULL DEFAULT 0',
+    'state': "TEXT NOT NULL DEFAULT 'alive'",
+    'last_error': 'TEXT',
+    'open_until': 'REAL'
+}
+
+class PeerRegistry:
+    """Peers and their health, stored in SQLite so every worker process shares them.
+
+    Behaves like a set of peer URLs (add, update, discard, clear, membership,
+    len, iteration over a snapshot) and also tracks per-peer last-seen time,
+    smoothed RTT and consecutive failures.
+
+    Each peer has a circuit breaker. A peer becomes 'suspect' after a failure
+    and 'dead' (circuit open) after PEER_DEAD_AFTER_FAILURES in a row, which
+    drops it from active(). Once open_until passes the circuit is half-open:
+    the health checker probes the peer, and a successful probe closes it
+    while a failed one reopens it for twice as long, up to PEER_OPEN_MAX.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._rtt = {}  # smoothed RTT per peer as seen by this process
+        self._flushed_at = {}
+
+    def _init_table(self):
+        with self._lock:
+            if self._ready:
+                return
+            with transaction() as cursor:
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS peers (
+                        url TEXT PRIMARY KEY,
+                        added_at REAL NOT NULL
+                    )
+                ''')
+                cursor.execute('PRAGMA table_info(peers)')
+                existing = {row[1] for row in cursor.fetchall()}
+                for column, definition in PEER_COLUMNS.items():
+                    if column not in existing:
+                        cursor.execute(f'ALTER TABLE peers ADD COLUMN {column} {definition}')
+            self._ready = True
+
+    def add(self, url):
+        self.update([url])
+
+    def update(self, urls):
+        self._init_table()
+        now = time.time()
+        with transaction() as cursor:
+            cursor.executemany('INSERT INTO peers (url, added_at) VALUES (?, ?) ON CONFLICT(url) DO NOTHING',
+                               [(url, now) for url in urls if url])
+
+    def revive(self, url):
+        """Close a peer's circuit, e.g. after a successful probe or when it re-registers. Returns True if known."""
+        self._init_table()
+        with self._lock:
+            self._flushed_at.pop(url, None)
+        with transaction() as cursor:
+            cursor.execute('''
+                UPDATE peers SET failures = 0, state = 'alive', last_error = NULL, open_until = NULL,
+                    last_seen = ?
+                WHERE url = ? RETURNING 1
+            ''', (time.time(), url))
+            revived = cursor.fetchone() is not None
+        return revived
+
+    def discard(self, url):
+        self._init_table()
+        with transaction() as cursor:
+            cursor.execute('DELETE FROM peers WHERE url = ?', (url,))
+
+    def clear(self):
+        self._init_table()
+        with transaction() as cursor:
+            cursor.execute('DELETE FROM peers')
+
+    def snapshot(self):
+        """All peer URLs as a list."""
+        self._init_table()
+        with connection() as conn:
+            return [row[0] for row in conn.execute('SELECT url FROM peers ORDER BY added_at, url')]
+
+    def active(self, exclude=()):
+        """Peers whose circuit is closed, i.e. worth including in fan-out and sync."""
+        self._init_table()
+        with connection() as conn:
+            rows = conn.execute("SELECT url FROM peers WHERE state != 'dead' ORDER BY added_at, url").fetchall()
+        return [row[0] for row in rows if row[0] not in exclude]
+
+    def is_available(self, url):
+        """False while the peer's circuit is open or half-open."""
+        self._init_table()
+        with connection() as conn:
+            row = conn.execute('SELECT state FROM peers WHERE url = ?', (url,)).fetchone()
+        return row is None or row[0] != 'dead'
+
+    def due_for_check(self):
+        """Peers to heartbeat now: every live one plus dead ones whose circuit has gone half-open."""
+        self._init_table()
+        with connection() as conn:
+            rows = conn.execute('''
+                SELECT url, state FROM peers
+                WHERE state != 'dead' OR open_until IS NULL OR open_until <= ?
+                ORDER BY added_at, url
+            ''', (time.time(),)).fetchall()
+        return [(url, state == 'dead') for url, state in rows]
+
+    def record_success(self, url, rtt):
+        """Note a successful exchange with a peer. Writes are batched per PEER_STATS_FLUSH_INTERVAL."""
+        now = time.time()
+        with self._lock:
+            previous = self._rtt.get(url)
+            rtt = rtt if previous is None else previous + PEER_RTT_ALPHA * (rtt - previous)
+            self._rtt[url] = rtt
+            if now - self._flushed_at.get(url, 0) < PEER_STATS_FLUSH_INTERVAL:
+                return
+            self._flushed_at[url] = now
+        self._init_table()
+        try:
+            with transaction(immediate=True) as cursor:
+                cursor.execute('SELECT state FROM peers WHERE url = ?', (url,))
+                row = cursor.fetchone()
+                if not row:
+                    return
+                cursor.execute('''
+                    UPDATE peers SET last_seen = ?, rtt = ?, failures = 0, state = 'alive', last_error = NULL,
+                        open_until = NULL
+                    WHERE url = ?
+                ''', (now, rtt, url))
+            if row[0] != 'alive':
+                logger.info(f"Peer {url} is alive again")
+        except Exception as e:
+            logger.error(f"Error recording success for peer {url}: {str(e)}")
+
+    def record_failure(self, url, error):
+        """Note a failed exchange; consecutive failures mark the peer suspect, then open its circuit."""
+        self._init_table()
+        with self._lock:
+            self._flushed_at.pop(url, None)
+        now = time.time()
+        try:
+            with transaction() as cursor:
+                cursor.execute('''
+                    UPDATE peers SET failures = failures + 1, last_failure = ?, last_error = ?,
+                        state = CASE WHEN failures + 1 >= ? THEN 'dead' ELSE 'suspect' END
+                    WHERE url = ?
+                    RETURNING state, failures
+                ''', (now, str(error)[:500], PEER_DEAD_AFTER_FAILURES, url))
+                row = cursor.fetchone()
+                if row and row[0] == 'dead':
+                    cooldown = min(PEER_OPEN_BASE * 2 ** (row[1] - PEER_DEAD_AFTER_FAILURES), PEER_OPEN_MAX)
+                    cursor.execute('UPDATE peers SET open_until = ? WHERE url = ?', (now + cooldown, url))
+            if row and row[0] == 'dead' and row[1] == PEER_DEAD_AFTER_FAILURES:
+                logger.warning(f"Peer {url} marked dead after {row[1]} consecutive failures: {error}")
+        except Exception as e:
+            logger.error(f"Error recording failure for peer {url}: {str(e)}")
+
+    def stats(self):
+        """Per-peer health and circuit-breaker metadata for monitoring."""
+        self._init_table()
+        now = time.time()
+        with connection() as conn:
+            rows = conn.execute('''
+                SELECT url, state, failures, rtt, last_seen, last_failure, last_error, open_until
+                FROM peers ORDER BY added_at, url
+            ''').fetchall()
+        return [
+            {
+                "url": url,
+                "state": state,
+                "circuit": "closed" if state != 'dead' else ("open" if open_until and open_until > now else "half_open"),
+                "failures": failures,
+                "rtt_ms": round(rtt * 1000, 2) if rtt is not None else None,
+                "last_seen": last_seen,
+                "last_failure": last_failure,
+                "last_error": last_error,
+                "open_until": open_until
+            }
+            for url, state, failures, rtt, last_seen, last_failure, last_error, open_until in rows
+        ]
+
+    def __contains__(self, url):
+        self._init_table()
+        with connection() as conn:
+            return conn.execute('SELECT 1 FROM peers WHERE url = ?', (url,)).fetchone() is not None
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        self._init_table()
+        with connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM peers').fetchone()[0]
+
+    def __repr__(self):
+        return repr(set(self.snapshot()))
+
+peer_registry = PeerRegistry()
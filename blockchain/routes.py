@@ -1,20 +1,193 @@
 # routes.py
-from flask import Blueprint, request, jsonify
+import itertools
+from flask import Blueprint, Response, request, jsonify, send_file
 from news import (
-    validate_news, get_all_approved_news, insert_pending_news, 
-    add_node_vote, check_approval_threshold, approve_pending_news,
-    get_pending_news_by_hash, is_news_approved, generate_news_hash,
-    get_all_pending_news
+    validate_news, insert_pending_news, record_vote, record_votes_batch, submit_news_batch,
+    approval_threshold,
+    get_pending_news_by_hash, get_pending_tombstone, is_news_hash_approved, generate_news_hash,
+    store_approved_news, list_approved_news, list_pending_news, iter_pages,
+    get_approved_news_by_hashes, store_approved_items, store_pending_items
 )
-from network import gossip_approved_news, other_nodes, sync_approved_news_with_peer, sync_pending_news_with_peer, gossip_vote_request, get_node_url
+from config import MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, BATCH_MAX_ITEMS
+from network import (
+    gossip_approved_news, other_nodes,
+    gossip_vote_request, get_node_url, new_gossip_message, gossip_message_id, prepare_forward,
+    seen_messages, send_gossip_batch
+)
+import network
+from dispatcher import dispatcher
+from peer_client import peer_client
+from anti_entropy import apply_items, build_exchange_response
+from merkle import get_merkle_root, get_merkle_children
+from db import transaction
+from search import search_news
+from wire import (
+    request_data, respond, wants_ndjson, ndjson_chunks, json_document_chunks, stream_response,
+    JSON_TYPE, NDJSON_TYPE
+)
+from sync_worker import sync_worker
+from snapshot import snapshot_store
+from cache import cached_response
+from events import event_feed
 import logging
-import sqlite3
-from news import DB_PATH
 
 bp = Blueprint('routes', __name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def approval_message(news_data):
+    """Build the gossip message announcing a news item approved on this node."""
+    news_hash = generate_news_hash(news_data['headline'], news_data['body'], news_data['author'])
+    return new_gossip_message('approved_news', news_hash=news_hash, approved=True, **news_data)
+
+def announce_approval(news_data):
+    """Gossip a news item approved on this node to its peers."""
+    gossip_approved_news(approval_message(news_data))
+
+def batch_items(data, key):
+    """Pull the item list out of a batch request body, which may also be a bare list.
+
+    Raises ValueError if it is missing or larger than BATCH_MAX_ITEMS.
+    """
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"A non-empty '{key}' list is required")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {BATCH_MAX_ITEMS} {key} per request")
+    return items
+
+def format_approval_rate(row):
+    return round(row['approval_rate'] * 100, 1) if row['approval_rate'] else 0
+
+def format_status(row):
+    return "Approved" if (row['approval_rate'] or 0) >= 0.6 else "Pending"
+
+# Response field -> (column, formatter) for each listing endpoint
+APPROVED_FIELDS = {
+    "id": ("id", None),
+    "headline": ("headline", None),
+    "body": ("body", None),
+    "author": ("author", None),
+    "date": ("date", None),
+    "news_hash": ("news_hash", None)
+}
+TOVERIFY_FIELDS = {
+    "id": ("id", None),
+    "title": ("headline", None),
+    "description": ("body", None),
+    "author": ("author", None),
+    "publishedAt": ("date", None),
+    "approval_rate": ("approval_rate", format_approval_rate)
+}
+PENDING_FIELDS = {
+    **TOVERIFY_FIELDS,
+    "total_nodes": ("total_nodes", None),
+    "approval_votes": ("approval_votes", None),
+    "status": ("approval_rate", format_status),
+    "news_hash": ("news_hash", None)
+}
+
+def int_arg(name, minimum):
+    """An integer query parameter, or None when it is absent.
+
+    Raises ValueError with a fixed message when it is not an integer of at least minimum.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or number < minimum:
+        raise ValueError(f"{name} must be a {'positive' if minimum > 0 else 'non-negative'} integer")
+    return number
+
+def page_query(field_specs, default_fields, default_order):
+    """Parse the fields/order/after_id/after_date query parameters of a listing.
+
+    Returns (fields, columns, order, after_id, after_date); columns always
+    start with id and date, which carry the cursor. Raises ValueError for
+    malformed parameters.
+    """
+    fields = [field for field in request.args.get('fields', '').split(',') if field] or default_fields
+    unknown = [field for field in fields if field not in field_specs]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    order = request.args.get('order', default_order)
+    if order not in ('id', 'date'):
+        raise ValueError("order must be 'id' or 'date'")
+    after_id = int_arg('after_id', 0)
+    after_date = request.args.get('after_date') or None
+
+    columns = ['id', 'date']
+    for field in fields:
+        column = field_specs[field][0]
+        if column not in columns:
+            columns.append(column)
+    return fields, tuple(columns), order, after_id, after_date
+
+def format_rows(rows, columns, fields, field_specs):
+    """Shape listing rows into response items with the requested fields."""
+    items = []
+    for row in rows:
+        row = dict(zip(columns, row))
+        items.append({
+            field: formatter(row) if formatter else row[column]
+            for field, (column, formatter) in ((field, field_specs[field]) for field in fields)
+        })
+    return items
+
+def fetch_page(list_fn, field_specs, default_fields, default_order, default_limit=DEFAULT_PAGE_SIZE):
+    """Run one keyset page query shaped by the after_id/after_date/limit/order/fields query parameters.
+
+    Without limit or a cursor every row is returned, as the frontend expects.
+    Returns (items, next_after_id, next_after_date); the cursor is None on the last page.
+    Raises ValueError for malformed parameters.
+    """
+    fields, columns, order, after_id, after_date = page_query(field_specs, default_fields, default_order)
+    limit = int_arg('limit', 1)
+    if limit is None and after_id is None and after_date is None:
+        rows = [row for page in iter_pages(list_fn, columns, order=order) for row in page]
+        return format_rows(rows, columns, fields, field_specs), None, None
+    limit = min(limit or default_limit, MAX_PAGE_SIZE)
+    rows = list_fn(columns=columns, after_id=after_id, after_date=after_date, limit=limit, order=order)
+    items = format_rows(rows, columns, fields, field_specs)
+    if len(rows) < limit:
+        return items, None, None
+    return items, rows[-1][0], rows[-1][1]
+
+def wants_stream():
+    """Whether a listing request asked for the whole result streamed rather than one page."""
+    return request.args.get('stream') in ('json', 'ndjson') or wants_ndjson()
+
+def stream_page(list_fn, field_specs, default_fields, default_order, key, extra=None):
+    """Stream every row after the cursor, or the first limit rows, without building the result in memory.
+
+    Sends NDJSON when asked for it, otherwise one JSON document {key: [...], **extra}
+    shaped like the last page of the paginated response. Rows are read
+    STREAM_CHUNK_ROWS at a time. Raises ValueError for malformed parameters.
+    """
+    fields, columns, order, after_id, after_date = page_query(field_specs, default_fields, default_order)
+    limit = int_arg('limit', 1)
+    pages = iter_pages(list_fn, columns, after_id, after_date, order, limit)
+    # Read the first page now, so a bad cursor is answered with a 400 rather than a broken stream
+    first = next(pages, [])
+    batches = (format_rows(rows, columns, fields, field_specs) for rows in itertools.chain([first], pages))
+    if wants_ndjson():
+        return stream_response(ndjson_chunks(batches), NDJSON_TYPE)
+    return stream_response(json_document_chunks(key, batches, extra), JSON_TYPE)
+
+def format_approved(item):
+    """Serialize an approved news row."""
+    return {
+        "id": item[0],
+        "headline": item[1],
+        "body": item[2],
+        "author": item[3],
+        "date": item[4]
+    }
+
 @bp.route('/news', methods=['POST'])
 def submit_news():
     """Submit a news item for network approval."""
@@ -24,36 +197,40 @@ def submit_news():
             return jsonify({"error": "Invalid news format"}), 400
 
         headline, body, author = news['headline'], news['body'], news['author']
-        
-        if is_news_approved(headline, body, author):
-            return jsonify({"message": "News already approved"}), 200
-            
         news_hash = generate_news_hash(headline, body, author)
+
+        if is_news_hash_approved(news_hash):
+            return jsonify({"message": "News already approved"}), 200
+
         existing_pending = get_pending_news_by_hash(news_hash)
         if existing_pending:
             return jsonify({"message": "News already pending approval"}), 200
 
+        removed = get_pending_tombstone(news_hash)
+        if removed:
+            return jsonify({"error": f"News was already {removed}"}), 409
+
         total_nodes = len(other_nodes) + 1
         
         pending_id = insert_pending_news(headline, body, author, total_nodes)
         if not pending_id:
             return jsonify({"error": "Failed to submit news"}), 500
 
-        vote_request = {
-            'type': 'vote_request',
-            'pending_id': pending_id,
-            'news': news,
-            'news_hash': news_hash,
-            'total_nodes': total_nodes
-        }
-        
+        vote_request = new_gossip_message(
+            'vote_request',
+            pending_id=pending_id,
+            news={'headline': headline, 'body': body, 'author': author},
+            news_hash=news_hash,
+            total_nodes=total_nodes
+        )
+
         gossip_vote_request(vote_request)
         
         logger.info(f"News submitted for approval: {headline}")
         return jsonify({
             "message": "News submitted for network approval",
             "pending_id": pending_id,
-            "requires_votes": int(total_nodes * 0.6) + 1
+            "requires_votes": approval_threshold(total_nodes)
         }), 202
     except Exception as e:
         logger.error(f"Error submitting news: {str(e)}")
@@ -63,26 +240,43 @@ def submit_news():
 def receive_vote_request():
     """Receive vote request from another node."""
     try:
-        data = request.get_json()
+        data = request_data()
         if not data or data.get('type') != 'vote_request':
             return jsonify({"error": "Invalid vote request"}), 400
 
-        news = data['news']
-        news_hash = data['news_hash']
-        pending_id = data['pending_id']
+        news = data.get('news')
+        if not isinstance(news, dict) or not validate_news(news):
+            return jsonify({"error": "Invalid news format"}), 400
+        news_hash = generate_news_hash(news['headline'], news['body'], news['author'])
+        data = {**data, 'news_hash': news_hash}
         total_nodes = data['total_nodes']
 
-        existing = get_pending_news_by_hash(news_hash)
-        if not existing:
-            local_pending_id = insert_pending_news(
-                news['headline'], news['body'], news['author'], total_nodes
-            )
-        else:
-            local_pending_id = existing[0]
+        # The message is marked seen in the same transaction as the pending
+        # insert, so a failed request leaves it unseen and a redelivery is
+        # processed again
+        with transaction(immediate=True) as cursor:
+            if not seen_messages.add(gossip_message_id(data)):
+                logger.info(f"Duplicate vote request {gossip_message_id(data)} dropped")
+                return jsonify({"message": "Duplicate vote request ignored"}), 200
+
+            if is_news_hash_approved(news_hash):
+                logger.info(f"Vote request for already approved news {news_hash}, ignoring")
+                return jsonify({"message": "News already approved"}), 200
+
+            removed = get_pending_tombstone(news_hash)
+            if removed:
+                logger.info(f"Vote request for {removed} news {news_hash}, ignoring")
+                return jsonify({"message": f"News already {removed}"}), 200
+
+            store_pending_items(cursor, [{**news, 'total_nodes': total_nodes}])
+            cursor.execute('SELECT id FROM pending_news WHERE news_hash = ?', (news_hash,))
+            local_pending_id = cursor.fetchone()[0]
 
         logger.info(f"Vote request received for pending_id {local_pending_id}. Awaiting manual vote.")
 
-        gossip_vote_request(data)
+        forward = prepare_forward(data)
+        if forward:
+            gossip_vote_request(forward)
         
         return jsonify({"message": "Vote request received, awaiting manual vote"}), 200
     except Exception as e:
@@ -108,41 +302,25 @@ def manual_vote(pending_id):
             logger.error(f"Node URL not configured for pending_id: {pending_id}")
             return jsonify({"error": str(e)}), 500
 
-        # Check if pending_id exists
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM pending_news WHERE id = ?', (pending_id,))
-        if not cursor.fetchone():
-            conn.close()
+        # Record the vote and approve on threshold in a single write transaction
+        result = record_vote(pending_id, voter_node, vote)
+        if result['status'] == 'invalid':
             logger.error(f"Invalid pending_id: {pending_id} for voter_node: {voter_node}")
             return jsonify({"error": "Invalid pending_id"}), 400
-
-        # Check if vote already recorded
-        cursor.execute('SELECT vote FROM node_votes WHERE pending_id = ? AND voter_node = ?', 
-                       (pending_id, voter_node))
-        existing_vote = cursor.fetchone()
-        if existing_vote:
-            conn.close()
-            logger.info(f"Vote already recorded for pending_id: {pending_id}, voter_node: {voter_node}, existing_vote: {existing_vote[0]}")
+        if result['status'] == 'duplicate':
+            logger.info(f"Vote already recorded for pending_id: {pending_id}, voter_node: {voter_node}")
             return jsonify({"error": "Vote already recorded"}), 400
-
-        # Record the vote
-        success = add_node_vote(pending_id, voter_node, vote)
-        conn.close()
-        if not success:
+        if result['status'] != 'recorded':
             logger.error(f"Failed to record vote for pending_id: {pending_id}, voter_node: {voter_node}")
             return jsonify({"error": "Failed to record vote"}), 500
 
-        # Check approval threshold
-        threshold_reached, news_data = check_approval_threshold(pending_id)
-        if threshold_reached:
-            approve_pending_news(pending_id)
-            approved_news = {**news_data, 'approved': True}
-            gossip_approved_news(approved_news)
-            logger.info(f"News approved: {news_data['headline']}")
+        approved = result['approved']
+        if approved:
+            announce_approval(result['data'])
+            logger.info(f"News approved: {result['data']['headline']}")
 
         logger.info(f"Vote recorded for pending_id: {pending_id}, voter_node: {voter_node}, vote: {vote}")
-        return jsonify({"message": "Vote recorded successfully"}), 200
+        return jsonify({"message": "Vote recorded successfully", "approved": approved}), 202 if approved else 200
     except Exception as e:
         logger.error(f"Error processing manual vote for pending_id {pending_id}: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -151,7 +329,7 @@ def manual_vote(pending_id):
 def receive_vote_response():
     """Receive vote response from another node."""
     try:
-        data = request.get_json()
+        data = request_data()
         if not data or data.get('type') != 'vote_response':
             return jsonify({"error": "Invalid vote response"}), 400
 
@@ -163,118 +341,329 @@ def receive_vote_response():
             logger.error(f"Invalid voter_node in vote_response for pending_id: {pending_id}")
             return jsonify({"error": "Invalid voter_node"}), 400
 
-        success = add_node_vote(pending_id, voter_node, vote)
-        if not success:
+        result = record_vote(pending_id, voter_node, vote)
+        if result['status'] == 'invalid':
+            return jsonify({"error": "Invalid pending_id"}), 400
+        if result['status'] == 'duplicate':
             return jsonify({"message": "Vote already recorded"}), 200
+        if result['status'] != 'recorded':
+            return jsonify({"error": "Failed to record vote"}), 500
 
-        threshold_reached, news_data = check_approval_threshold(pending_id)
-        
-        if threshold_reached:
-            approve_pending_news(pending_id)
-            approved_news = {**news_data, 'approved': True}
-            gossip_approved_news(approved_news)
-            logger.info(f"News approved: {news_data['headline']}")
+        approved = result['approved']
+        if approved:
+            announce_approval(result['data'])
+            logger.info(f"News approved: {result['data']['headline']}")
 
-        return jsonify({"message": "Vote processed"}), 200
+        return jsonify({"message": "Vote processed", "approved": approved}), 202 if approved else 200
     except Exception as e:
         logger.error(f"Error processing vote response: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@bp.route('/news/batch', methods=['POST'])
+def submit_news_batch_route():
+    """Submit many news items in one transaction and gossip their vote requests together.
+
+    Body: {"items": [{"headline", "body", "author"}, ...]}. Returns a result per item.
+    """
+    try:
+        try:
+            items = batch_items(request.get_json(silent=True), 'items')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        total_nodes = len(other_nodes) + 1
+        results = submit_news_batch(items, total_nodes)
+        if results is None:
+            return jsonify({"error": "Failed to submit news"}), 500
+
+        vote_requests = [
+            new_gossip_message(
+                'vote_request',
+                pending_id=result['pending_id'],
+                news={'headline': item['headline'], 'body': item['body'], 'author': item['author']},
+                news_hash=result['news_hash'],
+                total_nodes=total_nodes
+            )
+            for item, result in zip(items, results) if result['status'] == 'submitted'
+        ]
+        if vote_requests:
+            send_gossip_batch(vote_requests, "Vote request batch")
+
+        logger.info(f"News batch submitted: {len(vote_requests)} of {len(items)} items new")
+        return jsonify({
+            "results": results,
+            "submitted": len(vote_requests),
+            "requires_votes": approval_threshold(total_nodes)
+        }), 202 if vote_requests else 200
+    except Exception as e:
+        logger.error(f"Error submitting news batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/votes/batch', methods=['POST'])
+def manual_vote_batch():
+    """Cast this node's votes on many pending items in one transaction.
+
+    Body: {"votes": [{"pending_id": 1, "action": "approve"}, ...]}. Items approved
+    by the batch are announced to peers together. Returns a result per vote.
+    """
+    try:
+        try:
+            entries = batch_items(request.get_json(silent=True), 'votes')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            voter_node = get_node_url()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 500
+
+        results = [None] * len(entries)
+        votes, positions = [], []
+        for index, entry in enumerate(entries):
+            action = str(entry.get('action', '')).lower() if isinstance(entry, dict) else ''
+            pending_id = entry.get('pending_id') if isinstance(entry, dict) else None
+            if action not in ('approve', 'disapprove') or not isinstance(pending_id, int):
+                results[index] = {"pending_id": pending_id, "status": "invalid", "approved": False}
+                continue
+            votes.append((pending_id, 1 if action == 'approve' else 0))
+            positions.append(index)
+
+        recorded = record_votes_batch(votes, voter_node) if votes else []
+        if recorded is None:
+            return jsonify({"error": "Failed to record votes"}), 500
+
+        approvals = []
+        for index, (pending_id, _), result in zip(positions, votes, recorded):
+            results[index] = {"pending_id": pending_id, "status": result['status'], "approved": result['approved']}
+            if result['approved']:
+                approvals.append(approval_message(result['data']))
+        if approvals:
+            send_gossip_batch(approvals, "Approved news batch")
+
+        logger.info(f"Vote batch from {voter_node}: {len(votes)} recorded or checked, {len(approvals)} approved")
+        return jsonify({"results": results, "approved": len(approvals)}), 202 if approvals else 200
+    except Exception as e:
+        logger.error(f"Error processing vote batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/gossip/batch', methods=['POST'])
+def receive_gossip_batch():
+    """Receive several gossip messages from one peer and apply them in one transaction.
+
+    Accepts the vote_request and approved_news messages that /vote_request and
+    /approved_news take one at a time; unseen ones are forwarded as a batch.
+    Returns a status per message: 'stored', 'known' (already held here),
+    'duplicate' (already seen) or 'invalid'. If storing fails nothing is
+    applied, not even the seen marks, and the peer gets a 500 to retry.
+    """
+    try:
+        data = request_data()
+        if not data or data.get('type') != 'batch':
+            return jsonify({"error": "Invalid gossip batch"}), 400
+        try:
+            messages = batch_items(data, 'messages')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        results, fresh = [], []
+        with transaction(immediate=True) as cursor:
+            for message in messages:
+                if not isinstance(message, dict) or message.get('type') not in ('vote_request', 'approved_news'):
+                    results.append({"status": "invalid"})
+                    continue
+                if message['type'] == 'vote_request':
+                    news = message.get('news') or {}
+                    if not validate_news(news):
+                        results.append({"status": "invalid"})
+                        continue
+                    item = {**news, 'total_nodes': message.get('total_nodes', 1)}
+                else:
+                    if not validate_news(message):
+                        results.append({"status": "invalid"})
+                        continue
+                    item = {key: message[key] for key in ('headline', 'body', 'author')}
+                news_hash = generate_news_hash(item['headline'], item['body'], item['author'])
+                message = {**message, 'news_hash': news_hash, 'sender': message.get('sender') or data.get('sender')}
+                if not seen_messages.add(gossip_message_id(message)):
+                    results.append({"status": "duplicate", "news_hash": news_hash})
+                    continue
+                store = store_pending_items if message['type'] == 'vote_request' else store_approved_items
+                stored = store(cursor, [item])
+                results.append({"status": "stored" if stored else "known", "news_hash": news_hash})
+                fresh.append(message)
+        applied = sum(1 for result in results if result['status'] == 'stored')
+
+        forwards = [forward for forward in map(prepare_forward, fresh) if forward]
+        if forwards:
+            send_gossip_batch(forwards, "Gossip batch")
+
+        logger.info(f"Gossip batch from {data.get('sender')}: {len(fresh)} of {len(messages)} new, {applied} stored")
+        return jsonify({
+            "message": "Gossip batch received",
+            "received": len(fresh),
+            "applied": applied,
+            "results": results
+        }), 200
+    except Exception as e:
+        logger.error(f"Error processing gossip batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @bp.route('/toverify', methods=['GET'])
+@cached_response('pending')
 def get_pending_news_for_verification():
-    """Get all pending news items for manual verification."""
+    """Get pending news items for manual verification, oldest first: all of them, or one page.
+
+    With after_id or limit only one page is returned. The body stays a bare
+    list; the next-page cursor is sent in the X-Next-After-Id /
+    X-Next-After-Date headers.
+    """
     try:
-        pending = get_all_pending_news()
-        news_list = [
-            {
-                "id": item[0],
-                "title": item[1],
-                "description": item[2],
-                "author": item[3],
-                "publishedAt": item[4],
-                "approval_rate": round(item[7] * 100, 1) if item[7] else 0
-            }
-            for item in pending
-        ]
-        return jsonify(news_list), 200
+        news_list, next_after_id, next_after_date = fetch_page(
+            list_pending_news, TOVERIFY_FIELDS, list(TOVERIFY_FIELDS), default_order='id'
+        )
+        response = jsonify(news_list)
+        if next_after_id is not None:
+            response.headers['X-Next-After-Id'] = str(next_after_id)
+            response.headers['X-Next-After-Date'] = next_after_date
+        return response, 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching pending news: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @bp.route('/approved_news', methods=['GET'])
+@cached_response('approved')
 def get_approved_news():
-    """Get all approved news."""
+    """Get approved news, newest first by default: all of it, or one page.
+
+    Query parameters: after_id (+ optional after_date) cursor and limit
+    select one page (without them every article is returned), order=date|id,
+    and fields=comma,separated projection (e.g. to skip body).
+    stream=json|ndjson (or Accept: application/x-ndjson) streams every row
+    after the cursor instead of one page; limit then caps the total.
+    """
     try:
-        news = get_all_approved_news()
-        news_list = [
-            {
-                "id": item[0],
-                "headline": item[1],
-                "body": item[2],
-                "author": item[3],
-                "date": item[4]
-            }
-            for item in news
-        ]
-        return jsonify({"news": news_list}), 200
+        if wants_stream():
+            return stream_page(list_approved_news, APPROVED_FIELDS, ["id", "headline", "body", "author", "date"],
+                               'date', 'news', {"next_after_id": None, "next_after_date": None})
+        news_list, next_after_id, next_after_date = fetch_page(
+            list_approved_news, APPROVED_FIELDS, ["id", "headline", "body", "author", "date"], default_order='date'
+        )
+        return respond({
+            "news": news_list,
+            "next_after_id": next_after_id,
+            "next_after_date": next_after_date
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching approved news: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@bp.route('/approved_news', methods=['POST'])
+def receive_approved_news():
+    """Receive approved news gossiped by another node."""
+    try:
+        data = request_data()
+        if not data or not validate_news(data):
+            return jsonify({"error": "Invalid approved news"}), 400
+
+        news_hash = generate_news_hash(data['headline'], data['body'], data['author'])
+        data = {**data, 'type': 'approved_news', 'news_hash': news_hash}
+
+        # Drop duplicates before touching the database or forwarding
+        if not seen_messages.add(gossip_message_id(data)):
+            logger.info(f"Duplicate approved news {gossip_message_id(data)} dropped")
+            return jsonify({"message": "Duplicate approved news ignored"}), 200
+
+        if store_approved_news(data['headline'], data['body'], data['author']):
+            logger.info(f"Approved news received: {data['headline']}")
+
+        forward = prepare_forward(data)
+        if forward:
+            gossip_approved_news(forward)
+
+        return jsonify({"message": "Approved news received"}), 200
+    except Exception as e:
+        logger.error(f"Error processing approved news: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/events', methods=['GET'])
+def stream_events():
+    """Stream news changes as Server-Sent Events: pending_added, vote_tally, pending_removed and approved.
+
+    Resumes after the Last-Event-ID header (or last_event_id query parameter)
+    when given, otherwise starts from now. types=a,b limits the event types.
+    """
+    try:
+        last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    types = set(filter(None, request.args.get('types', '').split(','))) or None
+    try:
+        stream = event_feed.open_stream(last_id, types)
+    except Exception as e:
+        logger.error(f"Error opening event stream: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+    if stream is None:
+        return jsonify({"error": "Too many event streams, retry later"}), 503, {'Retry-After': '5'}
+    return Response(stream, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @bp.route('/search', methods=['GET'])
+@cached_response('approved')
 def search_approved_news():
-    """Search approved news by headline or body."""
+    """Search approved news by headline or body, ranked by relevance.
+
+    Supports prefix queries (e.g. "elect*") and limit/offset pagination.
+    since/until (ISO dates, until exclusive) limit the date range, which also
+    skips archived months outside it.
+    """
     try:
         search_term = request.args.get('q', '')
         if not search_term:
             return jsonify({"results": []}), 200
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, headline, body, author, date 
-            FROM news 
-            WHERE approved = 1 AND (headline LIKE ? OR body LIKE ?)
-        ''', (f'%{search_term}%', f'%{search_term}%'))
-        
-        news = cursor.fetchall()
-        conn.close()
-
+        limit = max(1, min(int(request.args.get('limit', SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE))
+        offset = max(0, int(request.args.get('offset', 0)))
+        since = request.args.get('since') or None
+        until = request.args.get('until') or None
+        news = search_news(search_term, limit, offset, since, until)
         news_list = [
             {
-                "id": item[0],
-                "headline": item[1],
-                "body": item[2],
-                "author": item[3],
-                "date": item[4]
+                **format_approved(item),
+                "headline_highlight": item[5],
+                "snippet": item[6],
+                "score": round(-item[7], 6) if item[7] is not None else None
             }
             for item in news
         ]
-        return jsonify({"results": news_list}), 200
+        return jsonify({
+            "results": news_list,
+            "next_offset": offset + limit if len(news) == limit else None
+        }), 200
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
     except Exception as e:
         logger.error(f"Error searching approved news: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @bp.route('/pending_news', methods=['GET'])
 def get_pending_news_status():
-    """Get all pending news with approval status."""
+    """Get pending news with approval status, one page at a time when after_id/limit are given.
+
+    Without them (or with stream=json|ndjson) every item is streamed.
+    """
     try:
-        pending = get_all_pending_news()
-        pending_list = [
-            {
-                "id": item[0],
-                "title": item[1],
-                "description": item[2],
-                "author": item[3],
-                "publishedAt": item[4],
-                "total_nodes": item[5],
-                "approval_votes": item[6],
-                "approval_rate": round(item[7] * 100, 1) if item[7] else 0,
-                "status": "Approved" if item[7] >= 0.6 else "Pending"
-            }
-            for item in pending
-        ]
-        return jsonify({"pending_news": pending_list}), 200
+        if wants_stream() or not ('after_id' in request.args or 'limit' in request.args):
+            return stream_page(list_pending_news, PENDING_FIELDS, list(PENDING_FIELDS), 'id', 'pending_news',
+                               {"next_after_id": None})
+        pending_list, next_after_id, _ = fetch_page(
+            list_pending_news, PENDING_FIELDS, list(PENDING_FIELDS), default_order='id'
+        )
+        return respond({"pending_news": pending_list, "next_after_id": next_after_id})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching pending news: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -288,12 +677,128 @@ def get_network_status():
         "approval_threshold": "60%"
     }), 200
 
+@bp.route('/sync_status', methods=['GET'])
+def get_sync_status():
+    """Get the progress of recent background sync jobs."""
+    try:
+        jobs = sync_worker.status()
+        return jsonify({
+            "syncing": any(job["state"] in ('queued', 'running') for job in jobs),
+            "jobs": jobs
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching sync status: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/snapshot/manifest', methods=['GET'])
+def get_snapshot_manifest():
+    """Get the manifest of this node's snapshot, building a fresh one in the background if it is stale."""
+    try:
+        manifest = snapshot_store.current()
+        if manifest is None:
+            return jsonify({"status": "building"}), 202, {'Retry-After': '2'}
+        return respond(manifest)
+    except Exception as e:
+        logger.error(f"Error reading snapshot manifest: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/snapshot', methods=['GET'])
+def get_snapshot():
+    """Stream the gzipped snapshot file named by the current manifest (supports Range requests)."""
+    try:
+        manifest = snapshot_store.manifest()
+        if manifest is None:
+            return jsonify({"error": "No snapshot available"}), 404
+        if request.args.get('sha256', manifest['sha256']) != manifest['sha256']:
+            return jsonify({"error": "Snapshot superseded, fetch the manifest again"}), 404
+        return send_file(snapshot_store.path_for(manifest), mimetype='application/gzip', download_name=manifest['file'],
+                         conditional=True, etag=manifest['sha256'])
+    except FileNotFoundError:
+        return jsonify({"error": "Snapshot superseded, fetch the manifest again"}), 404
+    except Exception as e:
+        logger.error(f"Error serving snapshot: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/peers', methods=['GET'])
+def get_peers():
+    """Get per-peer health: state, circuit breaker, failures, RTT and last contact."""
+    try:
+        peers = other_nodes.stats()
+        return jsonify({
+            "peers": peers,
+            "active": sum(1 for peer in peers if peer["circuit"] == "closed"),
+            "total": len(peers)
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching peer stats: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/gossip_stats', methods=['GET'])
+def get_gossip_stats():
+    """Get outbound gossip queue depth and delivery latency."""
+    try:
+        return jsonify({
+            **dispatcher.stats(),
+            "mode": network.GOSSIP_MODE,
+            "messages_sent": peer_client.requests_sent,
+            "seen_cache_size": len(seen_messages)
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching gossip stats: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/anti_entropy', methods=['POST'])
+def anti_entropy_exchange():
+    """Push-pull reconciliation: apply pushed articles and answer a digest with the difference."""
+    try:
+        data = request_data()
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid anti-entropy request"}), 400
+        applied = apply_items(data)
+        return respond({**build_exchange_response(data), "applied": applied})
+    except Exception as e:
+        logger.error(f"Error processing anti-entropy exchange: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/merkle', methods=['GET'])
+def get_merkle_summary():
+    """Get the root digest of this node's approved-news Merkle tree."""
+    try:
+        return respond(get_merkle_root())
+    except Exception as e:
+        logger.error(f"Error computing Merkle root: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/merkle/children', methods=['GET'])
+def get_merkle_node():
+    """Get the child digests (or, at a leaf, the article hashes) under a Merkle prefix."""
+    try:
+        return respond(get_merkle_children(request.args.get('prefix', '')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error reading Merkle node: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/approved_news/by_hash', methods=['POST'])
+def get_approved_news_by_hash():
+    """Get approved articles for a list of hashes."""
+    try:
+        data = request_data()
+        hashes = data.get('hashes') if isinstance(data, dict) else None
+        if not isinstance(hashes, list):
+            return jsonify({"error": "hashes list required"}), 400
+        return respond({"news": get_approved_news_by_hashes(hashes[:MAX_PAGE_SIZE])})
+    except Exception as e:
+        logger.error(f"Error fetching approved news by hash: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 # routes.py (partial update, replace only the register_new_node function)
 @bp.route('/register', methods=['POST'])
 def register_new_node():
     """Register a new node to the network."""
     try:
-        data = request.get_json(silent=True)
+        data = request_data()
         logger.info(f"Received registration request with data: {data}")
         if not data:
             logger.warning("No JSON data provided in registration request")
@@ -305,14 +810,15 @@ def register_new_node():
             return jsonify({"message": "Missing node_url in request"}), 400
 
         if node_url in other_nodes:
+            other_nodes.revive(node_url)
             logger.info(f"Node {node_url} already registered")
             return jsonify({"message": "Node already registered", "all_nodes": list(other_nodes)}), 200
 
         other_nodes.add(node_url)
-        sync_approved_news_with_peer(node_url)
-        sync_pending_news_with_peer(node_url)
-        logger.info(f"Node {node_url} registered successfully. Current nodes: {other_nodes}")
-        return jsonify({"message": "Node registered successfully", "all_nodes": list(other_nodes)}), 200
+        # Pull the newcomer's news in the background so registration returns at once
+        job_id = sync_worker.schedule_peer_sync(node_url)
+        logger.info(f"Node {node_url} registered successfully, sync job {job_id} queued. Current nodes: {other_nodes}")
+        return jsonify({"message": "Node registered successfully", "all_nodes": list(other_nodes), "sync_job": job_id}), 200
 
     except Exception as e:
         logger.error(f"Error registering node: {str(e)}")
@@ -0,0 +1,134 @@
+import logging
+import re
+import sqlite3
+from config import SEARCH_HEADLINE_WEIGHT
+from db import transaction
+import archive
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Set by init_search_index; False when SQLite was built without FTS5
+fts_enabled = False
+
+TOKEN_PATTERN = re.compile(r'[\w]+\*?', re.UNICODE)
+
+# Also used for the index inside each archive partition
+FTS_TABLE_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+        headline, body,
+        content='news', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+'''
+
+def init_search_index(cursor):
+    """Create the FTS5 index over news and the triggers that keep it in sync."""
+    global fts_enabled
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_fts'")
+    exists = cursor.fetchone() is not None
+    try:
+        cursor.execute(FTS_TABLE_SQL)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 unavailable, /search falls back to LIKE scans: {str(e)}")
+        fts_enabled = False
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_fts_insert AFTER INSERT ON news BEGIN
+            INSERT INTO news_fts (rowid, headline, body) VALUES (NEW.id, NEW.headline, NEW.body);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_fts_delete AFTER DELETE ON news BEGIN
+            INSERT INTO news_fts (news_fts, rowid, headline, body) VALUES ('delete', OLD.id, OLD.headline, OLD.body);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_fts_update AFTER UPDATE OF headline, body ON news BEGIN
+            INSERT INTO news_fts (news_fts, rowid, headline, body) VALUES ('delete', OLD.id, OLD.headline, OLD.body);
+            INSERT INTO news_fts (rowid, headline, body) VALUES (NEW.id, NEW.headline, NEW.body);
+        END
+    ''')
+    if not exists:
+        cursor.execute("INSERT INTO news_fts (news_fts) VALUES ('rebuild')")
+        logger.info("Built full-text search index")
+    fts_enabled = True
+
+def build_match_query(search_term):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every word must match; a trailing * makes a word a prefix query. Words are
+    quoted so FTS5 operators and punctuation in user input are taken literally.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(search_term):
+        word = token.rstrip('*')
+        terms.append(f'"{word}"*' if token.endswith('*') else f'"{word}"')
+    return ' '.join(terms)
+
+def search_news(search_term, limit, offset=0, since=None, until=None):
+    """Search approved news, best matches first.
+
+    since/until (ISO dates, until exclusive) restrict the results to a date
+    range. The archive partitions overlapping the range are searched as well,
+    so a range also keeps an open-ended search off the cold months it does not
+    need. Scores from different partitions come from separate indexes and are
+    only roughly comparable.
+
+    Returns rows of (id, headline, body, author, date, headline_highlight, snippet, score).
+    """
+    dates, date_params = '', []
+    if since:
+        dates += ' AND n.date >= ?'
+        date_params.append(since)
+    if until:
+        dates += ' AND n.date < ?'
+        date_params.append(until)
+    if not fts_enabled:
+        sql = f'''
+            SELECT n.id, n.headline, n.body, n.author, n.date
+            FROM news n
+            WHERE n.approved = 1 AND (n.headline LIKE ? OR n.body LIKE ?){dates}
+            ORDER BY n.id DESC LIMIT ? OFFSET ?
+        '''
+        params = (f'%{search_term}%', f'%{search_term}%', *date_params)
+        rank = lambda row: -row[0]
+    else:
+        match = build_match_query(search_term)
+        if not match:
+            return []
+        sql = f'''
+            SELECT n.id, n.headline, n.body, n.author, n.date,
+                   highlight(news_fts, 0, '<mark>', '</mark>'),
+                   snippet(news_fts, 1, '<mark>', '</mark>', '…', 24),
+                   bm25(news_fts, {float(SEARCH_HEADLINE_WEIGHT)}, 1.0) AS score
+            FROM news_fts
+            JOIN news n ON n.id = news_fts.rowid
+            WHERE news_fts MATCH ? AND n.approved = 1{dates}
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        '''
+        params = (match, *date_params)
+        rank = lambda row: row[7]
+    try:
+        with transaction() as cursor:
+            partitions = [
+                partition for partition in archive.list_partitions(cursor)
+                if (not since or partition.max_date >= since) and (not until or partition.min_date < until)
+            ]
+            if not partitions:
+                rows = cursor.execute(sql, (*params, limit, offset)).fetchall()
+            else:
+                merged = {row[0]: row for row in cursor.execute(sql, (*params, limit + offset, 0))}
+        if partitions:
+            for partition in partitions:
+                for row in archive.partition_reader.query(partition.name, sql, (*params, limit + offset, 0)):
+                    merged.setdefault(row[0], row)
+            rows = sorted(merged.values(), key=rank)[offset:offset + limit]
+        if not fts_enabled:
+            return [(*row, row[1], row[2][:200], None) for row in rows]
+        return rows
+    except Exception as e:
+        logger.error(f"Error searching approved news: {str(e)}")
+        return []
@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+import time
+from config import LEADER_LOCK_PATH, LEADER_RETRY_INTERVAL
+from dispatcher import dispatcher
+from anti_entropy import start_anti_entropy
+from health import start_health_checker
+from sync_worker import start_catchup
+from events import start_event_pruner
+from archive import start_archiver
+from maintenance import start_maintenance
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): every process leads
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LeaderLock:
+    """Exclusive lock file electing the one process that runs node-wide background work.
+
+    The OS drops the lock when its holder exits, so another worker can take over.
+    """
+
+    def __init__(self, path=LEADER_LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self):
+        """Take the lock without blocking. Returns True if this process holds it."""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+leader_lock = LeaderLock()
+
+# Background services that must run once per node rather than once per worker
+LEADER_SERVICES = [start_catchup, start_anti_entropy, start_health_checker, start_event_pruner, start_archiver,
+                   start_maintenance]
+
+def _elect_and_start():
+    while not leader_lock.try_acquire():
+        time.sleep(LEADER_RETRY_INTERVAL)
+    logger.info(f"Process {os.getpid()} is the leader; starting node-wide background services")
+    for start_service in LEADER_SERVICES:
+        start_service()
+
+def start_background_services():
+    """Start this process's gossip dispatcher and, once it holds the leader lock, the node-wide services."""
+    dispatcher.start()
+    threading.Thread(target=_elect_and_start, name="leader-election", daemon=True).start()
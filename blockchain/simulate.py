@@ -0,0 +1,170 @@
+"""Gossip convergence harness.
+
+Starts a cluster of node processes from app.py on localhost, wires them into
+a mesh, injects one vote request and one approved article, and reports how
+long each takes to reach every node and how many peer requests that cost.
+
+    python simulate.py --nodes 10 25 50 --modes broadcast epidemic --fanout 3
+
+Each node runs in its own process and working directory because node state
+(peer set, node URL, news.db) is module-level.
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+def start_cluster(size, mode, fanout, base_port, anti_entropy_interval, workdir):
+    """Launch size node processes and return their (urls, processes)."""
+    urls, processes = [], []
+    for i in range(size):
+        port = base_port + i
+        url = f'http://localhost:{port}'
+        node_dir = os.path.join(workdir, f'node{i}')
+        os.makedirs(node_dir)
+        env = {
+            **os.environ,
+            'NODE_PORT': str(port),
+            'NODE_URL': url,
+            'BOOTSTRAP_URL': url,  # every node starts as its own bootstrap; the harness wires the mesh
+            'NODE_DEBUG': '0',
+            'WEB_WORKERS': '1',  # one gunicorn worker per node; the cluster already runs many nodes per host
+            'GOSSIP_MODE': mode,
+            'GOSSIP_FANOUT': str(fanout),
+            'ANTI_ENTROPY_INTERVAL': str(anti_entropy_interval)
+        }
+        log = open(os.path.join(node_dir, 'node.log'), 'w')
+        processes.append(subprocess.Popen([sys.executable, APP_PATH], cwd=node_dir, env=env, stdout=log, stderr=subprocess.STDOUT))
+        urls.append(url)
+    return urls, processes
+
+def wait_until_up(urls, timeout=60):
+    deadline = time.monotonic() + timeout
+    pending = set(urls)
+    while pending and time.monotonic() < deadline:
+        for url in list(pending):
+            try:
+                requests.get(f'{url}/network_status', timeout=1).raise_for_status()
+                pending.discard(url)
+            except requests.exceptions.RequestException:
+                pass
+        time.sleep(0.2)
+    if pending:
+        raise RuntimeError(f"{len(pending)} nodes did not start within {timeout}s")
+
+def wire_mesh(urls, view_size, pool):
+    """Register peers with every node: all of them, or view_size random ones."""
+    def register_peers(url):
+        others = [other for other in urls if other != url]
+        peers = others if not view_size else random.sample(others, min(view_size, len(others)))
+        for peer in peers:
+            requests.post(f'{url}/register', json={'node_url': peer}, timeout=30)
+    list(pool.map(register_peers, urls))
+
+def total_messages(urls, pool):
+    def sent(url):
+        return requests.get(f'{url}/gossip_stats', timeout=5).json().get('messages_sent', 0)
+    return sum(pool.map(sent, urls))
+
+def wait_for_convergence(urls, has_item, pool, timeout):
+    """Poll every node until has_item(url) is true everywhere. Returns seconds taken, or None."""
+    start = time.monotonic()
+    remaining = list(urls)
+    while remaining and time.monotonic() - start < timeout:
+        reached = list(pool.map(has_item, remaining))
+        remaining = [url for url, ok in zip(remaining, reached) if not ok]
+        if remaining:
+            time.sleep(0.1)
+    return None if remaining else time.monotonic() - start
+
+def wait_for_quiet(urls, pool, timeout=30):
+    """Wait until every node's outbound queue has drained."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        depths = pool.map(lambda url: requests.get(f'{url}/gossip_stats', timeout=5).json().get('queue_depth', 0), urls)
+        if sum(depths) == 0:
+            return
+        time.sleep(0.2)
+
+def measure(urls, pool, timeout):
+    """Inject one vote request and one approved article at the first node and time their spread."""
+    results = {}
+    token = uuid.uuid4().hex[:8]
+
+    before = total_messages(urls, pool)
+    news = {'headline': f'sim pending {token}', 'body': 'simulated body', 'author': 'simulate.py'}
+    requests.post(f'{urls[0]}/news', json=news, timeout=10).raise_for_status()
+
+    def has_pending(url):
+        items = requests.get(f'{url}/toverify', timeout=5).json()
+        return any(item['title'] == news['headline'] for item in items)
+
+    results['vote_request_s'] = wait_for_convergence(urls, has_pending, pool, timeout)
+    wait_for_quiet(urls, pool)
+    results['vote_request_msgs'] = total_messages(urls, pool) - before
+
+    before = total_messages(urls, pool)
+    article = {'headline': f'sim approved {token}', 'body': 'simulated body', 'author': 'simulate.py', 'approved': True}
+    requests.post(f'{urls[0]}/approved_news', json=article, timeout=10).raise_for_status()
+
+    def has_approved(url):
+        items = requests.get(f'{url}/approved_news', timeout=5).json().get('news', [])
+        return any(item['headline'] == article['headline'] for item in items)
+
+    results['approved_s'] = wait_for_convergence(urls, has_approved, pool, timeout)
+    wait_for_quiet(urls, pool)
+    results['approved_msgs'] = total_messages(urls, pool) - before
+    return results
+
+def run(size, mode, base_port, args):
+    workdir = tempfile.mkdtemp(prefix='newsblock-sim-')
+    urls, processes = start_cluster(size, mode, args.fanout, base_port, args.anti_entropy_interval, workdir)
+    try:
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            wait_until_up(urls)
+            wire_mesh(urls, args.view_size, pool)
+            return measure(urls, pool, args.timeout)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def format_seconds(value):
+    return 'timeout' if value is None else f'{value:.2f}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, nargs='+', default=[5, 10, 20], help='cluster sizes to simulate')
+    parser.add_argument('--modes', nargs='+', default=['broadcast', 'epidemic'], choices=['broadcast', 'epidemic'])
+    parser.add_argument('--fanout', type=int, default=3, help='peers per hop in epidemic mode')
+    parser.add_argument('--view-size', type=int, default=0, help='peers each node knows (0 = full mesh)')
+    parser.add_argument('--anti-entropy-interval', type=float, default=2.0, help='seconds between push-pull rounds (0 disables)')
+    parser.add_argument('--base-port', type=int, default=7000)
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for convergence')
+    parser.add_argument('--keep', action='store_true', help='keep node directories and logs')
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6} {'mode':>10} {'vote_req s':>11} {'vote_req msgs':>14} {'approved s':>11} {'approved msgs':>14}")
+    base_port = args.base_port
+    for size in args.nodes:
+        for mode in args.modes:
+            # Fresh ports per run: sockets of the previous cluster may still be in TIME_WAIT
+            result = run(size, mode, base_port, args)
+            base_port += size
+            print(f"{size:>6} {mode:>10} {format_seconds(result['vote_request_s']):>11} {result['vote_request_msgs']:>14} "
+                  f"{format_seconds(result['approved_s']):>11} {result['approved_msgs']:>14}", flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""Snapshot export and import for fast node bootstrap.
+
+A snapshot is a consistent copy of the approved news made with the SQLite
+backup API, with archived articles folded back in, stripped of node-local
+tables and gzipped, together with a manifest:
+
+    {"file", "sha256", "bytes", "count", "last_id", "root", "created_at"}
+
+A new node downloads it from a peer, checks the file's sha256, every
+article's content hash and the Merkle root, merges it with one set-based
+INSERT ... SELECT, and then syncs only the tail after the manifest's last_id.
+
+    python snapshot.py export
+    python snapshot.py import http://localhost:5000
+    python snapshot.py import news-1700000000000.db.gz --manifest manifest.json
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from config import (
+    SNAPSHOT_DIR, SNAPSHOT_MAX_AGE, SNAPSHOT_COMPRESS_LEVEL, SNAPSHOT_CHUNK_BYTES,
+    SNAPSHOT_BUILD_WAIT, SNAPSHOT_READ_TIMEOUT, GOSSIP_CONNECT_TIMEOUT
+)
+from db import connection, transaction, register_function
+from merkle import get_merkle_root, init_merkle, rebuild_merkle
+from news import generate_news_hash, set_sync_cursor
+from events import init_events
+from archive import copy_archive_into
+import search
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): concurrent builds are not serialized
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+BUILD_LOCK_NAME = 'build.lock'
+
+# Per-row triggers dropped during a bulk import into an empty table: the Merkle and FTS indexes are
+# rebuilt once afterwards, and a freshly bootstrapped node has no clients waiting for per-article events
+BULK_IMPORT_TRIGGERS = ('merkle_news_insert', 'news_fts_insert', 'events_news_insert')
+
+register_function('news_hash_fn', 3, generate_news_hash)
+
+class _HashingWriter:
+    """File wrapper that hashes and counts the bytes written through it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+def _strip_local_state(conn):
+    """Reduce a backup copy to the approved news table, with archived articles folded back in, and compact it."""
+    conn.isolation_level = None
+    for name, kind in conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('trigger', 'view')").fetchall():
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    copy_archive_into(conn)
+    # Virtual tables first: dropping one removes its shadow tables
+    tables = conn.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name != 'news' AND name NOT LIKE 'sqlite_%'
+        ORDER BY sql LIKE 'CREATE VIRTUAL%' DESC
+    ''').fetchall()
+    for (name,) in tables:
+        conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+    conn.execute('DELETE FROM news WHERE approved = 0')
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.execute('VACUUM')
+
+class SnapshotStore:
+    """The snapshot this node serves to peers, kept in SNAPSHOT_DIR.
+
+    A stale snapshot is still served while a fresh one is built in the
+    background; fetching nodes sync the tail after it anyway.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._building = False
+
+    def manifest(self):
+        """The current manifest, or None if no snapshot has been built."""
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def path_for(self, manifest):
+        """Absolute path of a manifest's file (Flask resolves relative paths against the app root)."""
+        return os.path.abspath(os.path.join(self.directory, manifest['file']))
+
+    def build(self, newer_than=None):
+        """Write a new snapshot and make it current. Returns its manifest.
+
+        Builds are serialized across worker processes by a lock file. With
+        newer_than, a snapshot created since then (e.g. by another worker
+        while we waited for the lock) is returned instead of building again.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, BUILD_LOCK_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            manifest = self.manifest()
+            if newer_than is not None and manifest is not None and manifest['created_at'] >= newer_than:
+                return manifest
+            return self._build()
+
+    def _build(self):
+        start = time.monotonic()
+        created_at = time.time()
+        fd, db_file = tempfile.mkstemp(dir=self.directory, suffix='.db')
+        os.close(fd)
+        name = f"news-{int(created_at * 1000)}.db.gz"
+        try:
+            target = sqlite3.connect(db_file)
+            try:
+                # One backup step holds a single read transaction, so the copy is consistent
+                with connection() as conn:
+                    conn.backup(target)
+                merkle = get_merkle_root(target)
+                _strip_local_state(target)
+                count, last_id = target.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM news').fetchone()
+            finally:
+                target.close()
+            with open(db_file, 'rb') as src, open(os.path.join(self.directory, name), 'wb') as out:
+                writer = _HashingWriter(out)
+                with gzip.GzipFile(filename='', mode='wb', fileobj=writer, compresslevel=SNAPSHOT_COMPRESS_LEVEL) as gz:
+                    shutil.copyfileobj(src, gz, SNAPSHOT_CHUNK_BYTES)
+        finally:
+            os.remove(db_file)
+        manifest = {
+            "file": name,
+            "sha256": writer.sha256.hexdigest(),
+            "bytes": writer.bytes,
+            "count": count,
+            "last_id": last_id,
+            "root": merkle['root'],
+            "created_at": created_at
+        }
+        manifest_tmp = os.path.join(self.directory, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        with open(manifest_tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_tmp, os.path.join(self.directory, MANIFEST_NAME))
+        # Downloads already streaming an older file keep their open handle
+        for old in os.listdir(self.directory):
+            if old.startswith('news-') and old.endswith('.db.gz') and old != name:
+                os.remove(os.path.join(self.directory, old))
+        logger.info(f"Built snapshot {name}: {count} articles, {writer.bytes} bytes in {time.monotonic() - start:.2f}s")
+        return manifest
+
+    def _build_in_background(self, newer_than):
+        try:
+            self.build(newer_than)
+        except Exception as e:
+            logger.error(f"Error building snapshot: {str(e)}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def current(self, max_age=SNAPSHOT_MAX_AGE):
+        """The manifest to serve, starting a background build if it is missing or stale.
+
+        Returns None while the first snapshot is still being built.
+        """
+        manifest = self.manifest()
+        if manifest is None or time.time() - manifest['created_at'] > max_age:
+            with self._lock:
+                if not self._building:
+                    self._building = True
+                    threading.Thread(target=self._build_in_background, args=(time.time() - max_age,),
+                                     name="snapshot-build", daemon=True).start()
+        return manifest
+
+snapshot_store = SnapshotStore()
+
+def fetch_snapshot_manifest(peer, wait=SNAPSHOT_BUILD_WAIT):
+    """Get a peer's snapshot manifest, waiting up to wait seconds while it builds its first one."""
+    from peer_client import peer_client
+    from wire import decode_response
+    deadline = time.monotonic() + wait
+    while True:
+        response = peer_client.get(f"{peer}/snapshot/manifest", timeout=(GOSSIP_CONNECT_TIMEOUT, 10))
+        response.raise_for_status()
+        if response.status_code != 202:
+            return decode_response(response)
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{peer} did not finish building a snapshot within {wait}s")
+        time.sleep(min(5, max(1, int(response.headers.get('Retry-After', 2)))))
+
+def download_snapshot(peer, directory=SNAPSHOT_DIR, attempts=2):
+    """Fetch a peer's snapshot into directory and check its sha256. Returns (path, manifest).
+
+    If the peer replaces its snapshot between the manifest and the download,
+    the download is retried with the new manifest.
+    """
+    from peer_client import peer_client
+    os.makedirs(directory, exist_ok=True)
+    for attempt in range(attempts):
+        manifest = fetch_snapshot_manifest(peer)
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.download.gz')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as out, peer_client.get(
+                f"{peer}/snapshot", params={'sha256': manifest['sha256']}, stream=True,
+                timeout=(GOSSIP_CONNECT_TIMEOUT, SNAPSHOT_READ_TIMEOUT)
+            ) as response:
+                if response.status_code == 404 and attempt < attempts - 1:
+                    raise FileNotFoundError(f"Snapshot {manifest['file']} on {peer} was superseded")
+                response.raise_for_status()
+                for chunk in response.iter_content(SNAPSHOT_CHUNK_BYTES):
+                    digest.update(chunk)
+                    out.write(chunk)
+            if digest.hexdigest() != manifest['sha256']:
+                raise ValueError(f"Snapshot from {peer} does not match its manifest sha256")
+        except FileNotFoundError as e:
+            os.remove(path)
+            logger.info(f"{str(e)}, fetching the new manifest")
+            continue
+        except BaseException:
+            os.remove(path)
+            raise
+        logger.info(f"Downloaded snapshot {manifest['file']} ({manifest['bytes']} bytes) from {peer}")
+        return path, manifest
+
+def verify_snapshot_db(db_file, manifest):
+    """Check an inflated snapshot's integrity, article hashes, count, last id and Merkle root."""
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        conn.create_function('news_hash_fn', 3, generate_news_hash, deterministic=True)
+        if conn.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+            raise ValueError("Snapshot database failed its integrity check")
+        bad = conn.execute('''
+            SELECT COUNT(*) FROM news WHERE news_hash IS NULL OR news_hash != news_hash_fn(headline, body, author)
+        ''').fetchone()[0]
+        if bad:
+            raise ValueError(f"{bad} snapshot articles do not match their content hash")
+        count, last_id = conn.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM news').fetchone()
+        if (count, last_id) != (manifest['count'], manifest['last_id']):
+            raise ValueError(f"Snapshot has {count} articles up to id {last_id}, manifest says "
+                             f"{manifest['count']} up to {manifest['last_id']}")
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        init_merkle(cursor)
+        root = get_merkle_root(conn)['root']
+        conn.rollback()
+        if root != manifest['root']:
+            raise ValueError("Snapshot Merkle root does not match its manifest")
+    finally:
+        conn.close()
+
+def import_snapshot(path, manifest, peer=None):
+    """Verify a downloaded snapshot and merge its articles into the local database.
+
+    With peer, the peer's approved sync cursor is moved to the snapshot's
+    last_id so the next incremental sync only pulls the tail. Returns the
+    number of new articles.
+    """
+    start = time.monotonic()
+    fd, db_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.db')
+    try:
+        with gzip.open(path, 'rb') as src, os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(src, out, SNAPSHOT_CHUNK_BYTES)
+        verify_snapshot_db(db_file, manifest)
+
+        with connection() as conn:
+            conn.execute('ATTACH DATABASE ? AS snapshot', (db_file,))
+            try:
+                with transaction(immediate=True) as cursor:
+                    cursor.execute('SELECT NOT EXISTS (SELECT 1 FROM news)')
+                    bulk = cursor.fetchone()[0]
+                    if bulk:
+                        for trigger in BULK_IMPORT_TRIGGERS:
+                            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+                    cursor.execute('''
+                        INSERT INTO news (headline, body, author, date, approved, news_hash)
+                        SELECT headline, body, author, date, 1, news_hash FROM snapshot.news
+                        WHERE approved = 1
+                        ORDER BY id
+                        ON CONFLICT(news_hash) DO NOTHING
+                    ''')
+                    inserted = cursor.rowcount
+                    cursor.execute('''
+                        DELETE FROM node_votes WHERE pending_id IN (
+                            SELECT id FROM pending_news WHERE news_hash IN (SELECT news_hash FROM snapshot.news)
+                        )
+                    ''')
+                    cursor.execute('DELETE FROM pending_news WHERE news_hash IN (SELECT news_hash FROM snapshot.news)')
+                    if bulk:
+                        rebuild_merkle(cursor)
+                        init_merkle(cursor)
+                        search.init_search_index(cursor)
+                        init_events(cursor)
+                        if search.fts_enabled:
+                            cursor.execute("INSERT INTO news_fts (news_fts) VALUES ('rebuild')")
+                    if peer:
+                        set_sync_cursor(peer, 'approved', manifest['last_id'])
+            finally:
+                conn.execute('DETACH DATABASE snapshot')
+    finally:
+        os.remove(db_file)
+    logger.info(f"Imported {inserted} of {manifest['count']} snapshot articles in {time.monotonic() - start:.2f}s")
+    return inserted
+
+def bootstrap_from_snapshot(peer):
+    """Download, verify and import a peer's snapshot, then sync the tail. Returns articles added."""
+    from network import sync_approved_news_with_peer
+    path, manifest = download_snapshot(peer)
+    try:
+        inserted = import_snapshot(path, manifest, peer)
+    finally:
+        os.remove(path)
+    return inserted + sync_approved_news_with_peer(peer)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('export', help='build a snapshot of this node in SNAPSHOT_DIR and print its manifest')
+    import_parser = commands.add_parser('import', help='import a snapshot from a peer URL or a local file')
+    import_parser.add_argument('source', help='peer URL, or path to a .db.gz snapshot file')
+    import_parser.add_argument('--manifest', help="manifest for a local file (default: manifest.json next to it)")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(json.dumps(snapshot_store.build(), indent=2))
+    elif args.source.startswith(('http://', 'https://')):
+        print(f"Added {bootstrap_from_snapshot(args.source.rstrip('/'))} articles from {args.source}")
+    else:
+        manifest_path = args.manifest or os.path.join(os.path.dirname(os.path.abspath(args.source)), MANIFEST_NAME)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        with open(args.source, 'rb') as f:
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: f.read(SNAPSHOT_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        if digest.hexdigest() != manifest['sha256']:
+            parser.error(f"{args.source} does not match the manifest sha256")
+        print(f"Added {import_snapshot(args.source, manifest)} articles from {args.source}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import SYNC_MAX_WORKERS, SYNC_STATUS_JOBS, SYNC_SUBTREE_PASSES, SNAPSHOT_MIN_ITEMS
+from db import connection, transaction
+from merkle import HEX_DIGITS, get_merkle_root
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SyncWorker:
+    """Runs catch-up syncs in the background and records their progress in SQLite.
+
+    Two kinds of job exist. A 'peer' job pulls one peer's approved and pending
+    streams, for a node that has just registered with us. A 'catchup' job
+    brings this node up to date from several peers at once. It splits the
+    approved-news Merkle tree into its 16 top-level subtrees and pulls those
+    from different peers in parallel, moving a subtree to another peer if one
+    fails. A node missing at least SNAPSHOT_MIN_ITEMS articles first imports a
+    peer's snapshot, leaving only the difference to pull. Progress is kept in
+    the sync_jobs table, so any worker process can report it.
+    """
+
+    def __init__(self, max_workers=SYNC_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sync')
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def init_jobs(self):
+        """Create the sync_jobs table if needed."""
+        with self._lock:
+            if self._ready:
+                return
+            with transaction() as cursor:
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS sync_jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        kind TEXT NOT NULL,
+                        peers TEXT NOT NULL,
+                        state TEXT NOT NULL,
+                        items INTEGER NOT NULL DEFAULT 0,
+                        parts_done INTEGER NOT NULL DEFAULT 0,
+                        parts_total INTEGER NOT NULL DEFAULT 0,
+                        error TEXT,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                ''')
+            self._ready = True
+
+    def _create_job(self, kind, peers, parts_total):
+        self.init_jobs()
+        now = time.time()
+        with transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO sync_jobs (kind, peers, state, parts_total, created_at, updated_at)
+                VALUES (?, ?, 'queued', ?, ?, ?)
+            ''', (kind, ','.join(peers), parts_total, now, now))
+            return cursor.lastrowid
+
+    def _update_job(self, job_id, state=None, items=0, parts=0, error=None):
+        with transaction() as cursor:
+            cursor.execute('''
+                UPDATE sync_jobs SET state = COALESCE(?, state), items = items + ?, parts_done = parts_done + ?,
+                    error = COALESCE(?, error), updated_at = ?
+                WHERE id = ?
+            ''', (state, items, parts, error, time.time(), job_id))
+
+    def schedule_peer_sync(self, peer):
+        """Queue a pull of one peer's approved and pending news. Returns the job ID."""
+        job_id = self._create_job('peer', [peer], 2)
+        self._executor.submit(self._run_peer_sync, job_id, peer)
+        return job_id
+
+    def schedule_catchup(self, peers):
+        """Queue a parallel catch-up from several peers. Returns the job ID, or None without peers."""
+        peers = list(peers)
+        if not peers:
+            return None
+        job_id = self._create_job('catchup', peers, len(HEX_DIGITS) + 1)
+        self._executor.submit(self._run_catchup, job_id, peers)
+        return job_id
+
+    def _run_peer_sync(self, job_id, peer):
+        from network import sync_approved_news_with_peer, sync_pending_news_with_peer
+        try:
+            self._update_job(job_id, state='running')
+            self._update_job(job_id, items=sync_approved_news_with_peer(peer), parts=1)
+            self._update_job(job_id, items=sync_pending_news_with_peer(peer), parts=1)
+            self._update_job(job_id, state='done')
+            logger.info(f"Sync job {job_id} with {peer} finished")
+        except Exception as e:
+            logger.error(f"Sync job {job_id} with {peer} failed: {str(e)}")
+            self._update_job(job_id, state='failed', error=str(e))
+
+    def _pull_subtree(self, job_id, prefix, peers):
+        """Pull one top-level Merkle subtree, trying each peer in turn.
+
+        The subtree is diffed again after each pull, so items whose insert did
+        not land are fetched again (up to SYNC_SUBTREE_PASSES times).
+        """
+        from anti_entropy import diff_merkle_with_peer, pull_approved_by_hash
+        last_error = None
+        for peer in peers:
+            try:
+                pulled = 0
+                for _ in range(SYNC_SUBTREE_PASSES):
+                    missing_here, _ = diff_merkle_with_peer(peer, [prefix])
+                    if not missing_here:
+                        break
+                    pulled += pull_approved_by_hash(peer, missing_here)
+                else:
+                    missing_here, _ = diff_merkle_with_peer(peer, [prefix])
+                    if missing_here:
+                        raise RuntimeError(f"{len(missing_here)} items still missing")
+                self._update_job(job_id, items=pulled, parts=1)
+                return pulled
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Sync job {job_id}: subtree {prefix} from {peer} failed: {str(e)}")
+        raise RuntimeError(f"subtree {prefix} failed on every peer: {last_error}")
+
+    def _bootstrap_from_snapshot(self, job_id, peers):
+        """Start a catch-up from a peer's snapshot when far behind. Returns True if one was imported."""
+        from anti_entropy import peer_request
+        from snapshot import bootstrap_from_snapshot
+        local_count = get_merkle_root()['count']
+        for peer in peers:
+            try:
+                if peer_request('GET', peer, '/merkle')['count'] - local_count < SNAPSHOT_MIN_ITEMS:
+                    return False
+                self._update_job(job_id, items=bootstrap_from_snapshot(peer))
+                return True
+            except Exception as e:
+                logger.warning(f"Sync job {job_id}: snapshot from {peer} failed: {str(e)}")
+        return False
+
+    def _run_catchup(self, job_id, peers):
+        from network import sync_pending_news_with_peer
+        self._update_job(job_id, state='running')
+        start = time.monotonic()
+        failures = []
+        # A snapshot brings a far-behind node close; the subtree pulls below then only fetch the difference
+        if SNAPSHOT_MIN_ITEMS > 0:
+            self._bootstrap_from_snapshot(job_id, peers)
+        with ThreadPoolExecutor(max_workers=min(len(peers) * 2, len(HEX_DIGITS)), thread_name_prefix='catchup') as pool:
+            # Subtree i starts on peer i mod n, then falls back to the others in order
+            futures = [
+                pool.submit(self._pull_subtree, job_id, prefix, peers[i % len(peers):] + peers[:i % len(peers)])
+                for i, prefix in enumerate(HEX_DIGITS)
+            ]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append(str(e))
+        for peer in peers:
+            try:
+                self._update_job(job_id, items=sync_pending_news_with_peer(peer), parts=1)
+                break
+            except Exception as e:
+                failures.append(f"pending from {peer}: {str(e)}")
+        state = 'failed' if failures else 'done'
+        self._update_job(job_id, state=state, error='; '.join(failures) or None)
+        logger.info(f"Catch-up job {job_id} from {len(peers)} peers {state} in {time.monotonic() - start:.2f}s")
+
+    def status(self, limit=SYNC_STATUS_JOBS):
+        """The most recent jobs with their progress."""
+        self.init_jobs()
+        with connection() as conn:
+            rows = conn.execute('''
+                SELECT id, kind, peers, state, items, parts_done, parts_total, error, created_at, updated_at
+                FROM sync_jobs ORDER BY id DESC LIMIT ?
+            ''', (limit,)).fetchall()
+        return [
+            {
+                "id": job_id,
+                "kind": kind,
+                "peers": peers.split(',') if peers else [],
+                "state": state,
+                "items": items,
+                "progress": round(parts_done / parts_total, 3) if parts_total else None,
+                "error": error,
+                "started_at": created_at,
+                "updated_at": updated_at
+            }
+            for job_id, kind, peers, state, items, parts_done, parts_total, error, created_at, updated_at in rows
+        ]
+
+sync_worker = SyncWorker()
+
+def start_catchup():
+    """Catch up from the live peers once this node starts serving."""
+    from network import other_nodes
+    job_id = sync_worker.schedule_catchup(other_nodes.active())
+    if job_id:
+        logger.info(f"Started catch-up sync job {job_id}")
+    return job_id
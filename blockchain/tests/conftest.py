@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Modules import each other by bare name and keep node state (news.db and the
+# directories next to it) in the working directory, so the suite runs in a
+# scratch directory with the blockchain package on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix='news-block-tests-'))
+
+import network
+import news  # creates the node tables
+from db import transaction
+
+NODE_URL = 'http://localhost:5999'
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """Every test starts from empty news, pending and outbox tables."""
+    network.this_node_url = NODE_URL
+    with transaction(immediate=True) as cursor:
+        for table in ('node_votes', 'pending_news', 'pending_tombstones', 'news', 'sync_cursors'):
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'outbox'")
+        if cursor.fetchone():
+            cursor.execute('DELETE FROM outbox')
+    yield
+
+@pytest.fixture
+def client():
+    """Test client for a node app without its background services."""
+    from app import create_app
+    return create_app(start_services=False).test_client()
+
+def make_items(count, prefix='item', dates=None):
+    """count valid news dicts, optionally with the given dates."""
+    items = [{'headline': f'{prefix} {i}', 'body': f'body of {prefix} {i}', 'author': 'tester'} for i in range(count)]
+    for item, date in zip(items, dates or ()):
+        item['date'] = date
+    return items
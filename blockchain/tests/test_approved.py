@@ -0,0 +1,29 @@
+from conftest import make_items
+from db import transaction
+from news import store_approved_news, submit_news_batch, get_pending_news_by_id, is_news_hash_approved, generate_news_hash
+
+def test_store_approved_news_promotes_pending():
+    result, = submit_news_batch(make_items(1), 3)
+    assert store_approved_news('item 0', 'body of item 0', 'tester')
+    assert get_pending_news_by_id(result['pending_id']) is None
+    assert is_news_hash_approved(result['news_hash'])
+    assert not store_approved_news('item 0', 'body of item 0', 'tester')
+
+def test_store_approved_news_inserts_new_article():
+    assert store_approved_news('fresh', 'body', 'tester')
+    assert is_news_hash_approved(generate_news_hash('fresh', 'body', 'tester'))
+
+def test_store_approved_news_rolls_back_on_failure():
+    result, = submit_news_batch(make_items(1), 3)
+    with transaction() as cursor:
+        cursor.execute('''
+            CREATE TEMP TRIGGER fail_pending_delete BEFORE DELETE ON main.pending_news
+            BEGIN SELECT RAISE(ABORT, 'injected failure'); END
+        ''')
+    try:
+        assert not store_approved_news('item 0', 'body of item 0', 'tester')
+    finally:
+        with transaction() as cursor:
+            cursor.execute('DROP TRIGGER temp.fail_pending_delete')
+    assert get_pending_news_by_id(result['pending_id']) is not None
+    assert not is_news_hash_approved(result['news_hash'])
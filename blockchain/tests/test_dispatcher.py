@@ -0,0 +1,89 @@
+import time
+import pytest
+import dispatcher as dispatcher_module
+import network
+from db import connection
+from dispatcher import GossipDispatcher
+
+PEER = 'http://localhost:5998'
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def outbox_depth():
+    with connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM outbox WHERE peer = ?', (PEER,)).fetchone()[0]
+
+def batch_payload():
+    return {'type': 'batch', 'sender': 'http://localhost:5999', 'messages': [
+        {'type': 'vote_request', 'msg_id': 'vote', 'news': {'headline': 'h', 'body': 'b', 'author': 'a'}},
+        {'type': 'approved_news', 'msg_id': 'approved', 'headline': 'h', 'body': 'b', 'author': 'a'}
+    ]}
+
+@pytest.fixture
+def legacy_peer(monkeypatch):
+    """A peer without /gossip/batch; records the paths it is sent."""
+    paths = []
+
+    def post_to_peer(node, path, payload, timeout=None):
+        paths.append(path)
+        if path == '/gossip/batch':
+            return {"ok": False, "status": 404, "error": "404 Client Error: NOT FOUND", "elapsed": 0}
+        return {"ok": True, "status": 200, "elapsed": 0}
+
+    monkeypatch.setattr(network, 'post_to_peer', post_to_peer)
+    return paths
+
+@pytest.fixture
+def gossip_dispatcher():
+    dispatcher = GossipDispatcher()
+    yield dispatcher
+    dispatcher.stop()
+
+def test_legacy_peer_gets_queued_batch_one_message_at_a_time(legacy_peer, gossip_dispatcher):
+    gossip_dispatcher.enqueue('/gossip/batch', batch_payload(), [PEER])
+    assert wait_for(lambda: outbox_depth() == 0)
+    assert legacy_peer == ['/gossip/batch', '/vote_request', '/approved_news']
+
+    # Once known, the peer is sent individual requests straight away
+    gossip_dispatcher.enqueue('/gossip/batch', batch_payload(), [PEER])
+    assert wait_for(lambda: outbox_depth() == 0)
+    assert legacy_peer[3:] == ['/vote_request', '/approved_news']
+
+def test_legacy_peer_is_sent_batches_again_after_recheck(legacy_peer, gossip_dispatcher, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, 'DISPATCH_RETRY_BASE', 0.05)
+    monkeypatch.setattr(dispatcher_module, 'DISPATCH_LEGACY_RECHECK', 0.5)
+    gossip_dispatcher.enqueue('/gossip/batch', batch_payload(), [PEER])
+    assert wait_for(lambda: outbox_depth() == 0)
+    assert legacy_peer == ['/gossip/batch', '/vote_request', '/approved_news']
+
+    # After the recheck interval an upgraded peer gets batches again
+    time.sleep(0.5)
+    monkeypatch.setattr(network, 'post_to_peer', lambda node, path, payload, timeout=None:
+                        legacy_peer.append(path) or {"ok": True, "status": 200, "elapsed": 0})
+    gossip_dispatcher.enqueue('/gossip/batch', batch_payload(), [PEER])
+    assert wait_for(lambda: outbox_depth() == 0)
+    assert legacy_peer[3:] == ['/gossip/batch']
+
+def test_outbox_errors_do_not_kill_the_worker(legacy_peer, gossip_dispatcher, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, 'DISPATCH_CLAIM_LEASE', 0.2)
+    monkeypatch.setattr(dispatcher_module, 'DISPATCH_IDLE_POLL', 0.1)
+    mark_delivered = gossip_dispatcher._mark_delivered
+    failures = []
+
+    def flaky_mark_delivered(group):
+        if not failures:
+            failures.append(group)
+            raise RuntimeError('database is locked')
+        mark_delivered(group)
+
+    monkeypatch.setattr(gossip_dispatcher, '_mark_delivered', flaky_mark_delivered)
+    gossip_dispatcher.enqueue('/vote_request', batch_payload()['messages'][0], [PEER])
+    assert wait_for(lambda: outbox_depth() == 0)
+    assert failures and legacy_peer == ['/vote_request', '/vote_request']
+    assert gossip_dispatcher._workers[PEER].is_alive()
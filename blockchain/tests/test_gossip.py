@@ -0,0 +1,86 @@
+import uuid
+from network import SeenMessages, seen_messages
+from db import transaction
+from news import is_news_hash_approved, generate_news_hash
+
+def test_seen_messages_are_shared_between_workers():
+    message_id = uuid.uuid4().hex
+    other_worker = SeenMessages()
+    assert seen_messages.add(message_id)
+    assert not seen_messages.add(message_id)
+    assert not other_worker.add(message_id)
+
+def test_seen_message_expires_after_ttl():
+    message_id = uuid.uuid4().hex
+    assert SeenMessages(ttl=0).add(message_id)
+    assert SeenMessages(ttl=0).add(message_id)
+
+def test_rolled_back_message_stays_unseen():
+    message_id = uuid.uuid4().hex
+    try:
+        with transaction(immediate=True):
+            assert seen_messages.add(message_id)
+            raise RuntimeError('batch failed')
+    except RuntimeError:
+        pass
+    assert seen_messages.add(message_id)
+
+def gossip_batch(client, messages):
+    return client.post('/gossip/batch', json={'type': 'batch', 'sender': 'http://peer', 'messages': messages})
+
+def batch_messages():
+    article = {'headline': 'approved', 'body': 'body', 'author': 'tester'}
+    return [
+        {'type': 'approved_news', 'msg_id': uuid.uuid4().hex, **article},
+        {'type': 'vote_request', 'msg_id': uuid.uuid4().hex, 'total_nodes': 3,
+         'news': {'headline': 'pending', 'body': 'body', 'author': 'tester'}},
+        {'type': 'vote_request', 'msg_id': uuid.uuid4().hex, 'news': {'headline': ''}},
+    ]
+
+def test_gossip_batch_reports_per_message_status(client):
+    messages = batch_messages()
+    data = gossip_batch(client, messages).get_json()
+    assert [result['status'] for result in data['results']] == ['stored', 'stored', 'invalid']
+    assert data['applied'] == 2
+    data = gossip_batch(client, messages).get_json()
+    assert [result['status'] for result in data['results']] == ['duplicate', 'duplicate', 'invalid']
+    fresh = [{**message, 'msg_id': uuid.uuid4().hex} for message in messages]
+    data = gossip_batch(client, fresh).get_json()
+    assert [result['status'] for result in data['results']] == ['known', 'known', 'invalid']
+
+def test_failed_gossip_batch_applies_nothing(client):
+    messages = batch_messages()
+    with transaction() as cursor:
+        cursor.execute('''
+            CREATE TEMP TRIGGER fail_pending_insert BEFORE INSERT ON main.pending_news
+            BEGIN SELECT RAISE(ABORT, 'injected failure'); END
+        ''')
+    try:
+        assert gossip_batch(client, messages).status_code == 500
+    finally:
+        with transaction() as cursor:
+            cursor.execute('DROP TRIGGER temp.fail_pending_insert')
+    assert not is_news_hash_approved(generate_news_hash('approved', 'body', 'tester'))
+    # The messages were not marked seen, so the peer's retry is applied in full
+    data = gossip_batch(client, messages).get_json()
+    assert [result['status'] for result in data['results']] == ['stored', 'stored', 'invalid']
+
+def test_failed_vote_request_stays_unseen(client):
+    message = {'type': 'vote_request', 'msg_id': uuid.uuid4().hex, 'pending_id': 1, 'total_nodes': 3,
+               'news': {'headline': 'retried', 'body': 'body', 'author': 'tester'}}
+    with transaction() as cursor:
+        cursor.execute('''
+            CREATE TEMP TRIGGER fail_pending_insert BEFORE INSERT ON main.pending_news
+            BEGIN SELECT RAISE(ABORT, 'injected failure'); END
+        ''')
+    try:
+        assert client.post('/vote_request', json=message).status_code == 500
+    finally:
+        with transaction() as cursor:
+            cursor.execute('DROP TRIGGER temp.fail_pending_insert')
+    response = client.post('/vote_request', json=message)
+    assert response.get_json()['message'] == 'Vote request received, awaiting manual vote'
+    with transaction() as cursor:
+        cursor.execute('SELECT 1 FROM pending_news WHERE news_hash = ?', (generate_news_hash('retried', 'body', 'tester'),))
+        assert cursor.fetchone()
+    assert client.post('/vote_request', json=message).get_json()['message'] == 'Duplicate vote request ignored'
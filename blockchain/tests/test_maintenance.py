@@ -0,0 +1,42 @@
+import sqlite3
+import maintenance
+from db import ConnectionPool
+
+def legacy_pool(tmp_path):
+    """Pool over a WAL database created without incremental auto-vacuum and left with free pages."""
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('CREATE TABLE filler (body TEXT)')
+    conn.executemany('INSERT INTO filler VALUES (?)', [('x' * 1000,)] * 500)
+    conn.execute('DELETE FROM filler')
+    conn.close()
+    return ConnectionPool(path)
+
+def test_background_compaction_does_not_vacuum_legacy_database(tmp_path, monkeypatch):
+    pool = legacy_pool(tmp_path)
+    monkeypatch.setattr(maintenance, 'connection', pool.connection)
+    with pool.connection() as conn:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    assert free
+
+    maintenance.compact_database()
+    with pool.connection() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+        # ANALYZE may reuse a free page for sqlite_stat1; a VACUUM would leave none
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] >= free - 5
+
+def test_convert_then_compact_returns_free_pages(tmp_path, monkeypatch):
+    pool = legacy_pool(tmp_path)
+    monkeypatch.setattr(maintenance, 'connection', pool.connection)
+    assert maintenance.convert_to_incremental_vacuum() is True
+    assert maintenance.convert_to_incremental_vacuum() is False
+    with pool.connection() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        conn.execute('INSERT INTO filler VALUES (?)', ('x' * 100000,))
+        conn.execute('DELETE FROM filler')
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    maintenance.compact_database()
+    with pool.connection() as conn:
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
@@ -0,0 +1,86 @@
+from conftest import make_items
+from db import transaction
+from news import insert_approved_news_batch, insert_pending_news_batch, list_approved_news, list_pending_news, iter_pages
+
+COLUMNS = ('id', 'date', 'headline')
+
+def seed_approved(count=23):
+    # Several articles share each date, so pages have to break ties on id
+    dates = [f'2024-01-{1 + i // 3:02d}T00:00:00' for i in range(count)]
+    insert_approved_news_batch(make_items(count, dates=dates))
+    return sorted(list_approved_news(columns=COLUMNS, limit=1000), key=lambda row: (row[1], row[0]), reverse=True)
+
+def walk(list_fn, order, limit):
+    rows, after_id, after_date = [], None, None
+    while True:
+        page = list_fn(columns=COLUMNS, after_id=after_id, after_date=after_date, limit=limit, order=order)
+        rows.extend(page)
+        if len(page) < limit:
+            return rows
+        after_id, after_date = page[-1][0], page[-1][1]
+
+def test_date_order_walk_matches_full_listing():
+    expected = seed_approved()
+    assert walk(list_approved_news, 'date', 4) == expected
+
+def test_date_order_resumes_from_id_alone():
+    expected = seed_approved()
+    page = list_approved_news(columns=COLUMNS, after_id=expected[5][0], limit=3, order='date')
+    assert page == expected[6:9]
+
+def test_id_order_walk():
+    seed_approved()
+    rows = walk(list_approved_news, 'id', 5)
+    assert [row[0] for row in rows] == sorted(row[0] for row in rows)
+    assert len(rows) == 23
+
+def test_iter_pages_respects_limit():
+    insert_pending_news_batch(make_items(12))
+    pages = list(iter_pages(list_pending_news, COLUMNS, limit=10, chunk_rows=4))
+    assert [len(page) for page in pages] == [4, 4, 2]
+
+def test_approved_news_route_pages(client):
+    expected = seed_approved()
+    headlines, params = [], {'limit': 5}
+    while True:
+        data = client.get('/approved_news', query_string=params).get_json()
+        headlines.extend(item['headline'] for item in data['news'])
+        if data['next_after_id'] is None:
+            break
+        params = {'limit': 5, 'after_id': data['next_after_id'], 'after_date': data['next_after_date']}
+    assert headlines == [row[2] for row in expected]
+
+def test_field_projection(client):
+    seed_approved(3)
+    data = client.get('/approved_news', query_string={'fields': 'id,headline', 'limit': 2}).get_json()
+    assert all(set(item) == {'id', 'headline'} for item in data['news'])
+    assert client.get('/approved_news', query_string={'fields': 'password'}).status_code == 400
+
+def test_listings_return_everything_without_limit_or_cursor(client):
+    seed_approved(120)
+    insert_pending_news_batch(make_items(75, prefix='pending'))
+    assert len(client.get('/approved_news').get_json()['news']) == 120
+    assert len(client.get('/toverify').get_json()) == 75
+    response = client.get('/toverify', query_string={'limit': 10})
+    assert len(response.get_json()) == 10 and response.headers['X-Next-After-Id']
+
+def test_malformed_paging_parameters(client):
+    for params, message in (({'limit': 'abc'}, 'limit must be a positive integer'),
+                            ({'limit': '0'}, 'limit must be a positive integer'),
+                            ({'after_id': 'x'}, 'after_id must be a non-negative integer')):
+        response = client.get('/approved_news', query_string=params)
+        assert response.status_code == 400 and response.get_json() == {'error': message}
+    assert client.get('/toverify', query_string={'limit': '1.5'}).status_code == 400
+
+def test_date_cursor_on_deleted_row(client):
+    expected = seed_approved(6)
+    with transaction(immediate=True) as cursor:
+        cursor.execute('DELETE FROM news WHERE id = ?', (expected[2][0],))
+    response = client.get('/approved_news', query_string={'after_id': expected[2][0], 'limit': 2})
+    assert response.status_code == 400
+    assert client.get('/approved_news', query_string={'after_id': expected[2][0], 'stream': 'json'}).status_code == 400
+    # With its date the cursor still resumes in place
+    data = client.get('/approved_news', query_string={
+        'after_id': expected[2][0], 'after_date': expected[2][1], 'limit': 2
+    }).get_json()
+    assert [item['id'] for item in data['news']] == [row[0] for row in expected[3:5]]
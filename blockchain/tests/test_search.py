@@ -0,0 +1,30 @@
+import pytest
+import archive
+from conftest import make_items
+from db import transaction
+from merkle import rebuild_merkle
+from news import insert_approved_news_batch
+from search import search_news
+
+@pytest.fixture
+def archived_month():
+    """Approve two articles from January 2020 and one from today, then archive January 2020."""
+    insert_approved_news_batch(make_items(2, prefix='election old', dates=['2020-01-05T00:00:00', '2020-01-20T00:00:00']))
+    insert_approved_news_batch(make_items(1, prefix='election new'))
+    assert archive.archive_month('2020-01') == 2
+    yield
+    archive.partition_reader.close_all()
+    with transaction(immediate=True) as cursor:
+        cursor.execute('DELETE FROM archive_partitions')
+        cursor.execute('DELETE FROM archived_hashes')
+        rebuild_merkle(cursor)
+
+def test_open_ended_search_includes_archived_articles(archived_month):
+    headlines = {row[1] for row in search_news('election', 10)}
+    assert headlines == {'election old 0', 'election old 1', 'election new 0'}
+
+def test_date_range_skips_archived_months_outside_it(archived_month):
+    headlines = {row[1] for row in search_news('election', 10, since='2021-01-01')}
+    assert headlines == {'election new 0'}
+    headlines = {row[1] for row in search_news('election', 10, until='2020-01-10')}
+    assert headlines == {'election old 0'}
@@ -0,0 +1,29 @@
+import pytest
+from conftest import make_items
+from db import transaction
+from merkle import get_merkle_root
+from news import insert_approved_news_batch, submit_news_batch, list_approved_news
+from snapshot import SnapshotStore, import_snapshot
+
+def test_snapshot_round_trip(tmp_path):
+    insert_approved_news_batch(make_items(40))
+    submit_news_batch(make_items(2, prefix='pending'), 3)
+    root = get_merkle_root()['root']
+    store = SnapshotStore(str(tmp_path))
+    manifest = store.build()
+    assert manifest['count'] == 40 and manifest['root'] == root
+
+    with transaction(immediate=True) as cursor:
+        cursor.execute('DELETE FROM news')
+    assert import_snapshot(store.path_for(manifest), manifest) == 40
+    assert get_merkle_root()['root'] == root
+    assert len(list_approved_news(columns=('id', 'date'), limit=1000)) == 40
+    # Importing the same snapshot again adds nothing
+    assert import_snapshot(store.path_for(manifest), manifest) == 0
+
+def test_snapshot_with_wrong_root_is_rejected(tmp_path):
+    insert_approved_news_batch(make_items(5))
+    store = SnapshotStore(str(tmp_path))
+    manifest = {**store.build(), 'root': '0' * 64}
+    with pytest.raises(ValueError):
+        import_snapshot(store.path_for(manifest), manifest)
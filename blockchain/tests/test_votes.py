@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from conftest import make_items
+from news import (
+    submit_news_batch, insert_pending_news, record_vote, record_votes_batch, approval_threshold, rejection_threshold,
+    is_news_hash_approved, get_pending_news_by_id, get_node_vote
+)
+
+def submit(count=1, total_nodes=3):
+    results = submit_news_batch(make_items(count), total_nodes)
+    return [result['pending_id'] for result in results]
+
+def test_thresholds():
+    assert [approval_threshold(n) for n in (1, 2, 3, 5, 10)] == [1, 2, 2, 4, 7]
+    assert [rejection_threshold(n) for n in (1, 2, 3, 5, 10)] == [1, 1, 2, 2, 4]
+
+def test_record_vote_approves_at_threshold():
+    pending_id, = submit(total_nodes=3)
+    first = record_vote(pending_id, 'http://a', 1)
+    assert first == {'status': 'recorded', 'approved': False, 'data': None}
+    assert record_vote(pending_id, 'http://a', 1)['status'] == 'duplicate'
+
+    second = record_vote(pending_id, 'http://b', 1)
+    assert second['status'] == 'recorded' and second['approved']
+    assert second['data'] == {'headline': 'item 0', 'body': 'body of item 0', 'author': 'tester'}
+    assert get_pending_news_by_id(pending_id) is None
+    assert get_node_vote(pending_id, 'http://a') is None
+    results = submit_news_batch(make_items(1), 3)
+    assert results[0]['status'] == 'approved'
+    assert is_news_hash_approved(results[0]['news_hash'])
+
+def test_disapprovals_do_not_approve():
+    pending_id, = submit(total_nodes=3)
+    record_vote(pending_id, 'http://a', 0)
+    result = record_vote(pending_id, 'http://b', 0)
+    assert result['status'] == 'recorded' and not result['approved']
+    assert get_pending_news_by_id(pending_id) is not None
+
+def test_record_vote_unknown_item():
+    assert record_vote(12345, 'http://a', 1)['status'] == 'invalid'
+    assert record_vote(12345, None, 1)['status'] == 'error'
+
+def test_record_votes_batch():
+    ids = submit(count=3, total_nodes=1)
+    results = record_votes_batch([(ids[0], 1), (ids[1], 0), (99999, 1)], 'http://a')
+    assert [(r['status'], r['approved']) for r in results] == [('recorded', True), ('recorded', False), ('invalid', False)]
+    assert get_pending_news_by_id(ids[0]) is None
+    assert get_pending_news_by_id(ids[1]) is not None
+
+def test_insert_pending_news_returns_existing_id():
+    first = insert_pending_news('same', 'body', 'tester', 3)
+    assert first is not None
+    assert insert_pending_news('same', 'body', 'tester', 3) == first
+
+def test_concurrent_insert_pending_news():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda _: insert_pending_news('race', 'body', 'tester', 3), range(16)))
+    assert None not in ids and len(set(ids)) == 1
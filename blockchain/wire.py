@@ -0,0 +1,148 @@
+import gzip
+import json
+import logging
+import re
+import zlib
+from flask import request, Response, jsonify
+from config import PEER_WIRE_FORMAT, WIRE_COMPRESS_MIN_BYTES
+
+try:
+    import msgpack
+except ImportError:  # JSON only
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # gzip only
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+NDJSON_TYPE = 'application/x-ndjson'
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# Content negotiation for node-to-node traffic. Peers that have msgpack
+# installed exchange MessagePack with SHA-256 hex strings packed as raw
+# 32-byte values; everything else (including the React frontend) gets JSON.
+
+def _pack_hashes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value) if HASH_PATTERN.fullmatch(value) else value
+    if isinstance(value, dict):
+        return {key: _pack_hashes(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_pack_hashes(item) for item in value]
+    return value
+
+def _unpack_hashes(value):
+    # Only hashes are ever sent as binary, so every bytes value is one
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, dict):
+        return {key: _unpack_hashes(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_unpack_hashes(item) for item in value]
+    return value
+
+def encode(data, content_type):
+    """Serialize data as JSON or MessagePack."""
+    if content_type == MSGPACK_TYPE:
+        return msgpack.packb(_pack_hashes(data), use_bin_type=True)
+    return json.dumps(data).encode()
+
+def decode(body, content_type):
+    """Parse a JSON or MessagePack body; None if it is empty."""
+    if not body:
+        return None
+    if msgpack and (content_type or '').split(';')[0].strip() == MSGPACK_TYPE:
+        return _unpack_hashes(msgpack.unpackb(body, raw=False))
+    return json.loads(body)
+
+def request_content_type():
+    """Content-Type this node uses for peer request bodies."""
+    return MSGPACK_TYPE if PEER_WIRE_FORMAT == 'msgpack' and msgpack else JSON_TYPE
+
+def accept_header():
+    """Accept header for peer requests: MessagePack preferred when we can read it."""
+    return f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.9" if msgpack else JSON_TYPE
+
+def decode_response(response):
+    """Decode a peer's response according to its Content-Type."""
+    return decode(response.content, response.headers.get('Content-Type'))
+
+def request_data():
+    """The current request body as a dict/list, whichever encoding the peer used; None if unreadable."""
+    try:
+        return decode(request.get_data(cache=True), request.content_type)
+    except Exception as e:
+        logger.error(f"Could not decode {request.content_type} request body: {str(e)}")
+        return None
+
+def respond(data, status=200):
+    """Build a response in the best encoding and compression the caller accepts.
+
+    Browsers and older peers get plain JSON; bodies of WIRE_COMPRESS_MIN_BYTES
+    or more are zstd- or gzip-compressed when the Accept-Encoding allows it.
+    """
+    accept = request.accept_mimetypes
+    if not msgpack or accept.quality(MSGPACK_TYPE) <= accept.quality(JSON_TYPE):
+        response = jsonify(data)
+    else:
+        response = Response(encode(data, MSGPACK_TYPE), mimetype=MSGPACK_TYPE)
+    response.status_code = status
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    body = response.get_data()
+    if len(body) < WIRE_COMPRESS_MIN_BYTES:
+        return response
+    encodings = request.accept_encodings
+    if zstandard and encodings.quality('zstd') > 0:
+        response.set_data(zstandard.ZstdCompressor(level=3).compress(body))
+        response.headers['Content-Encoding'] = 'zstd'
+    elif encodings.quality('gzip') > 0:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+# Streamed listings. Bodies are produced one batch of items at a time, so a
+# response never holds more than one batch however many rows it covers.
+
+def wants_ndjson():
+    """Whether the caller asked for newline-delimited JSON (stream=ndjson or an Accept preferring it)."""
+    if request.args.get('stream') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match([JSON_TYPE, NDJSON_TYPE]) == NDJSON_TYPE
+
+def ndjson_chunks(batches):
+    """One JSON object per line, a batch per chunk."""
+    for batch in batches:
+        yield ''.join(json.dumps(item) + '\n' for item in batch).encode()
+
+def json_document_chunks(key, batches, extra=None):
+    """The JSON object {key: [...items], **extra}, emitted a batch at a time."""
+    yield f'{{{json.dumps(key)}: ['.encode()
+    separator = ''
+    for batch in batches:
+        yield (separator + ', '.join(json.dumps(item) for item in batch)).encode()
+        separator = ', '
+    members = ''.join(f', {json.dumps(name)}: {json.dumps(value)}' for name, value in (extra or {}).items())
+    yield f']{members}}}'.encode()
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(5, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # Flush per chunk so the reader can start on each batch as it arrives
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def stream_response(chunks, mimetype):
+    """Streaming response for a chunk generator, gzip-compressed on the fly when the caller accepts it."""
+    headers = {'X-Accel-Buffering': 'no'}
+    if request.accept_encodings.quality('gzip') > 0:
+        chunks = _gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
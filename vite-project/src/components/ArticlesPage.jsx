@@ -39,6 +39,17 @@ function ArticlesPage() {
       });
   }, [searchTerm]);
 
+  // Newly approved articles are pushed by the node; search results stay as fetched
+  useEffect(() => {
+    if (searchTerm) return undefined;
+    const events = new EventSource(`${BACKEND_URL}/events?types=approved`);
+    events.addEventListener('approved', (e) => {
+      const article = JSON.parse(e.data);
+      setArticles(prev => prev.some(a => a.id === article.id) ? prev : [article, ...prev]);
+    });
+    return () => events.close();
+  }, [searchTerm]);
+
   return (
     <div className="min-h-screen bg-gray-100 p-4">
       <div className="max-w-3xl mx-auto">
@@ -32,6 +32,26 @@ function VerifyPage() {
     fetchArticles();
   }, []);
 
+  // Live updates pushed by the node instead of refetching the whole list
+  useEffect(() => {
+    const events = new EventSource(`${BACKEND_URL}/events?types=pending_added,vote_tally,pending_removed`);
+    events.addEventListener('pending_added', (e) => {
+      const article = JSON.parse(e.data);
+      setArticles(prev => prev.some(a => a.id === article.id) ? prev : [...prev, article]);
+    });
+    events.addEventListener('vote_tally', (e) => {
+      const tally = JSON.parse(e.data);
+      setArticles(prev => prev.map(a => a.id === tally.id ? { ...a, approval_rate: tally.approval_rate } : a));
+    });
+    events.addEventListener('pending_removed', (e) => {
+      const { id } = JSON.parse(e.data);
+      setArticles(prev => prev.filter(a => a.id !== id));
+    });
+    // Sent when the events missed while disconnected are no longer available
+    events.addEventListener('reset', fetchArticles);
+    return () => events.close();
+  }, []);
+
   const voteOnArticle = (id, action) => {
     if (voting[id]) return;
     setVoting(prev => ({ ...prev, [id]: true }));